@@ -1,7 +1,10 @@
+import time
+APP_START = time.perf_counter()  # Referencia para medir el arranque de la aplicación
+
 import os
 import sys
-import time
-from flask import Flask, render_template, request, redirect
+import multiprocessing
+from flask import Flask, render_template, request, jsonify
 
 # -------------------------------
 # Asegurar que la carpeta base del proyecto está en sys.path
@@ -14,10 +17,25 @@ if UTILS_PATH not in sys.path:
 # -------------------------------
 # Importar módulos propios desde el paquete ocr_utils
 # -------------------------------
-from ocr_utils import ocr_processor
-from ocr_utils import pdf_splitter
-from ocr_utils import metadata_writer
+_import_start = time.perf_counter()
+from ocr_utils import batch_processor
+from ocr_utils import job_manager
+from ocr_utils import folder_watcher
+from ocr_utils import ocr_cache
 from ocr_utils import logger
+from ocr_utils import metrics
+from ocr_utils import search_index
+from ocr_utils import output_bundle
+from ocr_utils import ocr_processor
+
+IMPORT_SECONDS = time.perf_counter() - _import_start
+
+# -------------------------------
+# Objetivos de arranque: importar ocr_utils y dejar Flask listo no deben
+# esperar a torch ni al modelo EasyOCR (que se carga al primer uso)
+# -------------------------------
+IMPORT_TARGET_SECONDS = 1.0
+STARTUP_TARGET_SECONDS = 2.0
 
 # -------------------------------
 # Inicializar Flask
@@ -30,8 +48,51 @@ app = Flask(__name__)
 LOG_DIR = os.path.join(BASE_DIR, "output")
 os.makedirs(LOG_DIR, exist_ok=True)
 
+# Los procesos OCR del pool reimportan este módulo: no deben truncar el log
+# ni reconfigurar lo que ya reciben del proceso padre
+IS_MAIN_PROCESS = multiprocessing.current_process().name == "MainProcess"
+
 LOG_FILE = os.path.join(LOG_DIR, "proceso.log")
-logger.init_logger(LOG_FILE)
+if IS_MAIN_PROCESS:
+    logger.init_logger(LOG_FILE)
+
+# -------------------------------
+# Carpetas de salida desde las que /page puede leer paquetes, además de los que
+# conoce el índice de búsqueda (OCR_OUTPUT_ROOTS, separadas por os.pathsep)
+# -------------------------------
+OUTPUT_ROOTS = [os.path.realpath(path) for path in
+                os.environ.get("OCR_OUTPUT_ROOTS", LOG_DIR).split(os.pathsep) if path]
+
+# -------------------------------
+# Caché de resultados OCR (desactivar con OCR_CACHE_DIR="")
+# -------------------------------
+if IS_MAIN_PROCESS:
+    ocr_cache.configure(os.environ.get("OCR_CACHE_DIR", os.path.join(LOG_DIR, "ocr_cache")))
+
+# -------------------------------
+# Índice de búsqueda de texto completo (desactivar con OCR_INDEX_PATH="")
+# -------------------------------
+if IS_MAIN_PROCESS:
+    search_index.configure(os.environ.get("OCR_INDEX_PATH", os.path.join(LOG_DIR, "ocr_index.sqlite")))
+
+# -------------------------------
+# Precarga del modelo en segundo plano: '/' y '/logs' responden mientras tanto.
+# Con pool de procesos cada worker carga su propio modelo, así que no hace falta aquí.
+# -------------------------------
+if IS_MAIN_PROCESS and os.environ.get("OCR_WARMUP", "1") == "1" and batch_processor.OCR_WORKERS <= 1:
+    ocr_processor.warm_up_reader(background=True)
+
+# -------------------------------
+# Registro del tiempo de arranque frente a los objetivos
+# -------------------------------
+if IS_MAIN_PROCESS:
+    startup_seconds = time.perf_counter() - APP_START
+    logger.log_info(
+        f"Arranque: importación ocr_utils {IMPORT_SECONDS:.2f}s (objetivo {IMPORT_TARGET_SECONDS}s)"
+        f" | aplicación lista {startup_seconds:.2f}s (objetivo {STARTUP_TARGET_SECONDS}s)"
+    )
+    if IMPORT_SECONDS > IMPORT_TARGET_SECONDS or startup_seconds > STARTUP_TARGET_SECONDS:
+        logger.log_error("Arranque más lento que el objetivo")
 
 # -------------------------------
 # Ruta principal (vista HTML)
@@ -41,7 +102,26 @@ def index():
     return render_template('index.html')
 
 # -------------------------------
-# Ruta para iniciar el procesamiento OCR
+# Procesos OCR pedidos en el formulario (por defecto OCR_WORKERS)
+# None si no es un entero entre 1 y OCR_MAX_WORKERS
+# -------------------------------
+def requested_workers():
+    value = request.form.get('workers')
+    if not value:
+        return batch_processor.OCR_WORKERS
+    try:
+        workers = int(value)
+    except ValueError:
+        return None
+    return workers if 1 <= workers <= batch_processor.OCR_MAX_WORKERS else None
+
+def invalid_workers_response():
+    message = f"workers debe ser un entero entre 1 y {batch_processor.OCR_MAX_WORKERS}."
+    logger.log_error(message)
+    return jsonify({"error": message}), 400
+
+# -------------------------------
+# Ruta para iniciar el procesamiento OCR (encola un trabajo en segundo plano)
 # -------------------------------
 @app.route('/start', methods=['POST'])
 def start_processing():
@@ -50,78 +130,175 @@ def start_processing():
 
     if not input_folder or not output_folder:
         logger.log_error("Rutas no válidas.")
-        return "Error: Rutas no válidas."
+        return jsonify({"error": "Rutas no válidas."}), 400
 
     input_path = os.path.abspath(input_folder)
     output_path = os.path.abspath(output_folder)
+    workers = requested_workers()
+    if workers is None:
+        return invalid_workers_response()
+
+    if not os.path.isdir(input_path):
+        logger.log_error(f"Carpeta de entrada no encontrada: {input_path}")
+        return jsonify({"error": f"Carpeta de entrada no encontrada: {input_path}"}), 400
 
-    start_time = time.time()
     logger.log_info(f"Iniciando procesamiento OCR en: {input_path}")
     logger.log_info(f"Guardando resultados en: {output_path}")
 
     try:
-        os.makedirs(output_path, exist_ok=True)
-        processed_files = 0
-
-        for file in os.listdir(input_path):
-            if file.lower().endswith(".pdf"):
-                pdf_path = os.path.join(input_path, file)
-                base_name = os.path.splitext(file)[0]
-
-                try:
-                    temp_output_dir = os.path.join(output_path, base_name)
-                    os.makedirs(temp_output_dir, exist_ok=True)
-
-                    logger.log_info(f"Iniciando OCR para: {file}")
-                    ocr_processor.ocr_pdf_to_text(pdf_path, temp_output_dir)
-
-                    # Verificar si el OCR generó algún archivo de texto
-                    has_text = any(
-                        fname.endswith(".txt") and os.path.getsize(os.path.join(temp_output_dir, fname)) > 0
-                        for fname in os.listdir(temp_output_dir)
-                    )
-
-                    if not has_text:
-                        logger.log_error(f"OCR fallido o sin texto: {file}")
-                        if os.path.exists(temp_output_dir) and not os.listdir(temp_output_dir):
-                            os.rmdir(temp_output_dir)
-                        continue
-
-                    # Dividir PDF original (opcional)
-                    pdf_splitter.split_pdf_by_page(pdf_path, temp_output_dir)
-
-                    # Insertar metadatos en los PDFs generados por OCR
-                    for fname in os.listdir(temp_output_dir):
-                        if fname.endswith(".pdf") and "_pagina_" in fname:
-                            metadata_writer.insert_metadata_to_pdf(
-                                os.path.join(temp_output_dir, fname),
-                                {
-                                    "Title": file,
-                                    "Producer": "OCR App",
-                                    "CustomID": f"{int(time.time())}"
-                                }
-                            )
-
-                    processed_files += 1
-                    logger.log_info(f"Procesado correctamente: {file}")
-
-                except Exception as e:
-                    logger.log_error(f"Error procesando {file}: {safe_str(e)}")
-
-        end_time = time.time()
-        logger.log_benchmark(start_time, end_time, processed_files)
-        return redirect('/')
+        job = job_manager.submit_job(input_path, output_path, workers=workers)
+        return jsonify({"job_id": job.id, "status_url": f"/jobs/{job.id}"}), 202
+
+    except job_manager.JobQueueFull as e:
+        logger.log_error(safe_str(e))
+        return jsonify({"error": safe_str(e)}), 503
 
     except Exception as e:
         logger.log_error(f"Error general: {safe_str(e)}")
-        return f"Error: {safe_str(e)}"
+        return jsonify({"error": safe_str(e)}), 500
 
 # -------------------------------
-# Ruta para ver los logs
+# Rutas de consulta y cancelación de trabajos
+# -------------------------------
+@app.route('/jobs')
+def list_jobs():
+    return jsonify(job_manager.list_jobs())
+
+@app.route('/jobs/<job_id>')
+def get_job(job_id):
+    job = job_manager.get_job(job_id)
+    if job is None:
+        return jsonify({"error": "Trabajo no encontrado."}), 404
+    return jsonify(job.to_dict())
+
+@app.route('/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    job = job_manager.cancel_job(job_id)
+    if job is None:
+        return jsonify({"error": "Trabajo no encontrado."}), 404
+    return jsonify(job.to_dict())
+
+# -------------------------------
+# Carpetas vigiladas: cada PDF nuevo o modificado se procesa al terminar de copiarse
+# -------------------------------
+@app.route('/watch', methods=['GET', 'POST'])
+def watch_folder():
+    if request.method == 'GET':
+        return jsonify(folder_watcher.list_watchers())
+
+    input_folder = request.form.get('input_folder')
+    output_folder = request.form.get('output_folder')
+    if not input_folder or not output_folder:
+        return jsonify({"error": "Rutas no válidas."}), 400
+
+    input_path = os.path.abspath(input_folder)
+    if not os.path.isdir(input_path):
+        logger.log_error(f"Carpeta de entrada no encontrada: {input_path}")
+        return jsonify({"error": f"Carpeta de entrada no encontrada: {input_path}"}), 400
+
+    workers = requested_workers()
+    if workers is None:
+        return invalid_workers_response()
+    try:
+        watcher = folder_watcher.start_watcher(input_path, os.path.abspath(output_folder), workers=workers)
+    except folder_watcher.WatcherConflict as e:
+        logger.log_error(safe_str(e))
+        return jsonify({"error": safe_str(e), "watch_id": e.watcher.id,
+                        "status_url": f"/watch/{e.watcher.id}"}), 409
+    return jsonify({"watch_id": watcher.id, "status_url": f"/watch/{watcher.id}"}), 202
+
+@app.route('/watch/<watch_id>')
+def get_watch(watch_id):
+    watcher = folder_watcher.get_watcher(watch_id)
+    if watcher is None:
+        return jsonify({"error": "Carpeta vigilada no encontrada."}), 404
+    return jsonify(watcher.to_dict())
+
+@app.route('/watch/<watch_id>/stop', methods=['POST'])
+def stop_watch(watch_id):
+    watcher = folder_watcher.stop_watcher(watch_id)
+    if watcher is None:
+        return jsonify({"error": "Carpeta vigilada no encontrada."}), 404
+    return jsonify(watcher.to_dict())
+
+# -------------------------------
+# Búsqueda de texto completo sobre las páginas procesadas
+# ?q=consulta (sintaxis FTS5: "frase exacta", prefijo*, OR, NOT) &limit=N &offset=N
+# -------------------------------
+@app.route('/search')
+def search():
+    query = request.args.get('q', '')
+    if not query.strip():
+        return jsonify({"error": "Consulta vacía."}), 400
+    if not search_index.is_enabled():
+        return jsonify({"error": "Índice de búsqueda desactivado."}), 503
+    return jsonify(search_index.search(
+        query, limit=request.args.get('limit', 20, type=int), offset=request.args.get('offset', 0, type=int)
+    ))
+
+# -------------------------------
+# Texto de una página guardada en modo paquete (OCR_OUTPUT_MODE=bundle)
+# ?path=ruta del .pages.jsonl (campo txt_path de /search) &page=N
+# Solo paquetes registrados en el índice o dentro de OUTPUT_ROOTS
+# -------------------------------
+def is_allowed_bundle(pages_path):
+    real_path = os.path.realpath(pages_path)
+    for root in OUTPUT_ROOTS:
+        try:
+            if os.path.commonpath([root, real_path]) == root:
+                return True
+        except ValueError:
+            pass  # Otra unidad (Windows)
+    return search_index.is_indexed_output(pages_path)
+
+@app.route('/page')
+def get_page():
+    pages_path = request.args.get('path', '')
+    page_number = request.args.get('page', type=int)
+    if not pages_path.endswith(output_bundle.PAGES_SUFFIX) or page_number is None:
+        return jsonify({"error": "Parámetros no válidos."}), 400
+    if not is_allowed_bundle(pages_path):
+        logger.log_error(f"Ruta de paquete no permitida: {pages_path}")
+        return jsonify({"error": "Ruta no permitida."}), 403
+    if not os.path.isfile(pages_path):
+        return jsonify({"error": "Paquete no encontrado."}), 404
+    try:
+        record = output_bundle.read_page(pages_path, page_number)
+    except Exception as e:
+        logger.log_error(f"Error leyendo página {page_number} de {pages_path}: {safe_str(e)}")
+        return jsonify({"error": safe_str(e)}), 500
+    if record is None:
+        return jsonify({"error": "Página no encontrada."}), 404
+    return jsonify(record)
+
+# -------------------------------
+# Ruta para ver los logs (paginada)
+# ?tail=N últimas líneas | ?offset=B&generation=G&limit=N desde un byte (usar next_offset y generation)
+# ?level=INFO|ERROR filtra por nivel | ?format=json devuelve también los desplazamientos
 # -------------------------------
 @app.route('/logs')
 def get_logs():
-    return logger.get_log_content()
+    page = logger.read_log(
+        tail=request.args.get('tail', type=int),
+        offset=request.args.get('offset', type=int),
+        limit=request.args.get('limit', type=int),
+        level=request.args.get('level'),
+        generation=request.args.get('generation', type=int),
+    )
+    if request.args.get('format') == 'json':
+        return jsonify(page)
+    return "\n".join(page["lines"]), 200, {"Content-Type": "text/plain; charset=utf-8"}
+
+# -------------------------------
+# Métricas agregadas: páginas/s y latencias p50/p95 por etapa
+# JSON por defecto; ?format=prometheus devuelve el formato de texto de Prometheus
+# -------------------------------
+@app.route('/metrics')
+def get_metrics():
+    snap = metrics.snapshot()
+    if request.args.get('format') == 'prometheus':
+        return metrics.to_prometheus(snap), 200, {"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
+    return jsonify(snap)
 
 # -------------------------------
 # Ejecutar servidor Flask
@@ -0,0 +1,78 @@
+import os
+import sys
+import time
+import json
+import argparse
+
+# -------------------------------
+# Asegurar que la carpeta base del proyecto está en sys.path
+# -------------------------------
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (BASE_DIR, os.path.join(BASE_DIR, "ocr_utils")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+from ocr_utils import ocr_processor
+
+# -------------------------------
+# Benchmark: OCR página a página vs. OCR por lotes (CPU)
+# Las páginas pasan por el mismo camino que en producción: preprocesado,
+# recorte al contenido y mosaicos (crop_and_tile) y recognize_pages
+# Uso: python benchmarks/batch_ocr.py documento.pdf --pages 8 --batch-sizes 2 4 8
+# -------------------------------
+def parse_args():
+    parser = argparse.ArgumentParser(description="Compara páginas/s del OCR página a página y por lotes")
+    parser.add_argument("pdf", help="PDF de prueba")
+    parser.add_argument("--pages", type=int, default=8, help="Páginas a usar del inicio del PDF")
+    parser.add_argument("--dpi", type=int, default=ocr_processor.OCR_DPI)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[2, 4, 8])
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+
+    # Rasterizar, preprocesar y recortar una sola vez: solo se mide la etapa de OCR
+    images = [
+        ocr_processor.crop_and_tile(ocr_processor.preprocess_image(image))
+        for _, image in ocr_processor.iter_pdf_pages(args.pdf, dpi=args.dpi, pages=range(1, args.pages + 1))
+    ]
+    if not images:
+        print("No se pudieron rasterizar páginas.")
+        return 1
+
+    # Calentar el modelo para no medir la primera inferencia
+    ocr_processor.recognize_pages(images[:1])
+
+    results = {"pages": len(images), "dpi": args.dpi}
+
+    start = time.perf_counter()
+    for image in images:
+        ocr_processor.recognize_pages([image])
+    elapsed = time.perf_counter() - start
+    results["per_page"] = {"seconds": round(elapsed, 3), "pages_per_sec": round(len(images) / elapsed, 3)}
+
+    # Llamadas reales a EasyOCR durante los lotes: con páginas recortadas (tamaños
+    # distintos) debe seguir habiendo llamadas a readtext_batched
+    calls = getattr(ocr_processor.get_engine("easyocr"), "calls", None)
+    if calls is not None:
+        calls.update(single=0, batched=0)
+
+    for batch_size in args.batch_sizes:
+        start = time.perf_counter()
+        for offset in range(0, len(images), batch_size):
+            ocr_processor.recognize_pages(images[offset:offset + batch_size])
+        elapsed = time.perf_counter() - start
+        results[f"batch_{batch_size}"] = {"seconds": round(elapsed, 3), "pages_per_sec": round(len(images) / elapsed, 3)}
+
+    batching_expected = ocr_processor.OCR_ENGINE == "easyocr" and len(images) > 1 and max(args.batch_sizes) > 1
+    if calls is not None:
+        results["easyocr_calls"] = dict(calls)
+    print(json.dumps(results, indent=2))
+
+    if batching_expected and calls is not None and calls["batched"] == 0:
+        print("ERROR: ninguna llamada a readtext_batched; el recorte ha desactivado el OCR por lotes")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
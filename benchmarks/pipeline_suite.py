@@ -0,0 +1,186 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+
+# -------------------------------
+# Asegurar que la carpeta base del proyecto está en sys.path
+# -------------------------------
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (BASE_DIR, os.path.join(BASE_DIR, "ocr_utils")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+from ocr_utils import logger
+from ocr_utils import metrics
+from ocr_utils import ocr_cache
+from ocr_utils import search_index
+from ocr_utils import ocr_processor
+from ocr_utils import batch_processor
+import synthetic_docs
+
+# -------------------------------
+# Configuración
+# -------------------------------
+DEFAULT_WORKDIR = os.path.join(BASE_DIR, "output", "benchmarks")
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+DEFAULT_TOLERANCE = 0.15  # Empeoramiento relativo que se marca como regresión
+MIN_STAGE_SECONDS = 0.005  # Latencias menores se ignoran al comparar (ruido de medida)
+
+# Escenarios: documentos sintéticos con distintas dificultades
+SCENARIOS = {
+    "limpio": dict(),
+    "inclinado": dict(skew=3.0),
+    "ruidoso": dict(noise=35.0),
+    "con_blancos": dict(blank_ratio=0.25),
+    "capa_texto": dict(text_layer_ratio=0.5),
+}
+
+# -------------------------------
+# Benchmark reproducible del pipeline completo (OCR + división + metadatos)
+# Uso:
+#   python benchmarks/pipeline_suite.py --pages 4 --save-baseline   (guardar referencia)
+#   python benchmarks/pipeline_suite.py --pages 4                   (comparar con la referencia)
+# Sale con código 1 si alguna métrica empeora más que la tolerancia
+# -------------------------------
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark del pipeline OCR con PDFs escaneados sintéticos")
+    parser.add_argument("--pages", type=int, default=4, help="Páginas por documento sintético")
+    parser.add_argument("--scenarios", nargs="+", default=list(SCENARIOS), choices=list(SCENARIOS))
+    parser.add_argument("--repeat", type=int, default=1, help="Repeticiones por escenario (se usa la mejor)")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--workdir", default=DEFAULT_WORKDIR, help="Carpeta de PDFs generados y salidas")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Archivo JSON de referencia")
+    parser.add_argument("--save-baseline", action="store_true", help="Guardar los resultados como referencia")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument("--output", help="Guardar los resultados en este JSON")
+    return parser.parse_args()
+
+# -------------------------------
+# Ajustes que condicionan los tiempos: si difieren de la referencia, se avisa
+# -------------------------------
+def environment():
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "settings": batch_processor.manifest_settings(),
+    }
+
+# -------------------------------
+# Ejecuta un escenario: genera (o reutiliza) el PDF y lo procesa sin caché ni reanudación
+# -------------------------------
+def run_scenario(name, args):
+    spec = synthetic_docs.document_spec(name, pages=args.pages, seed=args.seed, **SCENARIOS[name])
+    pdf_path = synthetic_docs.generate_document(spec, os.path.join(args.workdir, "pdfs"))
+
+    best = None
+    for _ in range(max(1, args.repeat)):
+        output_path = os.path.join(args.workdir, "salida", name)
+        shutil.rmtree(output_path, ignore_errors=True)
+        result = batch_processor.process_document(pdf_path, output_path, resume=False)
+        if best is None or result["metrics"]["seconds"] < best["metrics"]["seconds"]:
+            best = result
+
+    run_metrics = best["metrics"]
+    stages = metrics.summarize_timings(run_metrics["timings"])
+    for entry in stages.values():
+        entry["pages_per_sec"] = round(entry["count"] / entry["seconds"], 3) if entry["seconds"] else None
+
+    pages = best.get("pages", 0)
+    return {
+        "spec": spec,
+        "ok": best["ok"],
+        "error": best.get("error"),
+        "pages": pages,
+        "seconds": run_metrics["seconds"],
+        "pages_per_sec": round(pages / run_metrics["seconds"], 3) if run_metrics["seconds"] else None,
+        "peak_memory_mb": run_metrics["peak_memory_mb"],
+        "stages": stages,
+        "counters": {key: value for key, value in (best.get("stats") or {}).items() if not isinstance(value, dict)},
+    }
+
+# -------------------------------
+# Comparación con la referencia: menos páginas/s, más latencia o más memoria
+# que la tolerancia se marcan como regresión
+# -------------------------------
+def compare(results, baseline, tolerance):
+    regressions = []
+
+    def check(scenario, metric, current, reference, higher_is_better):
+        if current is None or not reference:
+            return
+        change = (current - reference) / reference
+        worse = -change if higher_is_better else change
+        if worse > tolerance:
+            regressions.append({
+                "scenario": scenario, "metric": metric,
+                "baseline": reference, "current": current, "change": round(change, 3),
+            })
+
+    for scenario, current in results["scenarios"].items():
+        reference = baseline.get("scenarios", {}).get(scenario)
+        if reference is None:
+            continue
+        if reference.get("spec") != current["spec"]:
+            print(f"Aviso: el escenario '{scenario}' no coincide con la referencia; se omite la comparación")
+            continue
+        check(scenario, "pages_per_sec", current["pages_per_sec"], reference.get("pages_per_sec"), True)
+        check(scenario, "peak_memory_mb", current["peak_memory_mb"], reference.get("peak_memory_mb"), False)
+        for stage, entry in current["stages"].items():
+            ref_entry = reference.get("stages", {}).get(stage)
+            if not ref_entry or max(entry["p50"], ref_entry["p50"]) < MIN_STAGE_SECONDS:
+                continue
+            check(scenario, f"{stage}.p50", entry["p50"], ref_entry["p50"], False)
+            check(scenario, f"{stage}.p95", entry["p95"], ref_entry["p95"], False)
+    return regressions
+
+def main():
+    args = parse_args()
+    os.makedirs(args.workdir, exist_ok=True)
+
+    # Resultados reproducibles: log propio, sin caché de OCR ni índice de búsqueda
+    logger.init_logger(os.path.join(args.workdir, "benchmark.log"))
+    ocr_cache.configure(None)
+    search_index.configure(None)
+    ocr_processor.warm_up_reader()
+
+    results = {"created_at": time.strftime("%Y-%m-%d %H:%M:%S"), "environment": environment(), "scenarios": {}}
+    for name in args.scenarios:
+        print(f"Escenario {name}...")
+        results["scenarios"][name] = run_scenario(name, args)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(json.dumps(results["scenarios"], ensure_ascii=False, indent=2))
+        print(f"Referencia guardada en {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(json.dumps(results["scenarios"], ensure_ascii=False, indent=2))
+        print(f"No hay referencia en {args.baseline}; ejecutar con --save-baseline para crearla")
+        return 0
+
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    if baseline.get("environment") != results["environment"]:
+        print("Aviso: entorno o ajustes distintos de la referencia; los tiempos pueden no ser comparables")
+
+    regressions = compare(results, baseline, args.tolerance)
+    print(json.dumps({"scenarios": results["scenarios"], "regressions": regressions}, ensure_ascii=False, indent=2))
+    if regressions:
+        print(f"{len(regressions)} regresiones por encima del {args.tolerance:.0%}")
+        return 1
+    print("Sin regresiones respecto a la referencia")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
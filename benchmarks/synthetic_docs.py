@@ -0,0 +1,149 @@
+import io
+import os
+import json
+import random
+import hashlib
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+from fpdf import FPDF
+from PyPDF2 import PdfReader, PdfWriter
+
+# -------------------------------
+# Generador de PDFs escaneados sintéticos (reproducibles con una semilla)
+# Cada página es una imagen de texto con inclinación y ruido configurables,
+# una página en blanco o una página con capa de texto real
+# -------------------------------
+PAGE_SIZE_INCHES = (8.27, 11.69)  # A4
+SCAN_DPI = 200  # Resolución de las imágenes incrustadas
+FONT_CANDIDATES = ("DejaVuSans.ttf", "Arial.ttf", "arial.ttf", "LiberationSans-Regular.ttf")
+FONT_SIZE = 34
+LINES_PER_PAGE = 28
+
+VOCABULARY = (
+    "contrato factura cliente proveedor fecha importe total pago cuenta banco "
+    "documento firma empresa dirección ciudad teléfono correo servicio producto "
+    "cantidad precio impuesto descuento pedido entrega plazo condiciones anexo "
+    "registro expediente solicitud resolución artículo cláusula periodo informe"
+).split()
+
+# -------------------------------
+# Parámetros de un documento sintético
+# -------------------------------
+def document_spec(name, pages=4, skew=0.0, noise=0.0, blank_ratio=0.0, text_layer_ratio=0.0, seed=1234):
+    return {
+        "name": name,
+        "pages": int(pages),
+        "skew": float(skew),
+        "noise": float(noise),
+        "blank_ratio": float(blank_ratio),
+        "text_layer_ratio": float(text_layer_ratio),
+        "seed": int(seed),
+    }
+
+def spec_hash(spec):
+    data = dict(spec, scan_dpi=SCAN_DPI, font_size=FONT_SIZE, lines=LINES_PER_PAGE)
+    return hashlib.sha256(json.dumps(data, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+
+# -------------------------------
+# Reparte los tipos de página de forma determinista
+# -------------------------------
+def page_kinds(spec):
+    rng = random.Random(spec["seed"])
+    count = spec["pages"]
+    kinds = ["scan"] * count
+    indexes = list(range(count))
+    rng.shuffle(indexes)
+    blanks = int(round(count * spec["blank_ratio"]))
+    layers = int(round(count * spec["text_layer_ratio"]))
+    for idx in indexes[:blanks]:
+        kinds[idx] = "blank"
+    for idx in indexes[blanks:blanks + layers]:
+        kinds[idx] = "text_layer"
+    return kinds
+
+def _font():
+    for name in FONT_CANDIDATES:
+        try:
+            return ImageFont.truetype(name, FONT_SIZE)
+        except (OSError, IOError):
+            continue
+    return ImageFont.load_default()
+
+def _page_text(rng):
+    lines = []
+    for _ in range(LINES_PER_PAGE):
+        words = [rng.choice(VOCABULARY) for _ in range(rng.randint(5, 9))]
+        words[0] = words[0].capitalize()
+        lines.append(" ".join(words) + rng.choice((".", ",", ":", "")))
+    return "\n".join(lines)
+
+# -------------------------------
+# Página escaneada: texto negro sobre blanco, rotada y con ruido gaussiano
+# -------------------------------
+def render_scan_page(text, skew, noise, seed):
+    width, height = int(PAGE_SIZE_INCHES[0] * SCAN_DPI), int(PAGE_SIZE_INCHES[1] * SCAN_DPI)
+    image = Image.new("L", (width, height), 255)
+    draw = ImageDraw.Draw(image)
+    font = _font()
+    margin = int(0.08 * width)
+    line_height = int(FONT_SIZE * 1.6)
+    for idx, line in enumerate(text.split("\n")):
+        draw.text((margin, margin + idx * line_height), line, fill=0, font=font)
+
+    if skew:
+        image = image.rotate(skew, resample=Image.BICUBIC, expand=False, fillcolor=255)
+
+    if noise:
+        rng = np.random.default_rng(seed)
+        pixels = np.asarray(image, dtype=np.float32)
+        pixels += rng.normal(0.0, noise, pixels.shape)
+        image = Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8), mode="L")
+    return image
+
+def render_blank_page(noise, seed):
+    return render_scan_page("", 0.0, noise, seed)
+
+def _image_pdf_bytes(image):
+    buffer = io.BytesIO()
+    image.convert("RGB").save(buffer, format="PDF", resolution=SCAN_DPI)
+    return buffer.getvalue()
+
+def _text_pdf_bytes(text):
+    pdf = FPDF()
+    pdf.add_page()
+    pdf.set_font("Arial", size=11)
+    pdf.set_auto_page_break(auto=True, margin=15)
+    for line in text.encode("latin-1", errors="replace").decode("latin-1").split("\n"):
+        pdf.multi_cell(0, 6, line)
+    data = pdf.output(dest="S")
+    return data.encode("latin-1") if isinstance(data, str) else bytes(data)
+
+# -------------------------------
+# Genera el PDF (o lo reutiliza si ya existe con los mismos parámetros)
+# Devuelve la ruta del PDF
+# -------------------------------
+def generate_document(spec, folder):
+    os.makedirs(folder, exist_ok=True)
+    path = os.path.join(folder, f"{spec['name']}_{spec_hash(spec)}.pdf")
+    if os.path.exists(path):
+        return path
+
+    rng = random.Random(spec["seed"])
+    writer = PdfWriter()
+    for idx, kind in enumerate(page_kinds(spec)):
+        page_seed = spec["seed"] * 1000 + idx
+        if kind == "blank":
+            data = _image_pdf_bytes(render_blank_page(spec["noise"], page_seed))
+        elif kind == "text_layer":
+            data = _text_pdf_bytes(_page_text(rng))
+        else:
+            data = _image_pdf_bytes(render_scan_page(_page_text(rng), spec["skew"], spec["noise"], page_seed))
+        for page in PdfReader(io.BytesIO(data)).pages:
+            writer.add_page(page)
+
+    # Escritura atómica: un PDF a medias no se reutiliza en la siguiente ejecución
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        writer.write(f)
+    os.replace(tmp_path, path)
+    return path
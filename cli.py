@@ -0,0 +1,204 @@
+import os
+import sys
+import json
+import signal
+import argparse
+import threading
+
+# -------------------------------
+# Asegurar que la carpeta base del proyecto está en sys.path
+# -------------------------------
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+UTILS_PATH = os.path.join(BASE_DIR, "ocr_utils")
+if UTILS_PATH not in sys.path:
+    sys.path.insert(0, UTILS_PATH)
+
+from ocr_utils import batch_processor
+from ocr_utils import ocr_cache
+from ocr_utils import logger
+from ocr_utils import ocr_processor
+from ocr_utils import folder_watcher
+from ocr_utils import search_index
+from ocr_utils import resource_guard
+
+# -------------------------------
+# Códigos de salida
+# -------------------------------
+EXIT_OK = 0
+EXIT_FAILURES = 1  # Algún documento falló, quedó sin texto o con páginas fallidas
+EXIT_USAGE = 2  # Argumentos o rutas no válidos
+EXIT_CANCELLED = 130  # Interrumpido con Ctrl+C
+
+# -------------------------------
+# Procesamiento por lotes sin servidor web (cron, nodos de proceso)
+# Uso: python cli.py carpeta_entrada carpeta_salida --workers 4 --dpi 300 --engine auto
+# Imprime un resumen JSON en stdout; el detalle queda en el log
+# Con --watch se queda vigilando la carpeta y procesa cada PDF nuevo al terminar de copiarse
+# -------------------------------
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="OCR por lotes de una carpeta de PDFs")
+    parser.add_argument("input_folder", help="Carpeta con los PDFs de entrada")
+    parser.add_argument("output_folder", help="Carpeta de resultados")
+    parser.add_argument("--workers", type=int, default=batch_processor.OCR_WORKERS,
+                        help="Procesos OCR en paralelo")
+    parser.add_argument("--dpi", type=int, default=ocr_processor.OCR_DPI,
+                        help="Resolución final de rasterizado")
+    parser.add_argument("--engine", choices=["easyocr", "tesseract", "auto"], default=ocr_processor.OCR_ENGINE)
+    parser.add_argument("--cache-dir", default=os.environ.get("OCR_CACHE_DIR"),
+                        help="Carpeta de la caché OCR (por defecto OCR_CACHE_DIR; vacío = sin caché)")
+    parser.add_argument("--index", default=os.environ.get("OCR_INDEX_PATH"),
+                        help="Índice de búsqueda SQLite (por defecto OCR_INDEX_PATH; vacío = sin índice)")
+    parser.add_argument("--bundle", action="store_true",
+                        help="Un paquete por documento (.pages.jsonl, índice y PDF combinado) en lugar de archivos por página")
+    parser.add_argument("--memory-budget", type=int, default=resource_guard.MEMORY_BUDGET_MB,
+                        help="MB de memoria para el OCR entre todos los procesos (0 = automático)")
+    parser.add_argument("--page-timeout", type=float, default=resource_guard.PAGE_TIMEOUT_SECONDS,
+                        help="Segundos máximos de OCR por página (0 = sin límite)")
+    parser.add_argument("--no-resume", action="store_true",
+                        help="Reprocesar todo, ignorando el manifiesto de la carpeta de salida")
+    parser.add_argument("--log", help="Archivo de log (por defecto carpeta_salida/proceso.log)")
+    parser.add_argument("--summary-file", help="Guardar también el resumen JSON en este archivo")
+    parser.add_argument("--watch", action="store_true",
+                        help="Vigilar la carpeta de entrada y procesar los PDFs nuevos o modificados")
+    parser.add_argument("--poll", action="store_true", help="Con --watch, usar polling en lugar de inotify")
+    return parser.parse_args(argv)
+
+# -------------------------------
+# Aplica las opciones a la configuración de los módulos; los procesos del pool
+# la reciben a través del snapshot de batch_processor
+# -------------------------------
+def configure(args):
+    ocr_processor.DEBUG = False  # stdout queda solo para el resumen JSON
+    ocr_processor.OCR_DPI = args.dpi
+    ocr_processor.OCR_ENGINE = args.engine
+    if args.bundle:
+        ocr_processor.OUTPUT_MODE = "bundle"
+    resource_guard.MEMORY_BUDGET_MB = args.memory_budget
+    resource_guard.PAGE_TIMEOUT_SECONDS = args.page_timeout
+    ocr_cache.configure(args.cache_dir or None)
+    search_index.configure(os.path.abspath(args.index) if args.index else None)
+
+# -------------------------------
+# Resumen legible por máquina (sin los tiempos por página)
+# -------------------------------
+def build_summary(result, args):
+    files = []
+    for item in result["results"]:
+        run_metrics = item.get("metrics") or {}
+        files.append({
+            "file": item["file"],
+            "ok": item["ok"],
+            "skipped": bool(item.get("skipped")),
+            "pages": item.get("pages", 0),
+            "failed_pages": item.get("failed_pages", 0),
+            "seconds": run_metrics.get("seconds"),
+            "peak_memory_mb": run_metrics.get("peak_memory_mb"),
+            "error": item.get("error"),
+        })
+    return {
+        "input_folder": os.path.abspath(args.input_folder),
+        "output_folder": os.path.abspath(args.output_folder),
+        "workers": args.workers,
+        "dpi": args.dpi,
+        "engine": args.engine,
+        "processed": result["processed"],
+        "skipped": result["skipped"],
+        "failed": result["failed"],
+        "cancelled": result["cancelled"],
+        "duration": result["duration"],
+        "stats": result["stats"],
+        "report": result.get("report"),
+        "files": files,
+    }
+
+def main(argv=None):
+    args = parse_args(argv)
+    input_path = os.path.abspath(args.input_folder)
+    output_path = os.path.abspath(args.output_folder)
+
+    if not os.path.isdir(input_path):
+        print(json.dumps({"error": f"Carpeta de entrada no encontrada: {input_path}"}, ensure_ascii=False))
+        return EXIT_USAGE
+    if args.workers < 1 or args.dpi < 50:
+        print(json.dumps({"error": "workers debe ser >= 1 y dpi >= 50"}, ensure_ascii=False))
+        return EXIT_USAGE
+
+    os.makedirs(output_path, exist_ok=True)
+    logger.init_logger(os.path.abspath(args.log) if args.log else os.path.join(output_path, "proceso.log"))
+    configure(args)
+
+    # Primer Ctrl+C: no se envían más documentos; el segundo interrumpe de inmediato
+    cancel_event = threading.Event()
+
+    def on_interrupt(signum, frame):
+        if cancel_event.is_set():
+            raise KeyboardInterrupt
+        logger.log_info("Interrupción recibida: se termina el documento en curso y se detiene el lote")
+        cancel_event.set()
+
+    signal.signal(signal.SIGINT, on_interrupt)
+
+    if args.watch:
+        return watch(input_path, output_path, args, cancel_event)
+
+    logger.log_info(f"Procesamiento por línea de comandos: {input_path} → {output_path}")
+    try:
+        result = batch_processor.run_batch(
+            input_path, output_path, workers=args.workers, cancel_event=cancel_event,
+            resume=not args.no_resume
+        )
+    except KeyboardInterrupt:
+        logger.log_error("Procesamiento interrumpido")
+        logger.flush()
+        return EXIT_CANCELLED
+
+    summary = build_summary(result, args)
+    text = json.dumps(summary, ensure_ascii=False, indent=2)
+    print(text)
+    if args.summary_file:
+        try:
+            with open(args.summary_file, "w", encoding="utf-8") as f:
+                f.write(text)
+        except Exception as e:
+            logger.log_error(f"Error guardando resumen: {safe_str(e)}")
+
+    logger.flush()
+    if result["cancelled"]:
+        return EXIT_CANCELLED
+    return EXIT_FAILURES if result["failed"] or result["stats"].get("failed_pages") else EXIT_OK
+
+# -------------------------------
+# Modo vigilancia: se ejecuta hasta Ctrl+C y termina los documentos en curso
+# -------------------------------
+def watch(input_path, output_path, args, cancel_event):
+    watcher = folder_watcher.FolderWatcher(
+        input_path, output_path, workers=args.workers, resume=not args.no_resume, use_inotify=not args.poll
+    )
+    stopper = threading.Thread(target=lambda: (cancel_event.wait(), watcher.stop()), daemon=True)
+    stopper.start()
+    try:
+        watcher.run()
+    except KeyboardInterrupt:
+        logger.log_error("Vigilancia interrumpida")
+        logger.flush()
+        return EXIT_CANCELLED
+
+    summary = watcher.to_dict()
+    print(json.dumps(summary, ensure_ascii=False, indent=2))
+    logger.flush()
+    return EXIT_FAILURES if summary["status"] == "error" else EXIT_OK
+
+# -------------------------------
+# Utilidad para evitar errores de codificación
+# -------------------------------
+def safe_str(obj):
+    try:
+        return str(obj)
+    except Exception:
+        try:
+            return str(obj).encode('utf-8', errors='replace').decode('utf-8', errors='replace')
+        except Exception:
+            return "[Error al convertir a string]"
+
+if __name__ == '__main__':
+    sys.exit(main())
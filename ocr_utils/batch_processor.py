@@ -0,0 +1,343 @@
+import os
+import time
+import signal
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from ocr_utils import logger
+from ocr_utils import ocr_processor
+from ocr_utils import ocr_cache
+from ocr_utils import ocr_engines
+from ocr_utils import preprocessing
+from ocr_utils import pdf_splitter
+from ocr_utils import metrics
+from ocr_utils import search_index
+from ocr_utils import task_store
+from ocr_utils import resource_guard
+from ocr_utils import manifest as manifest_store
+from ocr_utils.manifest import Manifest
+from ocr_utils.logger import log_info, log_error
+
+# -------------------------------
+# Configuración
+# -------------------------------
+OCR_WORKERS = int(os.environ.get("OCR_WORKERS", "1"))  # Procesos OCR en paralelo
+OCR_MAX_WORKERS = int(os.environ.get("OCR_MAX_WORKERS", "0")) or os.cpu_count() or 1  # Máximo aceptado desde la web
+RESUME = True  # Omitir documentos sin cambios y reanudar los incompletos (manifiesto)
+
+# -------------------------------
+# Lista los PDFs de la carpeta de entrada
+# -------------------------------
+def list_input_pdfs(input_path):
+    return sorted(
+        os.path.join(input_path, file)
+        for file in os.listdir(input_path)
+        if file.lower().endswith(".pdf")
+    )
+
+# -------------------------------
+# Ajustes registrados en el manifiesto: si cambian, el documento se reprocesa
+# -------------------------------
+def manifest_settings():
+    return dict(
+        ocr_processor.ocr_settings(),
+        adaptive_dpi=ocr_processor.ADAPTIVE_DPI,
+        low_dpi=ocr_processor.LOW_DPI,
+        text_layer=ocr_processor.USE_TEXT_LAYER,
+        output_mode=ocr_processor.OUTPUT_MODE,
+    )
+
+# -------------------------------
+# Metadatos de los PDFs generados: se escriben junto con cada archivo
+# -------------------------------
+def document_metadata(pdf_path):
+    return {
+        "Title": os.path.basename(pdf_path),
+        "Producer": "OCR App",
+        "CustomID": f"{int(time.time())}"
+    }
+
+# -------------------------------
+# Procesa un documento completo: OCR, división y metadatos
+# Con resume=True se consulta el manifiesto de la carpeta de salida para
+# omitir documentos sin cambios y reanudar los que quedaron a medias
+# El resultado incluye 'metrics': duración, pico de memoria y tiempos por etapa
+# -------------------------------
+def process_document(pdf_path, output_path, resume=None):
+    timings = {}
+    start = time.perf_counter()
+    with metrics.MemorySampler() as memory:
+        result = _process_document(pdf_path, output_path, resume, timings)
+
+    result["metrics"] = {
+        "seconds": round(time.perf_counter() - start, 3),
+        "peak_memory_mb": memory.peak_mb,
+        "timings": timings,
+    }
+    if not result.get("skipped"):
+        stages = metrics.summarize_timings(timings)
+        log_info(
+            f"Tiempos de {result['file']}: {result['metrics']['seconds']}s, pico de memoria {memory.peak_mb} MB | "
+            + " | ".join(f"{stage} p50 {entry['p50']}s p95 {entry['p95']}s" for stage, entry in stages.items())
+        )
+    return result
+
+def _process_document(pdf_path, output_path, resume, timings):
+    resume = RESUME if resume is None else resume
+    file = os.path.basename(pdf_path)
+    base_name = os.path.splitext(file)[0]
+    temp_output_dir = os.path.join(output_path, base_name)
+
+    manifest = Manifest(output_path)
+    try:
+        settings = manifest_settings()
+        done_pages = set()
+        if resume:
+            state, done_pages = manifest.check_document(pdf_path, settings)
+            if state == "done":
+                log_info(f"Sin cambios desde la última ejecución, se omite: {file}")
+                return {"file": file, "ok": True, "pages": 0, "error": None, "skipped": True,
+                        "stats": {"skipped_documents": 1}}
+        else:
+            manifest.reset_document(pdf_path)
+
+        os.makedirs(temp_output_dir, exist_ok=True)
+        manifest.begin_document(pdf_path, settings)
+
+        metadata = document_metadata(pdf_path)
+
+        log_info(f"Iniciando OCR para: {file}")
+        stats = ocr_processor.ocr_pdf_to_text(
+            pdf_path, temp_output_dir, metadata=metadata, skip_pages=done_pages,
+            on_page=lambda page, status, txt_path: manifest.record_page(pdf_path, page, status, txt_path)
+        ) or {}
+        timings.update(stats.pop("timings", {}))
+        total_pages = stats.get("document_pages") or None  # Del PDF completo, no solo de esta ejecución
+
+        # Páginas con texto según el manifiesto (incluye las de ejecuciones anteriores)
+        if manifest.pages_with_text(pdf_path) == 0:
+            log_error(f"OCR fallido o sin texto: {file}")
+            manifest.finish_document(pdf_path, "no_text", total_pages)
+            if os.path.exists(temp_output_dir) and not os.listdir(temp_output_dir):
+                os.rmdir(temp_output_dir)
+            return {"file": file, "ok": False, "pages": stats.get("pages", 0), "error": "sin texto", "stats": stats}
+
+        # Dividir PDF original (opcional) con metadatos en una sola pasada
+        # En modo paquete no se generan archivos por página
+        if ocr_processor.OUTPUT_MODE != "bundle":
+            with metrics.timed(timings, "split_metadata", total_pages or 1):
+                pdf_splitter.split_pdf_with_metadata(pdf_path, temp_output_dir, metadata)
+
+        # Con páginas fallidas (OCR o escritura) el documento queda a medias:
+        # se reanuda en la próxima ejecución
+        if stats.get("failed_pages"):
+            manifest.finish_document(pdf_path, "partial", total_pages)
+            log_error(f"Procesado con {stats['failed_pages']} páginas fallidas: {file}")
+        else:
+            manifest.finish_document(pdf_path, "done", total_pages)
+            log_info(f"Procesado correctamente: {file}")
+        return {"file": file, "ok": True, "pages": stats.get("pages", 0), "error": None, "stats": stats,
+                "failed_pages": stats.get("failed_pages", 0)}
+    finally:
+        manifest.close()
+
+# -------------------------------
+# Módulos cuya configuración (constantes en mayúsculas) se replica en los procesos del pool
+# -------------------------------
+_CONFIG_MODULES = {
+    "ocr_processor": ocr_processor,
+    "ocr_cache": ocr_cache,
+    "preprocessing": preprocessing,
+    "pdf_splitter": pdf_splitter,
+    "search_index": search_index,
+    "task_store": task_store,
+    "resource_guard": resource_guard,
+    "manifest": manifest_store,
+}
+
+def _snapshot_config():
+    simple_types = (bool, int, float, str, list, tuple, dict, type(None))
+    return {
+        name: {key: value for key, value in vars(module).items()
+               if key.isupper() and isinstance(value, simple_types)}
+        for name, module in _CONFIG_MODULES.items()
+    }
+
+def _apply_config(config):
+    for name, values in config.items():
+        module = _CONFIG_MODULES.get(name)
+        if module is not None:
+            for key, value in values.items():
+                setattr(module, key, value)
+
+# -------------------------------
+# Inicializa cada proceso del pool: log compartido, configuración del padre
+# y lector OCR precargado
+# -------------------------------
+def _init_worker(log_path, config):
+    # Ctrl+C lo gestiona el proceso padre (cancelación ordenada del lote)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    logger.attach_logger(log_path)
+    _apply_config(config)
+    ocr_processor.warm_up_reader()
+    log_info(f"Proceso OCR {os.getpid()} listo (lector cargado)")
+
+# -------------------------------
+# Pool de procesos OCR con el log y la configuración del proceso actual
+# 'spawn': cada proceso crea su propio easyocr.Reader (evita heredar hilos de torch)
+# El presupuesto de memoria se calcula aquí una vez y se reparte entre los procesos
+# -------------------------------
+def create_worker_pool(workers):
+    context = multiprocessing.get_context("spawn")
+    config = _snapshot_config()
+    config["resource_guard"].update(MEMORY_BUDGET_MB=resource_guard.total_budget_mb(), PROCESS_SHARE=workers)
+    return ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                               initializer=_init_worker, initargs=(logger.log_path, config))
+
+# -------------------------------
+# Envoltura segura: nunca propaga excepciones al proceso padre
+# -------------------------------
+def process_document_safe(pdf_path, output_path, resume=None):
+    try:
+        return process_document(pdf_path, output_path, resume)
+    except Exception as e:
+        file = os.path.basename(pdf_path)
+        log_error(f"Error procesando {file}: {safe_str(e)}")
+        return {"file": file, "ok": False, "pages": 0, "error": safe_str(e)}
+    finally:
+        # Los procesos del pool terminan sin ejecutar atexit: vaciar la cola del log aquí
+        logger.flush()
+
+# -------------------------------
+# Suma los contadores por página de todos los documentos del lote
+# -------------------------------
+def _sum_stats(results):
+    totals = {}
+    for result in results:
+        _add_stats(totals, result.get("stats") or {})
+    return totals
+
+def _add_stats(totals, stats):
+    for key, value in stats.items():
+        if isinstance(value, dict):
+            _add_stats(totals.setdefault(key, {}), value)
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            totals[key] = totals.get(key, 0) + value
+
+# -------------------------------
+# Notifica avance al llamador (p.ej. el gestor de trabajos)
+# -------------------------------
+def _notify(progress, file, status, result=None):
+    if progress is None:
+        return
+    try:
+        progress(file, status, result)
+    except Exception as e:
+        log_error(f"Error notificando avance de {file}: {safe_str(e)}")
+
+# -------------------------------
+# Procesa todos los PDFs de una carpeta, en serie o con un pool de procesos
+# progress(file, status, result): 'running' al iniciar y 'done' al terminar cada PDF
+# cancel_event: threading.Event que detiene el envío de nuevos documentos
+# -------------------------------
+def run_batch(input_path, output_path, workers=None, progress=None, cancel_event=None, pdf_paths=None,
+              resume=None):
+    workers = max(1, int(workers or OCR_WORKERS))
+    os.makedirs(output_path, exist_ok=True)
+    pdf_paths = list(pdf_paths) if pdf_paths is not None else list_input_pdfs(input_path)
+    results = []
+    start_time = time.time()
+
+    def cancelled():
+        return cancel_event is not None and cancel_event.is_set()
+
+    if workers == 1 or len(pdf_paths) <= 1:
+        for pdf_path in pdf_paths:
+            if cancelled():
+                break
+            file = os.path.basename(pdf_path)
+            _notify(progress, file, "running")
+            result = process_document_safe(pdf_path, output_path, resume)
+            metrics.record_document(result)
+            results.append(result)
+            _notify(progress, file, "done", result)
+    else:
+        workers = min(workers, len(pdf_paths))
+        log_info(f"Procesando {len(pdf_paths)} PDFs con {workers} procesos")
+        pending = list(reversed(pdf_paths))
+        with create_worker_pool(workers) as executor:
+            running = {}
+
+            # Solo se envían tantos documentos como procesos: permite informar
+            # qué archivo está en curso y cancelar sin descartar trabajo enviado
+            def submit_next():
+                while pending and len(running) < workers and not cancelled():
+                    pdf_path = pending.pop()
+                    _notify(progress, os.path.basename(pdf_path), "running")
+                    running[executor.submit(process_document_safe, pdf_path, output_path, resume)] = pdf_path
+
+            submit_next()
+            while running:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    file = os.path.basename(running.pop(future))
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        log_error(f"Error procesando {file}: {safe_str(e)}")
+                        result = {"file": file, "ok": False, "pages": 0, "error": safe_str(e)}
+                    metrics.record_document(result)
+                    results.append(result)
+                    _notify(progress, file, "done", result)
+                submit_next()
+
+    if cancelled():
+        log_info(f"Procesamiento cancelado: {len(pdf_paths) - len(results)} PDFs sin procesar")
+
+    end_time = time.time()
+    # Los documentos sin cambios (manifiesto) no cuentan como procesados
+    skipped_files = sum(1 for result in results if result.get("skipped"))
+    failed_files = sum(1 for result in results if not result["ok"])
+    processed_files = len(results) - skipped_files - failed_files
+    logger.log_benchmark(start_time, end_time, processed_files)
+    totals = _sum_stats(results)
+    if skipped_files:
+        log_info(f"Documentos sin cambios omitidos: {skipped_files}")
+    if totals.get("pages"):
+        log_info(
+            f"Páginas: {totals['pages']} | Con texto: {totals.get('pages_with_text', 0)}"
+            f" | Capa de texto (sin OCR): {totals.get('text_layer_pages', 0)}"
+            f" | Caché: {totals.get('cache_hits', 0)}"
+            f" | En blanco (sin OCR): {totals.get('blank_pages', 0)}"
+            f" | Ya procesadas (reanudación): {totals.get('skipped_pages', 0)}"
+            f" | Escaladas a DPI alto: {totals.get('escalated_pages', 0)}/{totals.get('low_dpi_pages', 0)}"
+        )
+    if totals.get("engines"):
+        log_info(f"Motores OCR: {ocr_engines.format_engine_stats(totals['engines'])}")
+
+    # Informe estructurado del lote junto a proceso.log (y agregados para /metrics)
+    report = metrics.build_run_report(results, end_time - start_time, workers, totals)
+    metrics.record_run(report)
+    report_path = metrics.write_run_report(report, logger.log_path)
+
+    return {
+        "processed": processed_files,
+        "skipped": skipped_files,
+        "failed": failed_files,
+        "cancelled": cancelled(),
+        "results": results,
+        "stats": totals,
+        "duration": round(end_time - start_time, 2),
+        "report": report_path,
+    }
+
+# -------------------------------
+# Utilidad segura para logs
+# -------------------------------
+def safe_str(obj):
+    try:
+        return str(obj)
+    except Exception:
+        try:
+            return str(obj).encode("utf-8", errors="replace").decode("utf-8", errors="replace")
+        except Exception:
+            return "[Error al convertir a string]"
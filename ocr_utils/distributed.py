@@ -0,0 +1,186 @@
+import os
+import time
+import threading
+from ocr_utils import batch_processor
+from ocr_utils import ocr_processor
+from ocr_utils import pdf_splitter
+from ocr_utils import metrics
+from ocr_utils import logger
+from ocr_utils import task_store
+from ocr_utils.manifest import Manifest
+from ocr_utils.task_store import TaskStore, worker_name
+from ocr_utils.logger import log_info, log_error
+
+# -------------------------------
+# Configuración
+# -------------------------------
+PAGES_PER_TASK = 0  # 0 = una tarea por documento; N = rangos de N páginas
+IDLE_POLL_SECONDS = 5.0  # Espera entre consultas cuando no hay tareas libres
+
+# -------------------------------
+# Alta de los PDFs de una carpeta en el almacén compartido
+# Documentos sin cambios conservan sus tareas; devuelve las tareas nuevas
+# -------------------------------
+def enqueue_folder(store, input_path, output_path, pages_per_task=None):
+    pages_per_task = PAGES_PER_TASK if pages_per_task is None else pages_per_task
+    added = 0
+    for pdf_path in batch_processor.list_input_pdfs(input_path):
+        total_pages = ocr_processor.get_pdf_page_count(pdf_path)
+        if total_pages <= 0:
+            log_error(f"No se pudo leer el número de páginas de {os.path.basename(pdf_path)}; no se encola")
+            continue
+        ranges = pdf_splitter.page_ranges(total_pages, pages_per_task) if pages_per_task else [(1, total_pages)]
+        added += store.add_document(os.path.abspath(pdf_path), os.path.abspath(output_path), total_pages, ranges)
+    log_info(f"Tareas nuevas en {store.path}: {added}")
+    return added
+
+# -------------------------------
+# Ejecuta una tarea: OCR del rango y división con metadatos de esas páginas
+# Las salidas por página no se pisan entre rangos del mismo documento
+# Cada rango lleva su propio manifiesto junto a las salidas: con páginas fallidas
+# la tarea falla y vuelve a la cola, y el siguiente intento (en cualquier nodo)
+# omite las páginas ya completadas y solo repite las demás
+# -------------------------------
+def process_task(task):
+    pdf_path = task["pdf_path"]
+    base_name = os.path.splitext(os.path.basename(pdf_path))[0]
+    temp_output_dir = os.path.join(task["output_path"], base_name)
+    os.makedirs(temp_output_dir, exist_ok=True)
+
+    page_range = (task["first_page"], task["last_page"])
+    metadata = batch_processor.document_metadata(pdf_path)
+    start = time.perf_counter()
+    manifest = Manifest(temp_output_dir, range_manifest_name(page_range))
+    try:
+        settings = batch_processor.manifest_settings()
+        _, done_pages = manifest.check_document(pdf_path, settings)
+        manifest.begin_document(pdf_path, settings, task.get("total_pages"))
+        with metrics.MemorySampler() as memory:
+            stats = ocr_processor.ocr_pdf_to_text(
+                pdf_path, temp_output_dir, metadata=metadata, page_range=page_range, skip_pages=done_pages,
+                on_page=lambda page, status, txt_path: manifest.record_page(pdf_path, page, status, txt_path)
+            ) or {}
+            timings = stats.pop("timings", {})
+            if stats.get("failed_pages"):
+                manifest.finish_document(pdf_path, "partial")
+                raise RuntimeError(f"{stats['failed_pages']} páginas fallidas en el rango {page_range[0]}-{page_range[1]}")
+            if ocr_processor.OUTPUT_MODE != "bundle":
+                with metrics.timed(timings, "split_metadata", page_range[1] - page_range[0] + 1):
+                    pdf_splitter.split_pdf_with_metadata(pdf_path, temp_output_dir, metadata, page_range=page_range)
+        manifest.finish_document(pdf_path, "done")
+    finally:
+        manifest.close()
+
+    return {
+        "pages": stats.get("pages", 0),
+        "pages_with_text": stats.get("pages_with_text", 0),
+        "skipped_pages": stats.get("skipped_pages", 0),
+        "failed_pages": stats.get("failed_pages", 0),
+        "seconds": round(time.perf_counter() - start, 3),
+        "peak_memory_mb": memory.peak_mb,
+        "stages": metrics.summarize_timings(timings),
+    }
+
+def range_manifest_name(page_range):
+    return f".ocr_manifest_paginas_{page_range[0]}_a_{page_range[1]}.sqlite"
+
+# -------------------------------
+# Latidos: renueva la concesión cada tercio de su duración mientras dura la tarea
+# -------------------------------
+class _Heartbeat:
+    def __init__(self, store, task_id, worker_id, lease_seconds):
+        self.store = store
+        self.task_id = task_id
+        self.worker_id = worker_id
+        self.lease_seconds = lease_seconds
+        self.lost = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="task-heartbeat", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(max(1.0, self.lease_seconds / 3.0)):
+            try:
+                if not self.store.heartbeat(self.task_id, self.worker_id, self.lease_seconds):
+                    self.lost = True
+                    log_error(f"Concesión perdida de la tarea {self.task_id} ({self.worker_id})")
+                    return
+            except Exception as e:
+                log_error(f"Error renovando la tarea {self.task_id}: {safe_str(e)}")
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        return False
+
+# -------------------------------
+# Bucle de un nodo: toma tareas hasta que no quede trabajo (o hasta stop_event)
+# Con exit_when_idle=False sigue esperando tareas nuevas
+# -------------------------------
+def run_worker(store_path, worker_id=None, lease_seconds=None, exit_when_idle=True, stop_event=None):
+    store = TaskStore(store_path)
+    worker_id = worker_id or worker_name()
+    lease_seconds = lease_seconds or task_store.LEASE_SECONDS
+    summary = {"worker": worker_id, "done": 0, "failed": 0, "lost": 0, "pages": 0}
+    log_info(f"Nodo {worker_id} atendiendo {store.path}")
+
+    while stop_event is None or not stop_event.is_set():
+        task = store.claim(worker_id, lease_seconds)
+        if task is None:
+            if exit_when_idle and not store.has_pending():
+                break
+            # Hay tareas en curso en otros nodos: si alguno muere, su tarea volverá a la cola
+            time.sleep(IDLE_POLL_SECONDS)
+            continue
+
+        label = f"{os.path.basename(task['pdf_path'])} págs. {task['first_page']}-{task['last_page']}"
+        log_info(f"Nodo {worker_id}: tarea {task['id']} ({label}), intento {task['attempts']}")
+        try:
+            with _Heartbeat(store, task["id"], worker_id, lease_seconds) as heartbeat:
+                result = process_task(task)
+            if heartbeat.lost or not store.complete(task["id"], worker_id, result):
+                summary["lost"] += 1
+                log_error(f"Tarea {task['id']} terminada sin concesión; se descarta el resultado ({label})")
+                continue
+            summary["done"] += 1
+            summary["pages"] += result["pages"]
+            log_info(f"Tarea {task['id']} terminada: {label} en {result['seconds']}s")
+        except Exception as e:
+            summary["failed"] += 1
+            log_error(f"Error en tarea {task['id']} ({label}): {safe_str(e)}")
+            store.fail(task["id"], worker_id, safe_str(e))
+        finally:
+            logger.flush()
+
+    log_info(f"Nodo {worker_id} sin más tareas: {summary}")
+    return summary
+
+# -------------------------------
+# Varios nodos locales (procesos del pool de batch_processor, con su misma
+# configuración): sirve para probar el reparto en una sola máquina
+# -------------------------------
+def run_local_workers(store_path, processes, lease_seconds=None, exit_when_idle=True):
+    processes = max(1, int(processes))
+    if processes == 1:
+        return [run_worker(store_path, lease_seconds=lease_seconds, exit_when_idle=exit_when_idle)]
+    with batch_processor.create_worker_pool(processes) as executor:
+        futures = [
+            executor.submit(run_worker, store_path, None, lease_seconds, exit_when_idle)
+            for _ in range(processes)
+        ]
+        return [future.result() for future in futures]
+
+# -------------------------------
+# Utilidad segura para logs
+# -------------------------------
+def safe_str(obj):
+    try:
+        return str(obj)
+    except Exception:
+        try:
+            return str(obj).encode("utf-8", errors="replace").decode("utf-8", errors="replace")
+        except Exception:
+            return "[Error al convertir a string]"
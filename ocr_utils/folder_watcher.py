@@ -0,0 +1,351 @@
+import os
+import time
+import uuid
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from ocr_utils import batch_processor
+from ocr_utils import metrics
+from ocr_utils.logger import log_info, log_error
+
+# -------------------------------
+# Configuración
+# -------------------------------
+WATCH_POLL_INTERVAL = float(os.environ.get("OCR_WATCH_POLL", "2.0"))  # Segundos entre escaneos (modo polling)
+WATCH_RESCAN_INTERVAL = 60.0  # Con inotify, escaneo de respaldo (carpetas de red sin eventos)
+WATCH_STABLE_SECONDS = 2.0  # Tamaño y mtime sin cambios durante este tiempo = copia terminada
+WATCH_INCOMPLETE_GRACE = 60.0  # Si falta %%EOF, se espera este tiempo extra antes de procesar igualmente
+WATCH_TICK = 0.5  # Intervalo del bucle principal
+WATCH_HISTORY = 50  # Últimos documentos conservados para consulta
+
+# -------------------------------
+# Estado global de las carpetas vigiladas
+# -------------------------------
+_watchers = {}
+_lock = threading.Lock()
+
+# -------------------------------
+# Error al vigilar (la carpeta ya se vigila con otra carpeta de salida)
+# -------------------------------
+class WatcherConflict(Exception):
+    def __init__(self, message, watcher):
+        super().__init__(message)
+        self.watcher = watcher
+
+# -------------------------------
+# Vigila una carpeta de entrada: detecta PDFs nuevos o modificados, espera a que
+# terminen de copiarse y los procesa con un pool acotado (workers documentos a la vez)
+# Los documentos sin cambios los omite el manifiesto de la carpeta de salida
+# -------------------------------
+class FolderWatcher:
+    def __init__(self, input_path, output_path, workers=None, resume=True, use_inotify=True):
+        self.id = uuid.uuid4().hex[:12]
+        self.input_path = input_path
+        self.output_path = output_path
+        self.workers = max(1, int(workers or batch_processor.OCR_WORKERS))
+        self.resume = resume
+        self.use_inotify = use_inotify
+        self.mode = None
+        self.status = "starting"
+        self.error = None
+        self.processed = 0
+        self.skipped = 0  # Sin cambios según el manifiesto
+        self.failed = 0
+        self.history = deque(maxlen=WATCH_HISTORY)
+        self.created_at = time.time()
+
+        self._seen = {}  # ruta → (tamaño, mtime) del último envío
+        self._pending = {}  # ruta → (tamaño, mtime, desde) en espera de estabilizarse
+        self._ready = deque()  # rutas listas para procesar
+        self._running = {}  # future → (ruta, inicio)
+        self._dirty = set()  # rutas modificadas mientras se procesaban
+        self._state_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    # -------------------------------
+    # Aviso de cambio en un archivo (eventos de inotify o escaneo)
+    # -------------------------------
+    def notify(self, path):
+        if not path.lower().endswith(".pdf"):
+            return
+        path = os.path.abspath(path)
+        with self._state_lock:
+            if path not in self._pending:
+                self._pending[path] = (None, None, time.monotonic())
+        self._wake.set()
+
+    # Escaneo completo: nuevos archivos o cambios de tamaño/mtime respecto al último envío
+    def _scan(self):
+        try:
+            entries = list(os.scandir(self.input_path))
+        except OSError as e:
+            log_error(f"Error leyendo carpeta vigilada {self.input_path}: {safe_str(e)}")
+            return
+        for entry in entries:
+            if not entry.is_file() or not entry.name.lower().endswith(".pdf"):
+                continue
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            if self._seen.get(os.path.abspath(entry.path)) != (stat.st_size, stat.st_mtime):
+                self.notify(entry.path)
+
+    # -------------------------------
+    # Un archivo está listo cuando su tamaño y mtime no cambian durante
+    # WATCH_STABLE_SECONDS y el PDF termina en %%EOF (o vence la espera extra)
+    # -------------------------------
+    def _check_pending(self):
+        now = time.monotonic()
+        with self._state_lock:
+            items = list(self._pending.items())
+
+        for path, (size, mtime, since) in items:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                with self._state_lock:
+                    self._pending.pop(path, None)  # Borrado o movido
+                continue
+
+            current = (stat.st_size, stat.st_mtime)
+            if current != (size, mtime) or stat.st_size == 0:
+                with self._state_lock:
+                    self._pending[path] = current + (now,)
+                continue
+
+            waited = now - since
+            if waited < WATCH_STABLE_SECONDS:
+                continue
+            if not _has_pdf_trailer(path) and waited < WATCH_STABLE_SECONDS + WATCH_INCOMPLETE_GRACE:
+                continue
+
+            with self._state_lock:
+                self._pending.pop(path, None)
+                # Eventos sin cambios reales (apertura, lectura): ya se envió esta versión
+                if path in self._ready or self._seen.get(path) == current:
+                    continue
+                if any(running_path == path for running_path, _ in self._running.values()):
+                    self._dirty.add(path)
+                    continue
+                self._ready.append(path)
+
+    # -------------------------------
+    # Envío al pool: nunca más de 'workers' documentos en curso
+    # -------------------------------
+    def _dispatch(self, executor):
+        while self._ready and len(self._running) < self.workers and not self._stop_event.is_set():
+            path = self._ready.popleft()
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            self._seen[path] = (stat.st_size, stat.st_mtime)
+            log_info(f"Carpeta vigilada: procesando {os.path.basename(path)}")
+            future = executor.submit(batch_processor.process_document_safe, path, self.output_path, self.resume)
+            with self._state_lock:
+                self._running[future] = (path, time.time())
+
+    def _collect(self, timeout):
+        if not self._running:
+            return
+        with self._state_lock:
+            futures = list(self._running)
+        done, _ = wait(futures, timeout=timeout, return_when=FIRST_COMPLETED)
+        for future in done:
+            with self._state_lock:
+                path, started = self._running.pop(future)
+            file = os.path.basename(path)
+            try:
+                result = future.result()
+            except Exception as e:
+                log_error(f"Error procesando {file}: {safe_str(e)}")
+                result = {"file": file, "ok": False, "pages": 0, "error": safe_str(e)}
+            metrics.record_document(result)
+
+            with self._state_lock:
+                if result.get("skipped"):
+                    self.skipped += 1
+                elif result["ok"]:
+                    self.processed += 1
+                else:
+                    self.failed += 1
+                self.history.appendleft({
+                    "file": file, "ok": result["ok"], "skipped": bool(result.get("skipped")),
+                    "pages": result.get("pages", 0), "failed_pages": result.get("failed_pages", 0),
+                    "error": result.get("error"), "latency": round(time.time() - started, 2), "finished_at": time.time(),
+                })
+                # Cambió mientras se procesaba: se vuelve a evaluar
+                if path in self._dirty:
+                    self._dirty.discard(path)
+                    self._pending[path] = (None, None, time.monotonic())
+
+    # -------------------------------
+    # Eventos del sistema de archivos con watchdog (inotify en Linux), si está instalado
+    # -------------------------------
+    def _start_observer(self):
+        if not self.use_inotify:
+            return None
+        try:
+            from watchdog.observers import Observer
+            from watchdog.events import FileSystemEventHandler
+        except ImportError:
+            log_error(f"watchdog no está instalado (pip install watchdog): {self.input_path} se vigila por "
+                      f"polling cada {WATCH_POLL_INTERVAL}s")
+            return None
+
+        watcher = self
+
+        class _Handler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                if event.is_directory:
+                    return
+                for path in (getattr(event, "src_path", None), getattr(event, "dest_path", None)):
+                    if path:
+                        watcher.notify(path)
+
+        try:
+            observer = Observer()
+            observer.schedule(_Handler(), self.input_path, recursive=False)
+            observer.start()
+            return observer
+        except Exception as e:
+            log_error(f"No se pudo iniciar inotify en {self.input_path}, se usa polling: {safe_str(e)}")
+            return None
+
+    # -------------------------------
+    # Bucle principal (bloqueante hasta stop())
+    # -------------------------------
+    def run(self):
+        os.makedirs(self.output_path, exist_ok=True)
+        observer = self._start_observer()
+        self.mode = "inotify" if observer is not None else "polling"
+        scan_interval = WATCH_RESCAN_INTERVAL if observer is not None else WATCH_POLL_INTERVAL
+
+        # Un solo proceso: OCR en un hilo del propio proceso (modelo ya cargado)
+        executor = (batch_processor.create_worker_pool(self.workers) if self.workers > 1
+                    else ThreadPoolExecutor(max_workers=1, thread_name_prefix="ocr-watch"))
+        self.status = "watching"
+        log_info(f"Vigilando {self.input_path} ({self.mode}, {self.workers} procesos) → {self.output_path}")
+
+        try:
+            self._scan()
+            last_scan = time.monotonic()
+            while not self._stop_event.is_set():
+                if time.monotonic() - last_scan >= scan_interval:
+                    self._scan()
+                    last_scan = time.monotonic()
+                self._check_pending()
+                self._dispatch(executor)
+                if self._running:
+                    self._collect(WATCH_TICK)
+                else:
+                    self._wake.wait(WATCH_TICK)
+                self._wake.clear()
+
+            # Terminar los documentos en curso antes de salir
+            while self._running:
+                self._collect(None)
+        except Exception as e:
+            self.status = "error"
+            self.error = safe_str(e)
+            log_error(f"Error en carpeta vigilada {self.input_path}: {safe_str(e)}")
+        finally:
+            if observer is not None:
+                observer.stop()
+                observer.join()
+            executor.shutdown(wait=True)
+            if self.status != "error":
+                self.status = "stopped"
+            log_info(f"Vigilancia detenida: {self.input_path} ({self.processed} procesados, {self.skipped} sin cambios, {self.failed} fallidos)")
+
+    def start(self):
+        self._thread = threading.Thread(target=self.run, name=f"ocr-watch-{self.id}", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, wait_for=False):
+        self._stop_event.set()
+        self._wake.set()
+        if wait_for and self._thread is not None:
+            self._thread.join()
+
+    def to_dict(self):
+        with self._state_lock:
+            return {
+                "id": self.id,
+                "status": self.status,
+                "mode": self.mode,
+                "error": self.error,
+                "input_folder": self.input_path,
+                "output_folder": self.output_path,
+                "workers": self.workers,
+                "pending": len(self._pending) + len(self._ready),
+                "running": [os.path.basename(path) for path, _ in self._running.values()],
+                "processed": self.processed,
+                "skipped": self.skipped,
+                "failed": self.failed,
+                "recent": list(self.history),
+            }
+
+# -------------------------------
+# Un PDF completo termina en %%EOF (se busca en el último KB)
+# -------------------------------
+def _has_pdf_trailer(path):
+    try:
+        with open(path, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            f.seek(max(0, f.tell() - 1024))
+            return b"%%EOF" in f.read()
+    except OSError:
+        return False  # Bloqueado por quien lo está escribiendo
+
+# -------------------------------
+# Gestión de carpetas vigiladas (una por carpeta de entrada)
+# -------------------------------
+# -------------------------------
+# Empieza a vigilar una carpeta; si ya se vigila con la misma salida devuelve
+# esa vigilancia, y con otra salida lanza WatcherConflict (hay que detenerla antes)
+# -------------------------------
+def start_watcher(input_path, output_path, workers=None, resume=True):
+    with _lock:
+        for watcher in _watchers.values():
+            if watcher.input_path == input_path and watcher.status in ("starting", "watching"):
+                if watcher.output_path != output_path:
+                    raise WatcherConflict(
+                        f"La carpeta {input_path} ya se vigila con salida en {watcher.output_path}", watcher
+                    )
+                return watcher
+        watcher = FolderWatcher(input_path, output_path, workers, resume)
+        _watchers[watcher.id] = watcher
+    return watcher.start()
+
+def get_watcher(watch_id):
+    with _lock:
+        return _watchers.get(watch_id)
+
+def list_watchers():
+    with _lock:
+        watchers = list(_watchers.values())
+    return [watcher.to_dict() for watcher in sorted(watchers, key=lambda w: w.created_at, reverse=True)]
+
+def stop_watcher(watch_id):
+    watcher = get_watcher(watch_id)
+    if watcher is not None:
+        watcher.stop()
+        log_info(f"Detención solicitada para la carpeta vigilada {watcher.input_path}")
+    return watcher
+
+# -------------------------------
+# Utilidad segura para logs
+# -------------------------------
+def safe_str(obj):
+    try:
+        return str(obj)
+    except Exception:
+        try:
+            return str(obj).encode("utf-8", errors="replace").decode("utf-8", errors="replace")
+        except Exception:
+            return "[Error al convertir a string]"
@@ -0,0 +1,231 @@
+import os
+import time
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from ocr_utils import batch_processor
+from ocr_utils import ocr_processor
+from ocr_utils.logger import log_info, log_error
+
+# -------------------------------
+# Configuración
+# -------------------------------
+MAX_CONCURRENT_JOBS = int(os.environ.get("OCR_MAX_JOBS", "1"))  # Lotes ejecutándose a la vez
+MAX_QUEUED_JOBS = int(os.environ.get("OCR_MAX_QUEUED_JOBS", "10"))  # Lotes en espera antes de rechazar
+MAX_JOB_HISTORY = 100  # Trabajos terminados que se conservan para consulta
+
+# -------------------------------
+# Estado global del gestor
+# -------------------------------
+_executor = None
+_jobs = {}
+_lock = threading.Lock()
+
+# -------------------------------
+# Error al encolar (límite de trabajos alcanzado)
+# -------------------------------
+class JobQueueFull(Exception):
+    pass
+
+# -------------------------------
+# Trabajo OCR en segundo plano (un lote = una carpeta de entrada)
+# -------------------------------
+class Job:
+    def __init__(self, input_path, output_path, workers):
+        self.id = uuid.uuid4().hex[:12]
+        self.input_path = input_path
+        self.output_path = output_path
+        self.workers = workers
+        self.status = "queued"
+        self.error = None
+        self.files = {}
+        self.total_pages = 0
+        self.pages_done = 0
+        self.pages_skipped = 0  # Ya procesadas en otra ejecución (documentos omitidos o reanudados)
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.cancel_event = threading.Event()
+        self.future = None
+
+    # Recibe el avance de batch_processor.run_batch
+    def on_progress(self, file, status, result=None):
+        with _lock:
+            entry = self.files.setdefault(file, {"status": "pending", "pages": 0, "error": None})
+            if status == "running":
+                entry["status"] = "running"
+                entry["started_at"] = time.time()
+            else:
+                entry["status"] = "done" if result and result["ok"] else "error"
+                entry["pages"] = result["pages"] if result else 0
+                entry["error"] = result["error"] if result else None
+                entry["stats"] = result.get("stats") if result else None
+                entry["duration"] = round(time.time() - entry.get("started_at", time.time()), 2)
+                self.pages_done += entry["pages"]
+
+                # Las páginas que no se procesan en este trabajo no cuentan para la ETA
+                if result and result.get("skipped"):
+                    entry["status"] = "skipped"
+                    self.pages_skipped += entry.get("total_pages", 0)
+                elif entry["stats"]:
+                    self.pages_skipped += entry["stats"].get("skipped_pages", 0)
+
+    def to_dict(self):
+        with _lock:
+            now = self.finished_at or time.time()
+            elapsed = now - self.started_at if self.started_at else 0.0
+            pages_per_sec = self.pages_done / elapsed if elapsed > 0 else 0.0
+            remaining_pages = max(0, self.total_pages - self.pages_skipped - self.pages_done)
+            finished = sum(1 for entry in self.files.values() if entry["status"] in ("done", "error", "skipped"))
+            skipped = sum(1 for entry in self.files.values() if entry["status"] == "skipped")
+
+            eta = None
+            if self.status == "running" and pages_per_sec > 0:
+                eta = round(remaining_pages / pages_per_sec, 1)
+
+            return {
+                "id": self.id,
+                "status": self.status,
+                "error": self.error,
+                "input_folder": self.input_path,
+                "output_folder": self.output_path,
+                "workers": self.workers,
+                "files_total": len(self.files),
+                "files_finished": finished,
+                "files_skipped": skipped,
+                "pages_total": self.total_pages,
+                "pages_done": self.pages_done,
+                "pages_skipped": self.pages_skipped,
+                "pages_per_sec": round(pages_per_sec, 3),
+                "elapsed": round(elapsed, 1),
+                "eta_seconds": eta,
+                "files": {name: dict(entry) for name, entry in self.files.items()},
+            }
+
+# -------------------------------
+# Ejecutor compartido (creado al primer uso)
+# -------------------------------
+def _get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=MAX_CONCURRENT_JOBS, thread_name_prefix="ocr-job")
+        return _executor
+
+# -------------------------------
+# Cuerpo de un trabajo: prepara la lista de archivos y ejecuta el lote
+# -------------------------------
+def _run_job(job):
+    if job.cancel_event.is_set():
+        with _lock:
+            job.status = "cancelled"
+            job.finished_at = time.time()
+        return
+
+    with _lock:
+        job.status = "running"
+        job.started_at = time.time()
+
+    try:
+        pdf_paths = batch_processor.list_input_pdfs(job.input_path)
+        total_pages = 0
+        for pdf_path in pdf_paths:
+            pages = ocr_processor.get_pdf_page_count(pdf_path)
+            total_pages += pages
+            with _lock:
+                job.files[os.path.basename(pdf_path)] = {"status": "pending", "pages": 0, "total_pages": pages, "error": None}
+        with _lock:
+            job.total_pages = total_pages
+
+        log_info(f"Trabajo {job.id}: {len(pdf_paths)} PDFs, {total_pages} páginas")
+        summary = batch_processor.run_batch(
+            job.input_path, job.output_path, workers=job.workers,
+            progress=job.on_progress, cancel_event=job.cancel_event, pdf_paths=pdf_paths
+        )
+
+        with _lock:
+            job.status = "cancelled" if summary["cancelled"] else "done"
+        log_info(
+            f"Trabajo {job.id} terminado: {summary['processed']} procesados, {summary['skipped']} sin cambios,"
+            f" {summary['failed']} fallidos"
+        )
+
+    except Exception as e:
+        with _lock:
+            job.status = "error"
+            job.error = safe_str(e)
+        log_error(f"Error en trabajo {job.id}: {safe_str(e)}")
+
+    finally:
+        with _lock:
+            job.finished_at = time.time()
+
+# -------------------------------
+# Elimina del historial los trabajos terminados más antiguos
+# -------------------------------
+def _prune_history():
+    finished = sorted(
+        (job for job in _jobs.values() if job.finished_at),
+        key=lambda job: job.finished_at
+    )
+    for job in finished[:max(0, len(finished) - MAX_JOB_HISTORY)]:
+        del _jobs[job.id]
+
+# -------------------------------
+# Encola un lote y devuelve su trabajo inmediatamente
+# -------------------------------
+def submit_job(input_path, output_path, workers=None):
+    executor = _get_executor()
+
+    with _lock:
+        waiting = sum(1 for job in _jobs.values() if job.status == "queued")
+        if waiting >= MAX_QUEUED_JOBS:
+            raise JobQueueFull(f"Hay {waiting} trabajos en espera (máximo {MAX_QUEUED_JOBS})")
+        _prune_history()
+        job = Job(input_path, output_path, workers or batch_processor.OCR_WORKERS)
+        _jobs[job.id] = job
+
+    job.future = executor.submit(_run_job, job)
+    log_info(f"Trabajo {job.id} encolado: {input_path}")
+    return job
+
+# -------------------------------
+# Consulta de trabajos
+# -------------------------------
+def get_job(job_id):
+    with _lock:
+        return _jobs.get(job_id)
+
+def list_jobs():
+    with _lock:
+        jobs = list(_jobs.values())
+    return [job.to_dict() for job in sorted(jobs, key=lambda job: job.created_at, reverse=True)]
+
+# -------------------------------
+# Cancela un trabajo: si está en cola no se ejecuta; si está en curso
+# termina los documentos ya iniciados y no lanza más
+# -------------------------------
+def cancel_job(job_id):
+    job = get_job(job_id)
+    if job is None:
+        return None
+
+    job.cancel_event.set()
+    with _lock:
+        if job.status == "queued" and job.future is not None and job.future.cancel():
+            job.status = "cancelled"
+            job.finished_at = time.time()
+    log_info(f"Cancelación solicitada para trabajo {job.id}")
+    return job
+
+# -------------------------------
+# Utilidad segura para logs
+# -------------------------------
+def safe_str(obj):
+    try:
+        return str(obj)
+    except Exception:
+        try:
+            return str(obj).encode("utf-8", errors="replace").decode("utf-8", errors="replace")
+        except Exception:
+            return "[Error al convertir a string]"
@@ -1,24 +1,58 @@
 import os
+import re
+import time
+import queue
+import atexit
+import threading
 from datetime import datetime
 
+try:
+    import fcntl  # POSIX
+except ImportError:
+    fcntl = None
+    import msvcrt  # Windows
+
+# -------------------------------
+# Configuración
+# -------------------------------
+LOG_MAX_BYTES = int(os.environ.get("OCR_LOG_MAX_MB", "20")) * 1024 * 1024  # Tamaño que provoca la rotación
+LOG_BACKUP_COUNT = 5  # proceso.log.1 … proceso.log.5
+LOG_FLUSH_INTERVAL = 0.2  # Segundos máximos que una línea espera en la cola
+LOG_BATCH_LINES = 500  # Líneas máximas por escritura
+LOG_DEFAULT_TAIL = 500  # Líneas devueltas por /logs sin parámetros
+LOG_READ_MAX_LINES = 5000  # Límite de líneas por consulta
+LOG_TAIL_BLOCK = 64 * 1024
+
+LEVEL_PATTERN = re.compile(r"^\[[^\]]*\] (INFO|ERROR):")
+
 # -------------------------------
 # Ruta global del archivo de log
 # -------------------------------
 log_path = None
 
 # -------------------------------
-# Inicializa el logger con una ruta
+# Estado del escritor en segundo plano (uno por proceso)
+# -------------------------------
+_queue = None
+_writer = None
+_writer_pid = None
+_writer_lock = threading.Lock()
+
+# -------------------------------
+# Inicializa el logger con una ruta (añade al log existente, no lo trunca)
 # -------------------------------
 def init_logger(path):
     global log_path
     log_path = path
     os.makedirs(os.path.dirname(path), exist_ok=True)
+    _write_log(f"[{timestamp()}] INFO: Log inicializado (proceso {os.getpid()})")
 
-    try:
-        with open(log_path, 'w', encoding='utf-8', errors='replace') as f:
-            f.write(f"[{timestamp()}] Log inicializado\n")
-    except Exception as e:
-        print(f"[LOGGER] Error inicializando log: {safe_str(e)}")
+# -------------------------------
+# Reutiliza un log existente sin escribir cabecera (procesos secundarios)
+# -------------------------------
+def attach_logger(path):
+    global log_path
+    log_path = path
 
 # -------------------------------
 # Escribe mensaje informativo
@@ -37,12 +71,13 @@ def log_error(message):
 # -------------------------------
 def log_benchmark(start_time, end_time, total_files):
     duration = round(end_time - start_time, 2)
-    _write_log(f"[{timestamp()}] Tiempo total: {duration}s | Archivos procesados: {total_files}")
+    _write_log(f"[{timestamp()}] INFO: Tiempo total: {duration}s | Archivos procesados: {total_files}")
 
 # -------------------------------
 # Devuelve contenido completo del log
 # -------------------------------
 def get_log_content():
+    flush()
     if log_path and os.path.exists(log_path):
         try:
             with open(log_path, 'r', encoding='utf-8', errors='replace') as f:
@@ -52,18 +87,237 @@ def get_log_content():
     return "Log no encontrado."
 
 # -------------------------------
-# Función interna: escribe en el archivo de log
+# Lectura paginada del log
+# - tail: últimas N líneas (del nivel pedido), leyendo el archivo desde el final
+# - offset/limit: líneas desde un desplazamiento en bytes (el cliente reenvía next_offset)
+# - generation: identificador del archivo al que se refiere offset (el cliente reenvía
+#   generation); si el log rotó desde entonces se vuelve a leer desde el principio
+# - level: 'INFO' o 'ERROR'; las líneas de continuación de una entrada (p.ej. una
+#   traza) tienen el nivel de la entrada
+# 'offset' de la respuesta es el byte donde empieza la primera línea devuelta
+# -------------------------------
+def read_log(tail=None, offset=None, limit=None, level=None, generation=None):
+    flush()
+    limit = min(limit or LOG_READ_MAX_LINES, LOG_READ_MAX_LINES)
+    result = {"lines": [], "offset": 0, "next_offset": 0, "size": 0, "generation": None, "rotated": False}
+    if not log_path or not os.path.exists(log_path):
+        return result
+
+    level = level.upper() if level else None
+    try:
+        with open(log_path, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            size = stat.st_size
+            # La rotación renombra el archivo y crea uno nuevo: cambia el inodo
+            result.update(size=size, generation=stat.st_ino)
+
+            if offset is None:
+                count = min(tail or LOG_DEFAULT_TAIL, LOG_READ_MAX_LINES)
+                lines = _tail_lines(f, size, count, level)
+                result.update(lines=[line for _, line in lines], offset=lines[0][0] if lines else size,
+                              next_offset=size)
+                return result
+
+            if offset > size or (generation is not None and generation != stat.st_ino):
+                offset = 0
+                result["rotated"] = True
+
+            # Una lectura que empieza a mitad de una entrada hereda su nivel
+            current = _level_before(f, offset) if level else None
+            f.seek(offset)
+            position = offset
+            first = None
+            lines = []
+            while len(lines) < limit:
+                raw = f.readline()
+                if not raw or not raw.endswith(b"\n"):
+                    break  # Línea incompleta: se leerá en la siguiente consulta
+                line = raw.decode('utf-8', errors='replace').rstrip("\r\n")
+                current = _line_level(line) or current
+                if line and (level is None or (current or "INFO") == level):
+                    first = position if first is None else first
+                    lines.append(line)
+                position += len(raw)
+            result.update(lines=lines, offset=offset if first is None else first, next_offset=position)
+    except Exception as e:
+        result["lines"] = [f"[LOGGER] Error leyendo log: {safe_str(e)}"]
+    return result
+
+# -------------------------------
+# Retrocede por bloques hasta reunir N líneas del nivel pedido (o llegar al principio)
+# Devuelve [(byte de inicio, línea), ...] con las N últimas
+# Las líneas sin cabecera al principio de lo leído esperan al bloque anterior para
+# conocer el nivel de su entrada
+# -------------------------------
+def _tail_lines(f, size, count, level):
+    position = size
+    partial = b""  # Principio de línea cortado por el bloque; se completa con el anterior
+    lines = []
+    orphans = []  # Continuaciones de una entrada que empieza antes de lo leído
+    while position > 0 and len(lines) < count:
+        step = min(LOG_TAIL_BLOCK, position)
+        position -= step
+        f.seek(position)
+        parts = (f.read(step) + partial).split(b"\n")
+        partial = parts.pop(0) if position > 0 else b""
+        line_start = position + len(partial) + 1 if position > 0 else 0
+
+        block = []
+        leading = []
+        current = None
+        for raw in parts:
+            start, line_start = line_start, line_start + len(raw) + 1
+            line = raw.decode('utf-8', errors='replace').rstrip("\r")
+            if not line:
+                continue
+            current = _line_level(line) or current
+            if current is None:
+                leading.append((start, line))
+            elif level is None or current == level:
+                block.append((start, line))
+        if current is None:
+            orphans = leading + orphans
+        else:
+            block += [item for item in orphans if level is None or current == level]
+            orphans = leading
+        lines = block + lines
+
+    # Principio del archivo: lo que no tiene cabecera se considera INFO
+    if position == 0 and orphans and level in (None, "INFO"):
+        lines = orphans + lines
+    return lines[-count:]
+
+# Nivel de la última entrada que empieza antes de 'offset' (None si no se encuentra)
+def _level_before(f, offset):
+    position = offset
+    partial = b""
+    while position > 0:
+        step = min(LOG_TAIL_BLOCK, position)
+        position -= step
+        f.seek(position)
+        parts = (f.read(step) + partial).split(b"\n")
+        partial = parts.pop(0) if position > 0 else b""
+        for raw in reversed(parts):
+            line_level = _line_level(raw.decode('utf-8', errors='replace'))
+            if line_level:
+                return line_level
+    return None
+
+def _line_level(line):
+    match = LEVEL_PATTERN.match(line)
+    return match.group(1) if match else None
+
+# -------------------------------
+# Vacía la cola y espera a que el escritor termine el lote pendiente
+# -------------------------------
+def flush(timeout=5.0):
+    q = _queue
+    if q is None or _writer_pid != os.getpid():
+        return
+    deadline = time.monotonic() + timeout
+    while q.unfinished_tasks and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+# -------------------------------
+# Función interna: encola la línea para el escritor en segundo plano
 # -------------------------------
 def _write_log(line):
     if not log_path:
         print(f"[LOGGER] Log no inicializado: {line}")
         return
+    _ensure_writer().put(line)
 
-    try:
-        with open(log_path, 'a', encoding='utf-8', errors='replace') as f:
-            f.write(line + "\n")
-    except Exception as e:
-        print(f"[LOGGER] Error escribiendo log: {safe_str(e)}")
+def _ensure_writer():
+    global _queue, _writer, _writer_pid
+    # Tras un fork el hilo escritor no existe en el hijo: se crea uno nuevo
+    if _writer_pid == os.getpid() and _writer is not None:
+        return _queue
+    with _writer_lock:
+        if _writer_pid != os.getpid() or _writer is None:
+            _queue = queue.Queue()
+            _writer = threading.Thread(target=_writer_loop, args=(_queue,), name="log-writer", daemon=True)
+            _writer_pid = os.getpid()
+            _writer.start()
+    return _queue
+
+# -------------------------------
+# Hilo escritor: agrupa líneas y las escribe con una sola llamada por lote
+# -------------------------------
+def _writer_loop(q):
+    while True:
+        lines = [q.get()]
+        deadline = time.monotonic() + LOG_FLUSH_INTERVAL
+        while len(lines) < LOG_BATCH_LINES:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                lines.append(q.get(timeout=remaining))
+            except queue.Empty:
+                break
+
+        try:
+            _append_lines(lines)
+        except Exception as e:
+            print(f"[LOGGER] Error escribiendo log: {safe_str(e)}")
+        finally:
+            for _ in lines:
+                q.task_done()
+
+# -------------------------------
+# Escritura con bloqueo entre procesos (archivo .lock) y rotación por tamaño
+# -------------------------------
+def _append_lines(lines):
+    path = log_path
+    data = ("\n".join(lines) + "\n").encode('utf-8', errors='replace')
+    with _file_lock(path + ".lock"):
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            size = 0
+        if size and size + len(data) > LOG_MAX_BYTES:
+            _rotate(path)
+        with open(path, 'ab') as f:
+            f.write(data)
+
+def _rotate(path):
+    for index in range(LOG_BACKUP_COUNT - 1, 0, -1):
+        source = f"{path}.{index}"
+        if os.path.exists(source):
+            os.replace(source, f"{path}.{index + 1}")
+    os.replace(path, f"{path}.1")
+
+class _file_lock:
+    def __init__(self, path):
+        self.path = path
+        self.handle = None
+
+    def __enter__(self):
+        self.handle = open(self.path, 'a+b')
+        if fcntl is not None:
+            fcntl.flock(self.handle.fileno(), fcntl.LOCK_EX)
+        else:
+            self.handle.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(self.handle.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    time.sleep(0.05)
+        return self
+
+    def __exit__(self, *exc):
+        try:
+            if fcntl is not None:
+                fcntl.flock(self.handle.fileno(), fcntl.LOCK_UN)
+            else:
+                self.handle.seek(0)
+                msvcrt.locking(self.handle.fileno(), msvcrt.LK_UNLCK, 1)
+        finally:
+            self.handle.close()
+        return False
+
+atexit.register(flush)
 
 # -------------------------------
 # Devuelve timestamp actual en formato legible
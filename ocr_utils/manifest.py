@@ -0,0 +1,155 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from ocr_utils.logger import log_error
+
+# -------------------------------
+# Configuración
+# -------------------------------
+MANIFEST_NAME = ".ocr_manifest.sqlite"  # Se guarda en la carpeta de salida
+HASH_CHUNK_SIZE = 1024 * 1024
+JOURNAL_MODE = "WAL"  # DELETE si la salida está en almacenamiento compartido (WAL no funciona en NFS/SMB)
+
+# Estados de página que no se repiten al reanudar ('failed' sí se reintenta)
+COMPLETED_PAGE_STATUSES = ("done", "blank", "no_text")
+
+# -------------------------------
+# Manifiesto de procesamiento de una carpeta de salida
+# Registra por documento tamaño, mtime, hash y ajustes, y el estado de cada página
+# name: archivo propio para un rango de páginas (tareas distribuidas); por defecto MANIFEST_NAME
+# -------------------------------
+class Manifest:
+    def __init__(self, output_path, name=None):
+        self.path = os.path.join(output_path, name or MANIFEST_NAME)
+        os.makedirs(output_path, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self._conn.execute(f"PRAGMA journal_mode={JOURNAL_MODE}")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS documents ("
+            " path TEXT PRIMARY KEY, size INTEGER, mtime REAL, sha256 TEXT, settings TEXT,"
+            " status TEXT, total_pages INTEGER, updated_at REAL);"
+            "CREATE TABLE IF NOT EXISTS pages ("
+            " path TEXT, page INTEGER, status TEXT, txt_path TEXT, updated_at REAL,"
+            " PRIMARY KEY (path, page));"
+        )
+        self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    # Compara el archivo con lo registrado; devuelve (estado, páginas completas)
+    # estado: 'done' (sin cambios y terminado), 'partial' (reanudar) o 'new'
+    def check_document(self, pdf_path, settings):
+        settings_json = json.dumps(settings, sort_keys=True)
+        stat = os.stat(pdf_path)
+
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT size, mtime, sha256, settings, status FROM documents WHERE path = ?", (pdf_path,)
+            ).fetchone()
+
+        if row is None:
+            return "new", set()
+
+        size, mtime, sha256, old_settings, status = row
+        unchanged = size == stat.st_size and mtime == stat.st_mtime and old_settings == settings_json
+
+        # mtime distinto pero mismo contenido (copia, touch): basta con actualizar el mtime
+        if not unchanged and old_settings == settings_json and size == stat.st_size:
+            if file_sha256(pdf_path) == sha256:
+                with self._lock:
+                    self._conn.execute("UPDATE documents SET mtime = ? WHERE path = ?", (stat.st_mtime, pdf_path))
+                    self._conn.commit()
+                unchanged = True
+
+        if not unchanged:
+            self.reset_document(pdf_path)
+            return "new", set()
+
+        if status == "done":
+            return "done", self.completed_pages(pdf_path)
+        return "partial", self.completed_pages(pdf_path)
+
+    def completed_pages(self, pdf_path):
+        placeholders = ",".join("?" for _ in COMPLETED_PAGE_STATUSES)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT page FROM pages WHERE path = ? AND status IN ({placeholders})",
+                (pdf_path,) + COMPLETED_PAGE_STATUSES
+            ).fetchall()
+        return {row[0] for row in rows}
+
+    def pages_with_text(self, pdf_path):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM pages WHERE path = ? AND status = 'done'", (pdf_path,)
+            ).fetchone()[0]
+
+    def reset_document(self, pdf_path):
+        with self._lock:
+            self._conn.execute("DELETE FROM pages WHERE path = ?", (pdf_path,))
+            self._conn.execute("DELETE FROM documents WHERE path = ?", (pdf_path,))
+            self._conn.commit()
+
+    def begin_document(self, pdf_path, settings, total_pages=None):
+        stat = os.stat(pdf_path)
+        with self._lock:
+            row = self._conn.execute("SELECT sha256 FROM documents WHERE path = ?", (pdf_path,)).fetchone()
+        sha256 = row[0] if row and row[0] else file_sha256(pdf_path)
+
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO documents (path, size, mtime, sha256, settings, status, total_pages, updated_at)"
+                " VALUES (?, ?, ?, ?, ?, 'running', ?, ?)",
+                (pdf_path, stat.st_size, stat.st_mtime, sha256, json.dumps(settings, sort_keys=True),
+                 total_pages, time.time())
+            )
+            self._conn.commit()
+
+    def record_page(self, pdf_path, page, status, txt_path=None):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO pages (path, page, status, txt_path, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (pdf_path, page, status, txt_path, time.time())
+            )
+            self._conn.commit()
+
+    def finish_document(self, pdf_path, status, total_pages=None):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE documents SET status = ?, total_pages = COALESCE(?, total_pages), updated_at = ? WHERE path = ?",
+                (status, total_pages, time.time(), pdf_path)
+            )
+            self._conn.commit()
+
+# -------------------------------
+# Hash SHA-256 del archivo, leído por bloques
+# -------------------------------
+def file_sha256(path):
+    digest = hashlib.sha256()
+    try:
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+                digest.update(chunk)
+    except Exception as e:
+        log_error(f"Error calculando hash de {os.path.basename(path)}: {safe_str(e)}")
+        return None
+    return digest.hexdigest()
+
+# -------------------------------
+# Utilidad segura para logs
+# -------------------------------
+def safe_str(obj):
+    try:
+        return str(obj)
+    except Exception:
+        try:
+            return str(obj).encode("utf-8", errors="replace").decode("utf-8", errors="replace")
+        except Exception:
+            return "[Error al convertir a string]"
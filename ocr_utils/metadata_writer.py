@@ -1,3 +1,4 @@
+import io
 import os
 import json
 import csv
@@ -31,30 +32,42 @@ def read_metadata_from_file(metadata_path):
 
     return metadata_map
 
+# -------------------------------
+# Escribe los campos de metadatos en el docinfo de un PDF abierto con pikepdf
+# -------------------------------
+def apply_docinfo(pdf, metadata: dict):
+    info = pdf.docinfo
+
+    # Campos estándar
+    info["/Title"] = metadata.get('Title', '')
+    info["/Author"] = metadata.get('Author', 'OCR_App')
+    info["/Producer"] = metadata.get('Producer', 'OCR_App')
+    info["/Subject"] = metadata.get('Subject', '')
+
+    # Campo personalizado
+    custom_id = metadata.get('CustomID', f"ID-{int(datetime.now().timestamp())}")
+    info["/CustomID"] = custom_id
+
 # -------------------------------
 # Inserta metadatos en un solo PDF
 # -------------------------------
 def insert_metadata_to_pdf(pdf_path, metadata: dict):
     try:
         with pikepdf.open(pdf_path, allow_overwriting_input=True) as pdf:
-            info = pdf.docinfo
-
-            # Campos estándar
-            info["/Title"] = metadata.get('Title', '')
-            info["/Author"] = metadata.get('Author', 'OCR_App')
-            info["/Producer"] = metadata.get('Producer', 'OCR_App')
-            info["/Subject"] = metadata.get('Subject', '')
-
-            # Campo personalizado
-            custom_id = metadata.get('CustomID', f"ID-{int(datetime.now().timestamp())}")
-            info["/CustomID"] = custom_id
-
+            apply_docinfo(pdf, metadata)
             pdf.save(pdf_path)
 
         log_info(f"Metadatos insertados en: {os.path.basename(pdf_path)}")
     except Exception as e:
         log_error(f"Error insertando metadatos en {os.path.basename(pdf_path)}: {safe_str(e)}")
 
+# -------------------------------
+# Guarda un PDF generado en memoria con sus metadatos en una sola escritura
+# -------------------------------
+def save_pdf_bytes_with_metadata(data, pdf_path, metadata: dict):
+    with pikepdf.open(io.BytesIO(bytes(data))) as pdf:
+        apply_docinfo(pdf, metadata)
+        pdf.save(pdf_path)
 
 # -------------------------------
 # Aplica metadatos a todos los PDFs de una carpeta
@@ -0,0 +1,263 @@
+import os
+import json
+import time
+import itertools
+import threading
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from ocr_utils.logger import log_info, log_error
+
+# -------------------------------
+# Configuración
+# -------------------------------
+STAGES = ("text_layer", "render", "preprocess", "ocr", "write_txt", "write_pdf", "split_metadata")
+MEMORY_SAMPLE_INTERVAL = 0.25  # Segundos entre muestras de memoria durante un documento
+LATENCY_WINDOW = 5000  # Muestras por etapa conservadas para p50/p95 en /metrics
+REPORTS_DIR_NAME = "reports"  # Carpeta de informes por ejecución, junto a proceso.log
+
+# -------------------------------
+# Tiempos por etapa: {etapa: [segundos por página, ...]}
+# Las listas viajan en los stats de cada documento (también desde los procesos del pool)
+# -------------------------------
+def record(timings, stage, seconds, count=1):
+    if timings is None or count <= 0:
+        return
+    samples = timings.setdefault(stage, [])
+    per_item = round(seconds / count, 4)
+    samples.extend([per_item] * count)
+
+@contextmanager
+def timed(timings, stage, count=1):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(timings, stage, time.perf_counter() - start, count)
+
+# -------------------------------
+# Memoria residente del proceso en MB (psutil si está instalado,
+# /proc en Linux y getrusage como último recurso)
+# -------------------------------
+def current_rss_mb():
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / (1024 * 1024)
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+        import sys
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    except Exception:
+        return None
+
+# -------------------------------
+# Pico de memoria mientras dura un bloque (muestreo en un hilo)
+# -------------------------------
+class MemorySampler:
+    def __init__(self, interval=MEMORY_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.peak_mb = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        rss = current_rss_mb()
+        if rss is not None and (self.peak_mb is None or rss > self.peak_mb):
+            self.peak_mb = rss
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def __enter__(self):
+        self._sample()
+        self._thread = threading.Thread(target=self._run, name="memory-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+        if self.peak_mb is not None:
+            self.peak_mb = round(self.peak_mb, 1)
+        return False
+
+# -------------------------------
+# Percentiles y resumen de latencias por etapa
+# -------------------------------
+def percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(q / 100.0 * (len(ordered) - 1)))))
+    return ordered[index]
+
+def summarize_timings(timings):
+    summary = {}
+    order = {stage: idx for idx, stage in enumerate(STAGES)}
+    for stage, samples in sorted((timings or {}).items(), key=lambda item: (order.get(item[0], len(order)), item[0])):
+        samples = list(samples)
+        if not samples:
+            continue
+        summary[stage] = {
+            "count": len(samples),
+            "seconds": round(sum(samples), 3),
+            "p50": percentile(samples, 50),
+            "p95": percentile(samples, 95),
+            "max": max(samples),
+        }
+    return summary
+
+# -------------------------------
+# Métricas agregadas del proceso principal (se exponen en /metrics)
+# -------------------------------
+_lock = threading.Lock()
+_samples = {}
+_totals = {"runs": 0, "documents": 0, "failed_documents": 0, "pages": 0, "document_seconds": 0.0,
+           "run_pages": 0, "run_seconds": 0.0}
+_last_run = None
+
+def record_document(result):
+    metrics = result.get("metrics") or {}
+    with _lock:
+        _totals["documents"] += 1
+        if not result.get("ok"):
+            _totals["failed_documents"] += 1
+        _totals["pages"] += result.get("pages", 0) or 0
+        _totals["document_seconds"] += metrics.get("seconds", 0.0) or 0.0
+        for stage, values in (metrics.get("timings") or {}).items():
+            _samples.setdefault(stage, deque(maxlen=LATENCY_WINDOW)).extend(values)
+
+def record_run(report):
+    global _last_run
+    with _lock:
+        _totals["runs"] += 1
+        _totals["run_pages"] += report.get("pages", 0)
+        _totals["run_seconds"] += report.get("duration", 0.0)
+        _last_run = {key: value for key, value in report.items() if key != "documents"}
+
+def snapshot():
+    with _lock:
+        totals = dict(_totals)
+        stages = summarize_timings(_samples)
+        last_run = dict(_last_run) if _last_run else None
+    # Páginas/s de reloj en lotes terminados (con varios procesos, incluye el paralelismo)
+    run_pages, run_seconds = totals.pop("run_pages"), totals.pop("run_seconds")
+    totals["document_seconds"] = round(totals["document_seconds"], 3)
+    totals["pages_per_sec"] = round(run_pages / run_seconds, 3) if run_seconds else 0.0
+    return {"totals": totals, "stages": stages, "last_run": last_run}
+
+# -------------------------------
+# Formato de texto de Prometheus
+# -------------------------------
+def to_prometheus(snap):
+    lines = []
+
+    def metric(name, kind, help_text, samples):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in samples:
+            label_text = "{" + ",".join(f'{k}="{v}"' for k, v in labels.items()) + "}" if labels else ""
+            lines.append(f"{name}{label_text} {value}")
+
+    totals = snap["totals"]
+    metric("ocr_runs_total", "counter", "Lotes procesados", [({}, totals["runs"])])
+    metric("ocr_documents_total", "counter", "Documentos procesados", [({}, totals["documents"])])
+    metric("ocr_documents_failed_total", "counter", "Documentos con error", [({}, totals["failed_documents"])])
+    metric("ocr_pages_total", "counter", "Páginas procesadas", [({}, totals["pages"])])
+    metric("ocr_pages_per_second", "gauge", "Páginas por segundo en los lotes terminados", [({}, totals["pages_per_sec"])])
+
+    # Resumen por etapa: cuantiles, _sum y _count comparten familia
+    stage_samples = []
+    for stage, entry in sorted(snap["stages"].items()):
+        stage_samples.append(({"stage": stage, "quantile": "0.5"}, entry["p50"]))
+        stage_samples.append(({"stage": stage, "quantile": "0.95"}, entry["p95"]))
+    metric("ocr_stage_seconds", "summary", "Latencia por página de cada etapa", stage_samples)
+    for stage, entry in sorted(snap["stages"].items()):
+        lines.append(f'ocr_stage_seconds_sum{{stage="{stage}"}} {entry["seconds"]}')
+        lines.append(f'ocr_stage_seconds_count{{stage="{stage}"}} {entry["count"]}')
+
+    last_run = snap.get("last_run") or {}
+    if last_run.get("peak_memory_mb") is not None:
+        metric("ocr_last_run_peak_memory_mb", "gauge", "Pico de memoria por documento en el último lote",
+               [({}, last_run["peak_memory_mb"])])
+    return "\n".join(lines) + "\n"
+
+# -------------------------------
+# Informe estructurado de un lote: totales, etapas y detalle por documento
+# -------------------------------
+def build_run_report(results, duration, workers, totals=None):
+    timings = {}
+    documents = []
+    for result in results:
+        metrics = result.get("metrics") or {}
+        for stage, values in (metrics.get("timings") or {}).items():
+            timings.setdefault(stage, []).extend(values)
+        documents.append({
+            "file": result.get("file"),
+            "ok": result.get("ok"),
+            "skipped": bool(result.get("skipped")),
+            "pages": result.get("pages", 0),
+            "seconds": metrics.get("seconds"),
+            "peak_memory_mb": metrics.get("peak_memory_mb"),
+            "stages": summarize_timings(metrics.get("timings")),
+            "error": result.get("error"),
+        })
+
+    pages = sum(document["pages"] or 0 for document in documents)
+    peaks = [document["peak_memory_mb"] for document in documents if document["peak_memory_mb"] is not None]
+    return {
+        "finished_at": datetime.now().isoformat(timespec="seconds"),
+        "duration": round(duration, 3),
+        "workers": workers,
+        "documents_total": len(documents),
+        "documents_failed": sum(1 for document in documents if not document["ok"]),
+        "documents_skipped": sum(1 for document in documents if document["skipped"]),
+        "pages": pages,
+        "pages_per_sec": round(pages / duration, 3) if duration else 0.0,
+        "peak_memory_mb": max(peaks) if peaks else None,
+        "stages": summarize_timings(timings),
+        "counters": totals or {},
+        "documents": documents,
+    }
+
+# Número de informe dentro del proceso: dos ejecuciones en el mismo segundo
+# (modo vigilancia, trabajos concurrentes) no comparten archivo
+_report_counter = itertools.count(1)
+
+def write_run_report(report, log_path):
+    if not log_path:
+        return None
+    try:
+        folder = os.path.join(os.path.dirname(log_path), REPORTS_DIR_NAME)
+        os.makedirs(folder, exist_ok=True)
+        name = f"run_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{os.getpid()}_{next(_report_counter):04d}.json"
+        path = os.path.join(folder, name)
+        with open(path, "x", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        log_info(f"Informe de ejecución guardado en {path}")
+        return path
+    except Exception as e:
+        log_error(f"Error guardando informe de ejecución: {safe_str(e)}")
+        return None
+
+# -------------------------------
+# Utilidad segura para logs
+# -------------------------------
+def safe_str(obj):
+    try:
+        return str(obj)
+    except Exception:
+        try:
+            return str(obj).encode("utf-8", errors="replace").decode("utf-8", errors="replace")
+        except Exception:
+            return "[Error al convertir a string]"
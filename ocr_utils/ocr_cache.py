@@ -0,0 +1,161 @@
+import os
+import time
+import json
+import sqlite3
+import hashlib
+import threading
+from ocr_utils.logger import log_info, log_error
+
+# -------------------------------
+# Configuración
+# -------------------------------
+CACHE_DIR = os.environ.get("OCR_CACHE_DIR")  # None = caché desactivada
+CACHE_MAX_BYTES = int(os.environ.get("OCR_CACHE_MAX_MB", "512")) * 1024 * 1024
+CACHE_DB_NAME = "ocr_cache.sqlite"
+EVICT_TARGET = 0.9  # Tras desalojar, el tamaño queda en este porcentaje del máximo
+EVICT_CHECK_PUTS = 100  # Escrituras entre recuentos del tamaño real (otros procesos también escriben)
+JOURNAL_MODE = "WAL"  # DELETE si la caché está en almacenamiento compartido (WAL no funciona en NFS/SMB)
+
+# -------------------------------
+# Conexiones SQLite por hilo (y por proceso)
+# -------------------------------
+_local = threading.local()
+_evict_lock = threading.Lock()
+
+# Tamaño de la caché estimado en este proceso: último recuento + lo escrito desde entonces
+_size = {"key": None, "bytes": 0, "puts": 0}
+
+# -------------------------------
+# Activa o cambia la carpeta de la caché
+# -------------------------------
+def configure(cache_dir, max_bytes=None):
+    global CACHE_DIR, CACHE_MAX_BYTES
+    CACHE_DIR = cache_dir
+    if max_bytes:
+        CACHE_MAX_BYTES = int(max_bytes)
+    _local.__dict__.clear()
+    if cache_dir:
+        log_info(f"Caché OCR en: {cache_dir} (máx. {CACHE_MAX_BYTES // (1024 * 1024)} MB)")
+
+def is_enabled():
+    return bool(CACHE_DIR)
+
+# -------------------------------
+# Conexión a la base de la caché (se crea al primer uso)
+# -------------------------------
+def _connection():
+    key = (os.getpid(), CACHE_DIR)
+    conn = getattr(_local, "conn", None)
+    if conn is not None and getattr(_local, "key", None) == key:
+        return conn
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    conn = sqlite3.connect(os.path.join(CACHE_DIR, CACHE_DB_NAME), timeout=30)
+    conn.execute(f"PRAGMA journal_mode={JOURNAL_MODE}")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS entries ("
+        " key TEXT PRIMARY KEY, text TEXT NOT NULL, size INTEGER NOT NULL, last_access REAL NOT NULL)"
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_access ON entries(last_access)")
+    conn.commit()
+    _local.conn = conn
+    _local.key = key
+    return conn
+
+# -------------------------------
+# Clave de contenido: hash de los píxeles de la página + ajustes de OCR
+# -------------------------------
+def page_key(image, settings):
+    digest = hashlib.sha256()
+    digest.update(json.dumps(settings, sort_keys=True).encode("utf-8"))
+    digest.update(f"{image.mode}|{image.size[0]}x{image.size[1]}".encode("utf-8"))
+    digest.update(image.tobytes())
+    return digest.hexdigest()
+
+# -------------------------------
+# Busca un texto en la caché (None si no existe)
+# -------------------------------
+def get(key):
+    if not is_enabled():
+        return None
+    try:
+        conn = _connection()
+        row = conn.execute("SELECT text FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        conn.execute("UPDATE entries SET last_access = ? WHERE key = ?", (time.time(), key))
+        conn.commit()
+        return row[0]
+    except Exception as e:
+        log_error(f"Error leyendo caché OCR: {safe_str(e)}")
+        return None
+
+# -------------------------------
+# Guarda un texto en la caché y desaloja las entradas menos usadas si hace falta
+# -------------------------------
+def put(key, text):
+    if not is_enabled():
+        return
+    try:
+        conn = _connection()
+        size = len(text.encode("utf-8", errors="ignore"))
+        # Si la clave ya existía, el tamaño estimado solo cambia en la diferencia
+        row = conn.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+        conn.execute(
+            "INSERT OR REPLACE INTO entries (key, text, size, last_access) VALUES (?, ?, ?, ?)",
+            (key, text, size, time.time())
+        )
+        conn.commit()
+        _evict_if_needed(conn, size - (row[0] if row else 0))
+    except Exception as e:
+        log_error(f"Error escribiendo caché OCR: {safe_str(e)}")
+
+# -------------------------------
+# Política LRU acotada por tamaño
+# El tamaño total se cuenta (SUM) al abrir, cada EVICT_CHECK_PUTS escrituras y
+# antes de desalojar; entre recuentos se suma lo escrito por este proceso
+# -------------------------------
+def _evict_if_needed(conn, added):
+    with _evict_lock:
+        owner = (os.getpid(), CACHE_DIR)
+        counted = _size["key"] != owner or _size["puts"] >= EVICT_CHECK_PUTS
+        if counted:
+            _size.update(key=owner, bytes=_total_size(conn), puts=0)
+        else:
+            _size["bytes"] += added
+            _size["puts"] += 1
+        if _size["bytes"] <= CACHE_MAX_BYTES:
+            return
+
+        total = _size["bytes"] if counted else _total_size(conn)
+        _size.update(bytes=total, puts=0)
+        if total <= CACHE_MAX_BYTES:
+            return
+
+        target = int(CACHE_MAX_BYTES * EVICT_TARGET)
+        removed = 0
+        for key, size in conn.execute("SELECT key, size FROM entries ORDER BY last_access").fetchall():
+            if total <= target:
+                break
+            conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            total -= size
+            removed += 1
+        conn.commit()
+        _size["bytes"] = total
+        log_info(f"Caché OCR: {removed} entradas desalojadas (LRU)")
+
+def _total_size(conn):
+    return conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+# -------------------------------
+# Utilidad segura para logs
+# -------------------------------
+def safe_str(obj):
+    try:
+        return str(obj)
+    except Exception:
+        try:
+            return str(obj).encode("utf-8", errors="replace").decode("utf-8", errors="replace")
+        except Exception:
+            return "[Error al convertir a string]"
@@ -0,0 +1,238 @@
+import time
+import threading
+import traceback
+import numpy as np
+from ocr_utils.logger import log_info, log_error
+
+# -------------------------------
+# Configuración
+# -------------------------------
+BATCH_MAX_PADDING = 1.3  # Lienzo común / área real máxima al juntar páginas de distinto tamaño en un lote
+RAISE_ERRORS = False  # True en el proceso aislado: el error llega al padre como OcrFailed en vez de una página vacía
+
+# -------------------------------
+# Interfaz común de motores OCR
+# recognize(imagen) → (texto, confianza 0..1)
+# -------------------------------
+class OcrEngine:
+    name = "base"
+
+    def recognize(self, image):
+        raise NotImplementedError
+
+    def recognize_batch(self, images):
+        return [self.recognize(image) for image in images]
+
+    # Mosaicos de varias páginas en un lote; tile_counts: mosaicos de cada página, en orden
+    def recognize_tiles(self, tiles, tile_counts):
+        return self.recognize_batch(tiles)
+
+    def warm_up(self):
+        pass
+
+# -------------------------------
+# Motor EasyOCR (el modelo se carga al primer uso, una vez por proceso)
+# -------------------------------
+class EasyOcrEngine(OcrEngine):
+    name = "easyocr"
+
+    def __init__(self, languages, recognizer_batch=8):
+        self.languages = list(languages)
+        self.recognizer_batch = recognizer_batch
+        self._reader = None
+        self._lock = threading.Lock()
+        self.calls = {"single": 0, "batched": 0}  # Llamadas a readtext / readtext_batched
+
+    def get_reader(self):
+        if self._reader is None:
+            with self._lock:
+                if self._reader is None:
+                    import easyocr
+                    start = time.perf_counter()
+                    self._reader = easyocr.Reader(self.languages, gpu=False)
+                    log_info(f"Modelo EasyOCR cargado en {time.perf_counter() - start:.2f}s")
+        return self._reader
+
+    def warm_up(self):
+        self.get_reader()
+
+    # Los párrafos se agrupan igual que readtext(paragraph=True)
+    def recognize(self, image):
+        try:
+            self.calls["single"] += 1
+            results = self.get_reader().readtext(
+                np.asarray(image), detail=1, paragraph=False, batch_size=self.recognizer_batch
+            )
+            return self._results_to_text(results)
+        except Exception:
+            if RAISE_ERRORS:
+                raise
+            log_error("Error en EasyOCR:\n" + safe_str(traceback.format_exc()))
+            return "", 0.0
+
+    # Detección y reconocimiento de varias páginas en una llamada. EasyOCR exige
+    # dimensiones iguales en el lote: las páginas (recortadas, de tamaños distintos)
+    # se agrupan por tamaño parecido y se rellenan de blanco hasta un lienzo común
+    def recognize_batch(self, images):
+        arrays = [np.asarray(image) for image in images]
+        outputs = [("", 0.0)] * len(arrays)
+
+        for indexes in batch_groups([img_np.shape for img_np in arrays]):
+            if len(indexes) == 1:
+                outputs[indexes[0]] = self.recognize(arrays[indexes[0]])
+                continue
+            try:
+                self.calls["batched"] += 1
+                batch_results = self.get_reader().readtext_batched(
+                    pad_to_canvas([arrays[idx] for idx in indexes]), detail=1, paragraph=False,
+                    batch_size=self.recognizer_batch
+                )
+                for idx, results in zip(indexes, batch_results):
+                    outputs[idx] = self._results_to_text(results)
+            except Exception as e:
+                log_error(f"Error en EasyOCR por lotes, se reintenta página a página: {safe_str(e)}")
+                for idx in indexes:
+                    outputs[idx] = self.recognize(arrays[idx])
+
+        return outputs
+
+    # Convierte la salida detail=1 en (texto, confianza media ponderada por longitud)
+    @staticmethod
+    def _results_to_text(results):
+        from easyocr.utils import get_paragraph
+
+        weights = [max(1, len(text.strip())) for _, text, _ in results]
+        confidence = (
+            sum(conf * weight for (_, _, conf), weight in zip(results, weights)) / sum(weights)
+            if results else 0.0
+        )
+
+        paragraphs = get_paragraph(results, x_ths=1.0, y_ths=0.5, mode='ltr')
+        clean_text = "\n".join([line.strip() for _, line in paragraphs if line.strip()])
+        return clean_text, float(confidence)
+
+# -------------------------------
+# Grupos de imágenes que comparten lienzo: se ordenan por área y cada una se suma
+# al grupo actual mientras el lienzo (alto y ancho máximos) no supere
+# BATCH_MAX_PADDING veces el área real; solo se agrupan imágenes con los mismos canales
+# Devuelve listas de índices de 'shapes'
+# -------------------------------
+def batch_groups(shapes, max_padding=None):
+    max_padding = max_padding or BATCH_MAX_PADDING
+    order = sorted(range(len(shapes)), key=lambda idx: (shapes[idx][2:], shapes[idx][0] * shapes[idx][1]))
+
+    groups = []
+    for idx in order:
+        height, width = shapes[idx][:2]
+        if groups:
+            group = groups[-1]
+            canvas_h, canvas_w = max(group["height"], height), max(group["width"], width)
+            area = group["area"] + height * width
+            same_channels = shapes[group["indexes"][0]][2:] == shapes[idx][2:]
+            if same_channels and canvas_h * canvas_w * (len(group["indexes"]) + 1) <= max_padding * area:
+                group.update(height=canvas_h, width=canvas_w, area=area)
+                group["indexes"].append(idx)
+                continue
+        groups.append({"indexes": [idx], "height": height, "width": width, "area": height * width})
+    return [group["indexes"] for group in groups]
+
+# Copia cada imagen en la esquina superior izquierda de un lienzo blanco común
+# (las coordenadas de las detecciones no cambian)
+def pad_to_canvas(arrays):
+    height = max(arr.shape[0] for arr in arrays)
+    width = max(arr.shape[1] for arr in arrays)
+    canvases = []
+    for arr in arrays:
+        if arr.shape[:2] == (height, width):
+            canvases.append(arr)
+            continue
+        canvas = np.full((height, width) + arr.shape[2:], 255, dtype=arr.dtype)
+        canvas[:arr.shape[0], :arr.shape[1]] = arr
+        canvases.append(canvas)
+    return canvases
+
+# -------------------------------
+# Motor Tesseract (pytesseract): mucho más rápido en CPU para páginas limpias
+# -------------------------------
+TESSERACT_LANGUAGES = {"es": "spa", "en": "eng", "pt": "por", "fr": "fra", "de": "deu", "it": "ita"}
+
+class TesseractEngine(OcrEngine):
+    name = "tesseract"
+
+    def __init__(self, languages, config="--psm 3"):
+        self.lang = "+".join(TESSERACT_LANGUAGES.get(lang, lang) for lang in languages)
+        self.config = config
+
+    def warm_up(self):
+        import pytesseract
+        pytesseract.get_tesseract_version()
+
+    # Una línea de salida por línea detectada; confianza media ponderada por longitud
+    def recognize(self, image):
+        try:
+            import pytesseract
+            data = pytesseract.image_to_data(
+                np.asarray(image), lang=self.lang, config=self.config,
+                output_type=pytesseract.Output.DICT
+            )
+
+            lines = {}
+            weighted, weights = 0.0, 0
+            for idx, word in enumerate(data["text"]):
+                word = (word or "").strip()
+                conf = float(data["conf"][idx])
+                if not word or conf < 0:
+                    continue
+                key = (data["block_num"][idx], data["par_num"][idx], data["line_num"][idx])
+                lines.setdefault(key, []).append(word)
+                weighted += conf * len(word)
+                weights += len(word)
+
+            text = "\n".join(" ".join(words) for _, words in sorted(lines.items()))
+            confidence = (weighted / weights) / 100.0 if weights else 0.0
+            return text, confidence
+        except Exception:
+            if RAISE_ERRORS:
+                raise
+            log_error("Error en Tesseract:\n" + safe_str(traceback.format_exc()))
+            return "", 0.0
+
+# -------------------------------
+# Registro de motores disponibles
+# -------------------------------
+ENGINE_CLASSES = {
+    EasyOcrEngine.name: EasyOcrEngine,
+    TesseractEngine.name: TesseractEngine,
+}
+
+# -------------------------------
+# Estadísticas por motor: llamadas, páginas, tiempo y aceptación
+# -------------------------------
+def record_engine_call(engine_stats, name, pages, seconds, accepted):
+    entry = engine_stats.setdefault(name, {"pages": 0, "seconds": 0.0, "accepted": 0, "rejected": 0})
+    entry["pages"] += pages
+    entry["seconds"] = round(entry["seconds"] + seconds, 3)
+    entry["accepted"] += accepted
+    entry["rejected"] += pages - accepted
+
+def format_engine_stats(engine_stats):
+    parts = []
+    for name, entry in sorted(engine_stats.items()):
+        per_page = entry["seconds"] / entry["pages"] if entry["pages"] else 0.0
+        parts.append(
+            f"{name}: {entry['pages']} págs, {entry['seconds']:.1f}s ({per_page:.2f}s/pág),"
+            f" aceptadas {entry['accepted']}/{entry['pages']}"
+        )
+    return " | ".join(parts)
+
+# -------------------------------
+# Utilidad segura para logs
+# -------------------------------
+def safe_str(obj):
+    try:
+        return str(obj)
+    except Exception:
+        try:
+            return str(obj).encode("utf-8", errors="replace").decode("utf-8", errors="replace")
+        except Exception:
+            return "[Error al convertir a string]"
@@ -1,11 +1,20 @@
 import os
-import traceback
-from pdf2image import convert_from_path
-from PIL import Image, ImageEnhance, ImageFilter
-import cv2
-import numpy as np
+import queue
+import tempfile
+import threading
+import time
+from pdf2image import convert_from_path, pdfinfo_from_path
+from PIL import Image
 from fpdf import FPDF
-import easyocr
+from PyPDF2 import PdfReader
+from ocr_utils import ocr_cache
+from ocr_utils import preprocessing
+from ocr_utils import ocr_engines
+from ocr_utils import metadata_writer
+from ocr_utils import metrics
+from ocr_utils import search_index
+from ocr_utils import output_bundle
+from ocr_utils import resource_guard
 from ocr_utils.logger import log_info, log_error
 import re
 
@@ -15,11 +24,74 @@ import re
 DEBUG = True
 USE_PREPROCESSING = True
 OCR_DPI = 400  # Mayor resolución para mejorar OCR
+ADAPTIVE_DPI = True  # Primera pasada a baja resolución; re-render a OCR_DPI solo si falla
+LOW_DPI = 200
+MIN_CONFIDENCE = 0.5  # Confianza media de EasyOCR bajo la cual se escala a OCR_DPI
+OCR_LANGUAGES = ['es']
+OCR_ENGINE = os.environ.get("OCR_ENGINE", "easyocr")  # 'easyocr', 'tesseract' o 'auto'
+FALLBACK_MIN_CONFIDENCE = 0.6  # Confianza mínima para aceptar el primer motor en modo 'auto'
+PAGE_WINDOW = 2  # Páginas rasterizadas por bloque (streaming)
+RENDER_TO_DISK = True  # pdftoppm escribe las páginas en disco temporal y se cargan de a una
+USE_CONTENT_CROP = True  # OCR solo sobre la caja del contenido (sin márgenes ni bordes)
+USE_TILING = True  # Páginas más altas que preprocessing.TILE_MAX_HEIGHT se leen por mosaicos
+USE_BLANK_DETECTION = True  # Omitir OCR en páginas en blanco o casi vacías
+USE_TEXT_LAYER = True  # Reutilizar texto embebido válido en lugar de hacer OCR
+OCR_PAGE_BATCH = 4  # Páginas por llamada a EasyOCR (detección por lotes)
+OCR_RECOGNIZER_BATCH = 8  # Tamaño de lote del reconocedor de EasyOCR
+PIPELINE_DEPTH = 2  # Páginas en cola entre etapas (rasterizado → preproceso → OCR → escritura)
+OUTPUT_MODE = os.environ.get("OCR_OUTPUT_MODE", "pages")  # 'pages' (.txt y _ocr.pdf por página) o 'bundle' (un paquete por documento)
 
 # -------------------------------
-# Inicializar lector EasyOCR
+# Motores OCR: se crean al primer uso (una instancia compartida por proceso)
+# Importar este módulo no carga torch ni el modelo
+# Con resource_guard.PAGE_TIMEOUT_SECONDS > 0 el OCR corre en un proceso aislado
+# (isolated=False fuerza el motor del propio proceso)
 # -------------------------------
-reader = easyocr.Reader(['es'], gpu=False)
+_engines = {}  # (nombre, aislado) → motor
+_engines_lock = threading.Lock()
+
+def get_engine(name=None, isolated=None):
+    name = name or ("easyocr" if OCR_ENGINE == "auto" else OCR_ENGINE)
+    if isolated is None:
+        isolated = resource_guard.PAGE_TIMEOUT_SECONDS > 0
+    key = (name, isolated)
+    if key not in _engines:
+        with _engines_lock:
+            if key not in _engines:
+                _engines[key] = _create_engine(name, isolated)
+    return _engines[key]
+
+def _create_engine(name, isolated):
+    engine_class = ocr_engines.ENGINE_CLASSES.get(name)
+    if engine_class is None:
+        raise ValueError(f"Motor OCR desconocido: {name}")
+    if isolated:
+        return resource_guard.IsolatedEngine(name)
+    options = {"recognizer_batch": OCR_RECOGNIZER_BATCH} if engine_class is ocr_engines.EasyOcrEngine else {}
+    return engine_class(OCR_LANGUAGES, **options)
+
+# Lector EasyOCR del propio proceso (aunque el OCR de las páginas esté aislado)
+def get_reader():
+    return get_engine("easyocr", isolated=False).get_reader()
+
+# -------------------------------
+# Precarga los motores de la política actual (opcionalmente en un hilo de fondo)
+# -------------------------------
+def warm_up_reader(background=False):
+    def _warm_up():
+        names = ["tesseract", "easyocr"] if OCR_ENGINE == "auto" else [OCR_ENGINE]
+        for name in names:
+            try:
+                get_engine(name).warm_up()
+            except Exception as e:
+                log_error(f"Error precargando motor OCR {name}: {safe_str(e)}")
+
+    if not background:
+        _warm_up()
+        return None
+    thread = threading.Thread(target=_warm_up, name="ocr-warmup", daemon=True)
+    thread.start()
+    return thread
 
 # -------------------------------
 # Convierte PDF a imágenes
@@ -36,37 +108,114 @@ def convert_pdf_to_images(pdf_path, dpi=OCR_DPI):
         return []
 
 # -------------------------------
-# Preprocesamiento avanzado de imagen
+# Obtiene el número de páginas sin rasterizar el PDF
 # -------------------------------
-def preprocess_image(pil_image):
+def get_pdf_page_count(pdf_path):
     try:
-        img = pil_image.convert('L')  # Escala de grises
+        info = pdfinfo_from_path(pdf_path)
+        return int(info.get("Pages", 0))
+    except Exception as e:
+        msg = f"Error al leer información del PDF: {safe_str(e)}"
+        log_error(msg)
+        if DEBUG: print(msg)
+        return 0
 
-        # Aumentar contraste
-        enhancer = ImageEnhance.Contrast(img)
-        img = enhancer.enhance(2.0)
+# -------------------------------
+# Agrupa números de página consecutivos en bloques de tamaño máximo 'window'
+# Ejemplo: [1, 2, 3, 5] con window=2 → [(1, 2), (3, 3), (5, 5)]
+# -------------------------------
+def _page_runs(page_numbers, window):
+    runs = []
+    window = max(1, int(window))
+    for page in sorted(set(page_numbers)):
+        if runs and page == runs[-1][1] + 1 and page - runs[-1][0] < window:
+            runs[-1] = (runs[-1][0], page)
+        else:
+            runs.append((page, page))
+    return runs
 
-        # Filtro para mejorar bordes
-        img = img.filter(ImageFilter.MedianFilter(size=3))
+# -------------------------------
+# Fuente de páginas en streaming: rasteriza una ventana de páginas a la vez
+# y entrega tuplas (numero_pagina, imagen) sin mantener el PDF completo en memoria
+# 'timings' recibe el tiempo de rasterizado repartido entre las páginas de cada ventana
+# admit(numero_pagina) se llama antes de cargar cada página; si devuelve False se detiene
+# -------------------------------
+def iter_pdf_pages(pdf_path, dpi=OCR_DPI, window=PAGE_WINDOW, pages=None, timings=None, admit=None):
+    if pages is None:
+        pages = range(1, get_pdf_page_count(pdf_path) + 1)
 
-        img_np = np.array(img)
+    for first, last in _page_runs(pages, window):
+        try:
+            start = time.perf_counter()
+            if RENDER_TO_DISK:
+                with tempfile.TemporaryDirectory(prefix="ocr_pages_") as tmp_dir:
+                    paths = convert_from_path(
+                        pdf_path, dpi=dpi, first_page=first, last_page=last,
+                        output_folder=tmp_dir, paths_only=True
+                    )
+                    metrics.record(timings, "render", time.perf_counter() - start, len(paths))
+                    for offset, path in enumerate(sorted(paths)):
+                        if admit is not None and not admit(first + offset):
+                            return
+                        image = Image.open(path)
+                        image.load()
+                        yield first + offset, image
+                        del image
+            else:
+                images = convert_from_path(pdf_path, dpi=dpi, first_page=first, last_page=last)
+                metrics.record(timings, "render", time.perf_counter() - start, len(images))
+                for offset in range(len(images)):
+                    if admit is not None and not admit(first + offset):
+                        return
+                    yield first + offset, images[offset]
+                    images[offset] = None
+        except Exception as e:
+            msg = f"Error al rasterizar páginas {first}-{last}: {safe_str(e)}"
+            log_error(msg)
+            if DEBUG: print(msg)
 
-        # Umbral binario (Otsu) y limpieza de ruido
-        _, img_bin = cv2.threshold(img_np, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-        img_bin = cv2.medianBlur(img_bin, 3)
+# -------------------------------
+# Extrae la capa de texto embebida, página por página
+# Devuelve {numero_pagina: texto} solo para páginas cuyo texto pasa is_valid_text
+# -------------------------------
+def extract_text_layer(pdf_path):
+    valid_pages = {}
+    try:
+        pdf = PdfReader(pdf_path)
+        for idx, page in enumerate(pdf.pages):
+            try:
+                text = page.extract_text() or ""
+            except Exception as e:
+                log_error(f"Error extrayendo texto embebido de página {idx + 1}: {safe_str(e)}")
+                continue
+            text = "\n".join(line.strip() for line in text.splitlines() if line.strip())
+            if text and is_valid_text(text):
+                valid_pages[idx + 1] = text
+    except Exception as e:
+        msg = f"Error leyendo capa de texto del PDF: {safe_str(e)}"
+        log_error(msg)
+        if DEBUG: print(msg)
+    return valid_pages
 
-        # Corrección de inclinación (deskew)
-        coords = np.column_stack(np.where(img_bin < 255))
-        if coords.any():
-            angle = cv2.minAreaRect(coords)[-1]
-            angle = -(90 + angle) if angle < -45 else -angle
-            (h, w) = img_bin.shape
-            M = cv2.getRotationMatrix2D((w // 2, h // 2), angle, 1.0)
-            img_rotated = cv2.warpAffine(img_bin, M, (w, h), flags=cv2.INTER_CUBIC, borderMode=cv2.BORDER_REPLICATE)
-        else:
-            img_rotated = img_bin
+# -------------------------------
+# Tamaño de cada página en puntos {numero_pagina: (ancho, alto)}, sin rasterizar
+# -------------------------------
+def get_page_sizes(pdf_path):
+    sizes = {}
+    try:
+        for idx, page in enumerate(PdfReader(pdf_path).pages):
+            box = page.mediabox
+            sizes[idx + 1] = (float(box.width), float(box.height))
+    except Exception as e:
+        log_error(f"Error leyendo tamaño de páginas del PDF: {safe_str(e)}")
+    return sizes
 
-        return Image.fromarray(img_rotated)
+# -------------------------------
+# Preprocesamiento avanzado de imagen
+# -------------------------------
+def preprocess_image(pil_image):
+    try:
+        return preprocessing.preprocess_array(pil_image)
     except Exception as e:
         msg = f"Error en preprocesamiento de imagen: {safe_str(e)}"
         log_error(msg)
@@ -74,58 +223,144 @@ def preprocess_image(pil_image):
         return pil_image
 
 # -------------------------------
-# OCR con EasyOCR
+# OCR de una página con el motor por defecto
 # -------------------------------
 def perform_ocr(image):
-    try:
-        img_np = np.array(image)
-        results = reader.readtext(img_np, detail=0, paragraph=True)
-        clean_text = "\n".join([line.strip() for line in results if line.strip()])
-        return clean_text
-    except Exception as e:
-        trace = traceback.format_exc()
-        msg = "Error en EasyOCR:\n" + safe_str(trace)
-        log_error(msg)
-        if DEBUG: print(msg)
-        return ""
+    return perform_ocr_detailed(image)[0]
 
+# -------------------------------
+# OCR devolviendo también la confianza media (0..1)
+# -------------------------------
+def perform_ocr_detailed(image, engine=None):
+    return get_engine(engine).recognize(image)
 
+# -------------------------------
+# OCR por lotes: detección y reconocimiento de varias páginas en una llamada
+# Devuelve [(texto, confianza), ...] en el mismo orden que 'images'
+# -------------------------------
+def perform_ocr_batch(images, engine=None):
+    return get_engine(engine).recognize_batch(images)
 
+# -------------------------------
+# Enrutamiento de motores por página
+# - 'easyocr' / 'tesseract': un solo motor para todo el lote
+# - 'auto': Tesseract primero; las páginas que no pasan is_valid_text o quedan
+#   por debajo de FALLBACK_MIN_CONFIDENCE se repiten con EasyOCR
+# 'engines' permite fijar el motor de páginas concretas (None = política general)
+# Cada elemento de 'images' es una página o una lista de mosaicos de la misma página
+# 'failed' recibe los índices cuyo OCR se canceló por tiempo (no se repiten con otro motor)
+# -------------------------------
+def recognize_pages(images, engines=None, engine_stats=None, policy=None, failed=None):
+    policy = policy or OCR_ENGINE
+    engine_stats = engine_stats if engine_stats is not None else {}
+    engines = engines or [None] * len(images)
+    outputs = [("", 0.0)] * len(images)
+    failed = failed if failed is not None else set()
+
+    def run(name, indexes):
+        start = time.perf_counter()
+
+        # Una página puede llegar dividida en mosaicos: se leen todos en el mismo lote
+        tiles, tile_counts = [], []
+        for idx in indexes:
+            parts = images[idx] if isinstance(images[idx], list) else [images[idx]]
+            tiles.extend(parts)
+            tile_counts.append(len(parts))
+        results = get_engine(name).recognize_tiles(tiles, tile_counts)
+
+        accepted = 0
+        offset = 0
+        for idx, count in zip(indexes, tile_counts):
+            page_results = results[offset:offset + count]
+            offset += count
+            if any(isinstance(result, resource_guard.OcrFailed) for result in page_results):
+                failed.add(idx)
+                continue
+            outputs[idx] = _merge_tile_results(page_results, getattr(images[idx], "overlaps", None))
+            accepted += 1 if _is_acceptable(outputs[idx]) else 0
+        ocr_engines.record_engine_call(engine_stats, name, len(indexes), time.perf_counter() - start, accepted)
+
+    groups = {}
+    for idx, name in enumerate(engines):
+        name = name or ("tesseract" if policy == "auto" else policy)
+        groups.setdefault(name, []).append(idx)
+
+    for name, indexes in groups.items():
+        run(name, indexes)
+
+    if policy == "auto":
+        fallback = [
+            idx for idx in groups.get("tesseract", [])
+            if engines[idx] is None and idx not in failed and not _is_acceptable(outputs[idx])
+        ]
+        if fallback:
+            run("easyocr", fallback)
+
+    return outputs
+
+def _merge_tile_results(results, overlaps=None):
+    if len(results) == 1:
+        return results[0]
+    weights = [max(1, len(text)) for text, _ in results]
+    confidence = sum(conf * weight for (_, conf), weight in zip(results, weights)) / sum(weights)
+    return preprocessing.merge_tile_texts([text for text, _ in results], overlaps), confidence
+
+def _is_acceptable(result):
+    text, confidence = result
+    return bool(text.strip()) and is_valid_text(text) and confidence >= FALLBACK_MIN_CONFIDENCE
 
 # -------------------------------
-# Guarda texto como .txt
+# Guarda texto como .txt (devuelve True si se escribió)
 # -------------------------------
 def save_ocr_text(text, output_path):
     try:
         with open(output_path, 'w', encoding='utf-8', errors='ignore') as f:
             f.write(text)
         log_info(f"Texto guardado en {output_path}")
+        return True
     except Exception as e:
         msg = f"Error al guardar texto OCR: {safe_str(e)}"
         log_error(msg)
         if DEBUG: print(msg)
+        return False
 
 # -------------------------------
 # Guarda texto como PDF
 # -------------------------------
-def save_text_as_pdf(text, output_path):
+def save_text_as_pdf(text, output_path, metadata=None):
+    return save_pages_as_pdf([text], output_path, metadata)
+
+# -------------------------------
+# Guarda varios textos en un solo PDF (cada uno empieza en página nueva)
+# Devuelve True si se escribió
+# -------------------------------
+def save_pages_as_pdf(texts, output_path, metadata=None):
     try:
         pdf = FPDF()
-        pdf.add_page()
         pdf.set_font("Arial", size=12)
         pdf.set_auto_page_break(auto=True, margin=15)
 
-        clean_text = text.encode('latin-1', errors='replace').decode('latin-1', errors='replace')
-
-        for line in clean_text.split('\n'):
-            pdf.multi_cell(0, 10, line)
-
-        pdf.output(output_path)
+        for text in texts:
+            pdf.add_page()
+            clean_text = text.encode('latin-1', errors='replace').decode('latin-1', errors='replace')
+            for line in clean_text.split('\n'):
+                pdf.multi_cell(0, 10, line)
+
+        if metadata:
+            # Metadatos escritos junto con el PDF: el archivo se escribe una sola vez
+            data = pdf.output(dest='S')
+            if isinstance(data, str):
+                data = data.encode('latin-1')
+            metadata_writer.save_pdf_bytes_with_metadata(data, output_path, metadata)
+        else:
+            pdf.output(output_path)
         log_info(f"PDF de texto guardado en: {output_path}")
+        return True
     except Exception as e:
         msg = f"Error al guardar PDF de texto: {safe_str(e)}"
         log_error(msg)
         if DEBUG: print(msg)
+        return False
 
 import re
 
@@ -161,34 +396,465 @@ def is_valid_text(text):
     # Si pasa los filtros, el texto es considerado válido
     return True
 
+# -------------------------------
+# Pipeline por etapas: colas acotadas entre hilos
+# -------------------------------
+_END = object()  # Marca de fin de flujo entre etapas
+
+def _put(q, item, stop_event):
+    while not stop_event.is_set():
+        try:
+            q.put(item, timeout=0.5)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+def _drain(q, stop_event):
+    while not stop_event.is_set():
+        try:
+            item = q.get(timeout=0.5)
+        except queue.Empty:
+            continue
+        if item is _END:
+            return
+        yield item
+
+def _run_stage(name, source, func, out_queue, stop_event):
+    try:
+        for item in source:
+            if stop_event.is_set():
+                break
+            result = func(item)
+            if out_queue is not None and not _put(out_queue, result, stop_event):
+                break
+    except Exception as e:
+        msg = f"Error en etapa '{name}' del pipeline: {safe_str(e)}"
+        log_error(msg)
+        if DEBUG: print(msg)
+        # Detener todo el pipeline: las demás etapas no deben esperar para siempre a esta
+        threading.current_thread().error = e
+        stop_event.set()
+    finally:
+        if out_queue is not None:
+            _put(out_queue, _END, stop_event)
+
+def _start_stage(name, source, func, out_queue, stop_event):
+    thread = threading.Thread(
+        target=_run_stage, args=(name, source, func, out_queue, stop_event),
+        name=f"ocr-{name}", daemon=True
+    )
+    thread.error = None  # Excepción que detuvo la etapa
+    thread.start()
+    return thread
+
+# Propaga el error de una etapa detenida al hilo que la coordina
+def _raise_stage_error(threads):
+    for thread in threads:
+        if thread.error is not None:
+            raise RuntimeError(f"Etapa {thread.name} detenida: {safe_str(thread.error)}") from thread.error
+
+# -------------------------------
+# Ajustes que cambian el resultado del OCR (forman parte de la clave de caché)
+# engine: motor con el que se lee la página (por defecto, la política OCR_ENGINE)
+# -------------------------------
+def ocr_settings(dpi=None, engine=None):
+    return {
+        "dpi": dpi or OCR_DPI,
+        "preprocessing": USE_PREPROCESSING,
+        "languages": list(OCR_LANGUAGES),
+        "engine": engine or OCR_ENGINE,
+    }
+
+# -------------------------------
+# Etapas del pipeline de una página
+# Cada página viaja como dict: page, dpi, image, text (si ya se conoce),
+# confidence, cache_key, engine (motor forzado para esa página, o None) y blank
+# -------------------------------
+def _prepare_page(item, dpi=None, page_engines=None, timings=None):
+    page_number, image = item
+    page = {"page": page_number, "dpi": dpi or OCR_DPI, "image": None, "text": None,
+            "confidence": None, "cache_key": None,
+            "engine": (page_engines or {}).get(page_number), "blank": False}
+
+    # Páginas en blanco: se descartan antes de preprocesar y de consultar la caché
+    if USE_BLANK_DETECTION and preprocessing.is_blank_page(image):
+        page["blank"] = True
+        page["text"] = ""
+        return page
+
+    # Consultar la caché antes de preprocesar: un acierto evita preprocesado y OCR
+    if ocr_cache.is_enabled():
+        page["cache_key"] = ocr_cache.page_key(image, ocr_settings(page["dpi"], page["engine"]))
+        page["text"] = ocr_cache.get(page["cache_key"])
+        if page["text"] is not None:
+            page["cached"] = True
+            return page
+
+    with metrics.timed(timings, "preprocess"):
+        processed = preprocess_image(image) if USE_PREPROCESSING else image
+        page["image"] = crop_and_tile(processed)
+    return page
+
+# -------------------------------
+# Recorta al área de contenido y divide páginas muy altas en mosaicos
+# para reducir los píxeles que llegan al detector
+# -------------------------------
+def crop_and_tile(image):
+    try:
+        if USE_CONTENT_CROP:
+            image = preprocessing.crop_to_content(image)
+        if USE_TILING:
+            tiles = preprocessing.split_into_tiles(image)
+            return tiles if len(tiles) > 1 else tiles[0]
+        return image
+    except Exception as e:
+        msg = f"Error recortando contenido de la página: {safe_str(e)}"
+        log_error(msg)
+        if DEBUG: print(msg)
+        return image
+
+# -------------------------------
+# Ejecuta rasterizado + preprocesado en hilos y el OCR en el hilo que consume;
+# entrega cada página con su texto y confianza
+# Cada página reserva su memoria estimada (page_sizes y dpi) en el presupuesto
+# del proceso antes de rasterizarse y la libera al salir del OCR
+# -------------------------------
+def _iter_ocr_results(pdf_path, page_numbers, dpi, page_engines=None, engine_stats=None, timings=None,
+                      page_sizes=None):
+    depth = max(1, PIPELINE_DEPTH)
+    stop_event = threading.Event()
+    rendered = queue.Queue(maxsize=depth)
+    prepared = queue.Queue(maxsize=depth)
+
+    budget = resource_guard.get_budget()
+    reserved = {}  # página → MB reservados
+
+    def admit(page_number):
+        cost = resource_guard.page_memory_mb((page_sizes or {}).get(page_number), dpi)
+        if not budget.acquire(cost, stop_event):
+            return False
+        reserved[page_number] = cost
+        return True
+
+    def release(page):
+        budget.release(reserved.pop(page["page"], 0.0))
+
+    pages = iter_pdf_pages(pdf_path, dpi=dpi, pages=page_numbers, timings=timings, admit=admit)
+    workers = [
+        _start_stage("render", pages, lambda item: item, rendered, stop_event),
+        _start_stage("preprocess", _drain(rendered, stop_event),
+                     lambda item: _prepare_page(item, dpi=dpi, page_engines=page_engines, timings=timings),
+                     prepared, stop_event),
+    ]
+
+    # Las páginas se acumulan en bloques de OCR_PAGE_BATCH y se leen en una sola llamada
+    def run_chunk(chunk):
+        pending = [page for page in chunk if page["text"] is None]
+        if pending:
+            start = time.perf_counter()
+            failed = set()
+            with metrics.timed(timings, "ocr", len(pending)):
+                outputs = recognize_pages(
+                    [page["image"] for page in pending],
+                    engines=[page["engine"] for page in pending],
+                    engine_stats=engine_stats, failed=failed
+                )
+            # Tiempo de OCR por página: parte proporcional de la llamada por lotes
+            seconds = round((time.perf_counter() - start) / len(pending), 4)
+            for idx, (page, (text, confidence)) in enumerate(zip(pending, outputs)):
+                page["text"], page["confidence"], page["ocr_seconds"] = text, confidence, seconds
+                page["failed"] = idx in failed
+        for page in chunk:
+            page["image"] = None
+            release(page)
+        return chunk
+
+    try:
+        chunk = []
+        while not stop_event.is_set():
+            try:
+                page = prepared.get(timeout=0.2)
+            except queue.Empty:
+                # El rasterizado espera memoria retenida por el bloque incompleto: leerlo ya
+                if chunk and budget.waiting:
+                    yield from run_chunk(chunk)
+                    chunk = []
+                continue
+            if page is _END:
+                break
+            if page["text"] is not None and not chunk:
+                release(page)
+                yield page
+                continue
+            chunk.append(page)
+            if sum(1 for item in chunk if item["text"] is None) >= max(1, OCR_PAGE_BATCH):
+                yield from run_chunk(chunk)
+                chunk = []
+        if chunk:
+            yield from run_chunk(chunk)
+    finally:
+        stop_event.set()
+        for thread in workers:
+            thread.join()
+        pages.close()
+        for page_number in list(reserved):
+            release({"page": page_number})
+    _raise_stage_error(workers)
+
+# -------------------------------
+# Decide si una página leída a baja resolución debe repetirse a OCR_DPI
+# -------------------------------
+def _needs_escalation(page):
+    if page.get("failed"):
+        return False
+    text = page["text"]
+    if not (text.strip() and is_valid_text(text)):
+        return True
+    return page["confidence"] is not None and page["confidence"] < MIN_CONFIDENCE
+
+def _output_paths(output_folder, base_name, page_number):
+    output_txt = os.path.join(output_folder, f"{base_name}_pagina_{page_number}.txt")
+    output_pdf = os.path.join(output_folder, f"{base_name}_pagina_{page_number}_ocr.pdf")
+    return output_txt, output_pdf
+
+# 'failures' recibe las páginas cuyos archivos no se pudieron escribir
+def _write_page(item, metadata=None, on_page=None, timings=None, indexer=None, failures=None):
+    page_number, output_txt, output_pdf, text, _ = item
+    with metrics.timed(timings, "write_txt"):
+        saved = save_ocr_text(text, output_txt)
+    with metrics.timed(timings, "write_pdf"):
+        saved = save_text_as_pdf(text, output_pdf, metadata) and saved
+    if not saved:
+        # 'failed' no cuenta como completada: se repite al reanudar
+        if failures is not None:
+            failures.append(page_number)
+        _notify_page(on_page, page_number, "failed", output_txt)
+        return
+    if indexer is not None:
+        indexer.add(page_number, text, output_txt, output_pdf)
+    # La página se confirma solo después de escribir sus archivos
+    _notify_page(on_page, page_number, "done", output_txt)
+
+# -------------------------------
+# Modo paquete: una línea por página (también en blanco o sin texto, para que
+# una página que deja de tener texto no conserve el de una ejecución anterior)
+# -------------------------------
+def _write_bundle_page(item, bundle, on_page=None, timings=None, indexer=None):
+    page_number, status, text, info = item
+    with metrics.timed(timings, "write_txt"):
+        bundle.add(page_number, text, status, **info)
+    if indexer is not None and status == "done":
+        indexer.add(page_number, text, bundle.pages_path, bundle.pdf_path)
+    _notify_page(on_page, page_number, status, bundle.pages_path)
+
+# -------------------------------
+# Cierra el paquete y genera el PDF de texto combinado con todas las páginas
+# con texto (también las de ejecuciones anteriores), en orden de página
+# -------------------------------
+def _finish_bundle(bundle, metadata, stats, timings):
+    summary = dict(stats, timings=metrics.summarize_timings(timings))
+    index = bundle.close(summary)
+    pages = [entry for entry in index["pages"].values() if entry[2] == "done"]
+    if not pages:
+        return
+    with metrics.timed(timings, "write_pdf", len(pages)):
+        texts = (record["text"] for record in output_bundle.iter_pages(bundle.pages_path))
+        save_pages_as_pdf(texts, bundle.pdf_path, metadata)
+
+def _notify_page(on_page, page_number, status, txt_path=None):
+    if on_page is None:
+        return
+    try:
+        on_page(page_number, status, txt_path)
+    except Exception as e:
+        log_error(f"Error registrando estado de página {page_number}: {safe_str(e)}")
+
 # -------------------------------
 # Flujo principal: OCR PDF completo
+# Rasterizado, preprocesamiento y escritura corren en hilos propios
+# mientras el hilo principal ejecuta el OCR de la página actual
+# page_range=(inicio, fin) limita el proceso a esas páginas (tareas distribuidas)
+# Con OUTPUT_MODE='bundle' escribe un paquete por documento (o por rango)
+# en lugar de un .txt y un _ocr.pdf por página
 # -------------------------------
-def ocr_pdf_to_text(pdf_path, output_folder):
+def ocr_pdf_to_text(pdf_path, output_folder, metadata=None, page_engines=None,
+                    skip_pages=None, on_page=None, page_range=None):
     log_info(f"OCR del archivo: {pdf_path}")
-    images = convert_pdf_to_images(pdf_path)
+    total_pages = get_pdf_page_count(pdf_path)
+    log_info(f"PDF con {total_pages} páginas (rasterizado por streaming)")
     base_name = os.path.splitext(os.path.basename(pdf_path))[0]
     total_text = ""
-
-    for idx, image in enumerate(images):
-        page_number = idx + 1
-        processed_image = preprocess_image(image) if USE_PREPROCESSING else image
-        text = perform_ocr(processed_image)
+    stats = {"pages": 0, "pages_with_text": 0, "cache_hits": 0, "text_layer_pages": 0,
+             "low_dpi_pages": 0, "escalated_pages": 0, "blank_pages": 0, "skipped_pages": 0,
+             "failed_pages": 0, "memory_waits": 0, "document_pages": total_pages, "engines": {}, "timings": {}}
+    timings = stats["timings"]
+
+    # Páginas ya completadas en una ejecución anterior (reanudación)
+    first_page, last_page = page_range or (1, total_pages)
+    range_pages = range(max(1, first_page), min(last_page, total_pages) + 1)
+    skip_pages = set(skip_pages or ())
+    pending_pages = [n for n in range_pages if n not in skip_pages]
+    stats["skipped_pages"] = len(range_pages) - len(pending_pages)
+    if stats["skipped_pages"]:
+        log_info(f"Reanudando {base_name}: {stats['skipped_pages']}/{len(range_pages)} páginas ya procesadas")
+
+    # Pre-paso: páginas con texto embebido válido no se rasterizan ni pasan por OCR
+    text_layer = {}
+    if USE_TEXT_LAYER and pending_pages:
+        with metrics.timed(timings, "text_layer", len(pending_pages)):
+            text_layer = extract_text_layer(pdf_path)
+    pending_set = set(pending_pages)
+    text_layer = {n: text for n, text in text_layer.items() if n in pending_set}
+    ocr_pages = [n for n in pending_pages if n not in text_layer]
+
+    # Tamaño de las páginas para estimar su memoria (control de admisión)
+    budget = resource_guard.get_budget()
+    page_sizes = get_page_sizes(pdf_path) if ocr_pages and budget.limit_mb else {}
+    budget_waits = budget.waits
+
+    # Índice de búsqueda: el hilo escritor añade cada página aceptada (por lotes)
+    indexer = search_index.DocumentIndexer(pdf_path)
+    unindexed = []
+    write_failures = []  # Páginas aceptadas cuyos archivos no se pudieron escribir
+
+    # Paquete por documento; los rangos de un mismo documento no comparten archivo
+    bundle = None
+    if OUTPUT_MODE == "bundle":
+        whole = first_page <= 1 and last_page >= total_pages
+        bundle_name = base_name if whole else f"{base_name}_paginas_{first_page}_a_{last_page}"
+        bundle = output_bundle.DocumentBundle(output_folder, bundle_name, fresh=not skip_pages)
+        write = lambda item: _write_bundle_page(item, bundle, on_page, timings, indexer)
+    else:
+        write = lambda item: _write_page(item, metadata, on_page, timings, indexer, write_failures)
+
+    stop_event = threading.Event()
+    to_write = queue.Queue(maxsize=max(1, PIPELINE_DEPTH))
+    writer = _start_stage("write", _drain(to_write, stop_event), write, None, stop_event)
+
+    def page_info(page):
+        return {"source": "cache" if page.get("cached") else "ocr", "dpi": page["dpi"],
+                "confidence": page["confidence"], "ocr_seconds": page.get("ocr_seconds")}
+
+    # Si el escritor se detuvo (p.ej. disco lleno) el documento falla en lugar de esperar
+    def send(item):
+        if not _put(to_write, item, stop_event):
+            _raise_stage_error([writer])
+            raise RuntimeError("Escritura de páginas detenida")
+
+    def accept(page_number, text, info):
+        nonlocal total_text
+        if bundle is not None:
+            send((page_number, "done", text, info))
+        else:
+            send((page_number,) + _output_paths(output_folder, base_name, page_number) + (text, info))
+        total_text += text + "\n\n"
+        stats["pages_with_text"] += 1
+
+    def reject(page, status):
+        unindexed.append(page["page"])
+        if bundle is not None:
+            send((page["page"], status, "", page_info(page)))
+        else:
+            _notify_page(on_page, page["page"], status)
+
+    def finish_page(page):
+        stats["pages"] += 1
+        if page.get("failed"):
+            # Se reintenta al reanudar (el manifiesto no la da por completada)
+            stats["failed_pages"] += 1
+            log_error(f"OCR fallido (límite de tiempo o error del motor) en página {page['page']} de {base_name}")
+            reject(page, "failed")
+            return
+        if page["blank"]:
+            stats["blank_pages"] += 1
+            reject(page, "blank")
+            return
+        if page.get("cached"):
+            stats["cache_hits"] += 1
+        text = page["text"]
 
         if text.strip() and is_valid_text(text):
-            output_txt = os.path.join(output_folder, f"{base_name}_pagina_{page_number}.txt")
-            save_ocr_text(text, output_txt)
-
-            output_pdf = os.path.join(output_folder, f"{base_name}_pagina_{page_number}_ocr.pdf")
-            save_text_as_pdf(text, output_pdf)
-
-            total_text += text + "\n\n"
+            # Solo se guardan en caché resultados aceptados
+            if page["cache_key"] and not page.get("cached"):
+                ocr_cache.put(page["cache_key"], text)
+            accept(page["page"], text, page_info(page))
         else:
-            log_error(f"OCR fallido o sin texto útil en página {page_number} de {base_name}")
+            log_error(f"OCR fallido o sin texto útil en página {page['page']} de {base_name}")
+            reject(page, "no_text")
+
+    adaptive = ADAPTIVE_DPI and LOW_DPI < OCR_DPI
+    try:
+        for page_number, text in sorted(text_layer.items()):
+            stats["pages"] += 1
+            stats["text_layer_pages"] += 1
+            accept(page_number, text, {"source": "text_layer"})
+
+        # Primera pasada: baja resolución si el modo adaptativo está activo
+        escalate = []
+        for page in _iter_ocr_results(pdf_path, ocr_pages, LOW_DPI if adaptive else OCR_DPI,
+                                      page_engines, stats["engines"], timings, page_sizes):
+            if adaptive and not page["blank"]:
+                stats["low_dpi_pages"] += 1
+                if _needs_escalation(page):
+                    escalate.append(page["page"])
+                    continue
+            finish_page(page)
+
+        # Segunda pasada: solo las páginas que fallaron a baja resolución
+        if escalate:
+            stats["escalated_pages"] = len(escalate)
+            log_info(f"Re-rasterizando {len(escalate)} páginas a {OCR_DPI} DPI en {base_name}")
+            for page in _iter_ocr_results(pdf_path, escalate, OCR_DPI, page_engines, stats["engines"], timings,
+                                          page_sizes):
+                finish_page(page)
+    finally:
+        stats["memory_waits"] = budget.waits - budget_waits
+        # Terminar escrituras pendientes antes de detener el escritor
+        _put(to_write, _END, stop_event)
+        writer.join()
+        stop_event.set()
+        if write_failures:
+            stats["failed_pages"] += len(write_failures)
+            stats["pages_with_text"] -= len(write_failures)
+            unindexed.extend(write_failures)
+        if bundle is not None:
+            if writer.error is None:
+                _finish_bundle(bundle, metadata, stats, timings)
+            else:
+                bundle.abort()
+        # Actualización incremental: quita páginas que ya no tienen texto válido
+        indexer.close(removed_pages=unindexed, total_pages=total_pages or None)
+    # El escritor falló con la última página: el documento no queda completo
+    _raise_stage_error([writer])
+
+    if stats["text_layer_pages"]:
+        log_info(f"Capa de texto: {stats['text_layer_pages']}/{stats['pages']} páginas sin OCR en {base_name}")
+
+    if stats["cache_hits"]:
+        log_info(f"Caché OCR: {stats['cache_hits']}/{stats['pages']} páginas reutilizadas en {base_name}")
+
+    if stats["low_dpi_pages"]:
+        share = stats["escalated_pages"] / stats["low_dpi_pages"]
+        log_info(f"DPI adaptativo: {stats['escalated_pages']}/{stats['low_dpi_pages']} páginas escaladas ({share:.0%}) en {base_name}")
+
+    if stats["blank_pages"]:
+        log_info(f"Páginas en blanco: {stats['blank_pages']}/{stats['pages']} sin OCR en {base_name}")
+
+    if stats["memory_waits"]:
+        log_info(f"Presupuesto de memoria ({budget.limit_mb:.0f} MB): {stats['memory_waits']} esperas antes de rasterizar en {base_name}")
+
+    if stats["failed_pages"]:
+        log_error(f"Páginas fallidas (OCR o escritura): {stats['failed_pages']}/{stats['pages']} en {base_name}")
+
+    if stats["engines"]:
+        log_info(f"Motores OCR en {base_name}: {ocr_engines.format_engine_stats(stats['engines'])}")
 
     if not total_text.strip():
         log_error(f"OCR fallido o sin texto: {base_name}.pdf")
 
+    return stats
+
 # -------------------------------
 # Utilidad segura para logs
 # -------------------------------
@@ -0,0 +1,146 @@
+import os
+import json
+from ocr_utils.logger import log_info, log_error
+
+# -------------------------------
+# Configuración
+# -------------------------------
+PAGES_SUFFIX = ".pages.jsonl"  # Una línea JSON por página: texto, confianza, origen y tiempos
+INDEX_SUFFIX = ".index.json"  # Desplazamiento y longitud de cada página dentro del .jsonl
+PDF_SUFFIX = "_ocr.pdf"  # PDF de texto con todas las páginas del documento
+
+# -------------------------------
+# Paquete de salida de un documento: sustituye los .txt y _ocr.pdf por página
+# por tres archivos (páginas .jsonl, índice de desplazamientos y PDF combinado)
+# Las páginas se añaden al final del .jsonl; si una página se repite
+# (reanudación, reproceso) vale la última línea
+# -------------------------------
+class DocumentBundle:
+    def __init__(self, output_folder, name, fresh=False):
+        self.pages_path = os.path.join(output_folder, name + PAGES_SUFFIX)
+        self.index_path = os.path.join(output_folder, name + INDEX_SUFFIX)
+        self.pdf_path = os.path.join(output_folder, name + PDF_SUFFIX)
+        self.written = 0
+        if fresh and os.path.exists(self.pages_path):
+            os.remove(self.pages_path)
+        _drop_partial_line(self.pages_path)
+        self._file = open(self.pages_path, "ab")
+
+    # Escribe la página sin fsync: basta con que llegue al sistema operativo
+    # antes de confirmarla en el manifiesto; el fsync se hace una vez al cerrar
+    def add(self, page_number, text, status="done", **info):
+        record = dict(info, page=page_number, status=status, text=text)
+        self._file.write(json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n")
+        self._file.flush()
+        self.written += 1
+
+    # -------------------------------
+    # Cierra el .jsonl y guarda el índice; devuelve el índice
+    # summary: datos del documento que se guardan junto al índice (tiempos, contadores)
+    # -------------------------------
+    def close(self, summary=None):
+        if self._file.closed:
+            return load_index(self.pages_path)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        index = build_index(self.pages_path)
+        index["summary"] = summary or {}
+        _write_json(self.index_path, index)
+        log_info(f"Paquete de salida: {len(index['pages'])} páginas en {os.path.basename(self.pages_path)}")
+        return index
+
+    # Cierre tras un error de escritura: sin índice ni PDF (el .jsonl se repara al reabrirlo)
+    def abort(self):
+        try:
+            self._file.close()
+        except OSError as e:
+            log_error(f"Error cerrando {os.path.basename(self.pages_path)}: {safe_str(e)}")
+
+# -------------------------------
+# Recorre el .jsonl y anota dónde empieza y cuánto ocupa cada página
+# -------------------------------
+def build_index(pages_path):
+    pages = {}
+    offset = 0
+    with open(pages_path, "rb") as f:
+        for line in f:
+            if line.endswith(b"\n"):
+                try:
+                    record = json.loads(line)
+                    pages[str(record["page"])] = [offset, len(line), record.get("status", "done")]
+                except (ValueError, KeyError):
+                    log_error(f"Línea no válida en {os.path.basename(pages_path)} (byte {offset})")
+            offset += len(line)
+    return {"pages_file": os.path.basename(pages_path), "size": offset,
+            "pages": dict(sorted(pages.items(), key=lambda item: int(item[0])))}
+
+# Índice guardado; se reconstruye si el .jsonl cambió después de escribirlo
+def load_index(pages_path):
+    index_path = pages_path[:-len(PAGES_SUFFIX)] + INDEX_SUFFIX
+    try:
+        with open(index_path, "r", encoding="utf-8") as f:
+            index = json.load(f)
+        if index.get("size") == os.path.getsize(pages_path):
+            return index
+    except (OSError, ValueError):
+        pass
+    return build_index(pages_path)
+
+# -------------------------------
+# Acceso a una página (o a todas, en orden) sin leer el resto del archivo
+# -------------------------------
+def read_page(pages_path, page_number, index=None):
+    index = index or load_index(pages_path)
+    entry = index["pages"].get(str(page_number))
+    if entry is None:
+        return None
+    offset, length = entry[0], entry[1]
+    with open(pages_path, "rb") as f:
+        f.seek(offset)
+        return json.loads(f.read(length))
+
+def iter_pages(pages_path, status="done"):
+    index = load_index(pages_path)
+    with open(pages_path, "rb") as f:
+        for offset, length, page_status in index["pages"].values():
+            if status is None or page_status == status:
+                f.seek(offset)
+                yield json.loads(f.read(length))
+
+# Quita una última línea incompleta (proceso interrumpido a mitad de escritura)
+def _drop_partial_line(pages_path):
+    try:
+        with open(pages_path, "rb+") as f:
+            f.seek(0, os.SEEK_END)
+            size = f.tell()
+            if size == 0:
+                return
+            f.seek(max(0, size - 65536))
+            tail = f.read()
+            if tail.endswith(b"\n"):
+                return
+            cut = tail.rfind(b"\n")
+            if cut < 0 and size > len(tail):
+                return  # Línea más larga que el bloque leído: build_index la ignora
+            f.truncate(size - len(tail) + cut + 1)
+    except FileNotFoundError:
+        pass
+
+def _write_json(path, data):
+    temp_path = path + ".tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(temp_path, path)
+
+# -------------------------------
+# Utilidad segura para logs
+# -------------------------------
+def safe_str(obj):
+    try:
+        return str(obj)
+    except Exception:
+        try:
+            return str(obj).encode("utf-8", errors="replace").decode("utf-8", errors="replace")
+        except Exception:
+            return "[Error al convertir a string]"
@@ -1,6 +1,14 @@
 import os
+from concurrent.futures import ThreadPoolExecutor
+import pikepdf
 from PyPDF2 import PdfReader, PdfWriter
-from logger import log_info, log_error  # Cambio: sin prefijo 'ocr_utils.'
+from ocr_utils.logger import log_info, log_error
+from ocr_utils.metadata_writer import apply_docinfo
+
+# -------------------------------
+# Configuración
+# -------------------------------
+SPLIT_WORKERS = 4  # Hilos escribiendo páginas en paralelo
 
 # -------------------------------
 # Divide PDF en páginas individuales
@@ -25,6 +33,69 @@ def split_pdf_by_page(pdf_path, output_folder):
         log_error(f" Error al dividir PDF {safe_str(pdf_path)}: {safe_str(e)}")
 
 
+# -------------------------------
+# Escribe un bloque de páginas: cada hilo abre el origen una sola vez
+# y guarda cada página una sola vez con su docinfo ya asignado
+# -------------------------------
+def _write_tagged_pages(pdf_path, output_folder, base_name, page_indexes, metadata):
+    written = 0
+    with pikepdf.open(pdf_path) as source:
+        for i in page_indexes:
+            output_filename = f"{base_name}_pagina_{i+1}.pdf"
+            try:
+                with pikepdf.new() as page_pdf:
+                    page_pdf.pages.append(source.pages[i])
+                    apply_docinfo(page_pdf, metadata)
+                    page_pdf.save(os.path.join(output_folder, output_filename))
+                written += 1
+            except Exception as e:
+                log_error(f" Error al guardar página {i+1} de {safe_str(pdf_path)}: {safe_str(e)}")
+    return written
+
+# -------------------------------
+# Divide PDF en páginas individuales y escribe los metadatos en la misma pasada
+# (sustituye split_pdf_by_page + insert_metadata_to_pdf, que escribían cada página dos veces)
+# page_range=(inicio, fin) limita la división a esas páginas (ambas incluidas)
+# -------------------------------
+def split_pdf_with_metadata(pdf_path, output_folder, metadata, workers=None, page_range=None):
+    try:
+        base_name = os.path.splitext(os.path.basename(pdf_path))[0]
+        with pikepdf.open(pdf_path) as source:
+            total_pages = len(source.pages)
+
+        first, last = page_range or (1, total_pages)
+        indexes = list(range(max(1, first) - 1, min(last, total_pages)))
+        total_pages = len(indexes)
+        if not indexes:
+            return 0
+
+        workers = max(1, min(int(workers or SPLIT_WORKERS), total_pages))
+        chunks = [indexes[start::workers] for start in range(workers)]
+
+        if workers == 1:
+            written = _write_tagged_pages(pdf_path, output_folder, base_name, chunks[0], metadata)
+        else:
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="pdf-split") as executor:
+                written = sum(executor.map(
+                    lambda chunk: _write_tagged_pages(pdf_path, output_folder, base_name, chunk, metadata),
+                    chunks
+                ))
+
+        log_info(f" {written}/{total_pages} páginas de {safe_str(base_name)} guardadas con metadatos")
+        return written
+    except Exception as e:
+        log_error(f" Error al dividir PDF {safe_str(pdf_path)}: {safe_str(e)}")
+        return 0
+
+
+# -------------------------------
+# Rangos consecutivos de como máximo 'size' páginas, en el formato de split_pdf_by_ranges
+# Ejemplo: page_ranges(7, 3) → [(1, 3), (4, 6), (7, 7)]
+# -------------------------------
+def page_ranges(total_pages, size):
+    size = max(1, int(size))
+    return [(start, min(start + size - 1, total_pages)) for start in range(1, total_pages + 1, size)]
+
 # -------------------------------
 # Divide PDF por rangos personalizados
 # Ejemplo de ranges: [(1, 3), (4, 6)] → páginas 1-3, 4-6
@@ -0,0 +1,247 @@
+import threading
+import cv2
+import numpy as np
+from ocr_utils.logger import log_info
+
+# -------------------------------
+# Configuración
+# -------------------------------
+CONTRAST_FACTOR = 2.0  # Igual que ImageEnhance.Contrast(img).enhance(2.0)
+SKEW_SAMPLE_WIDTH = 800  # Ancho de la miniatura usada para estimar la inclinación
+SKEW_MAX_ANGLE = 15.0  # Grados: rango de búsqueda; más inclinación no se corrige (ver estimate_skew)
+SKEW_COARSE_STEP = 1.0
+SKEW_FINE_STEP = 0.1
+SKEW_MIN_ANGLE = 0.1  # Grados: por debajo no se rota la página
+BLANK_THUMB_WIDTH = 300  # Ancho de la miniatura del detector de páginas en blanco
+BLANK_EDGE_MARGIN = 0.03  # Fracción de cada borde ignorada (sombras y bordes del escáner)
+BLANK_INK_LEVEL = 160  # Gris por debajo del cual un píxel cuenta como tinta
+BLANK_MAX_INK_RATIO = 0.003  # Proporción máxima de tinta de una página en blanco
+BLANK_MAX_COMPONENTS = 3  # Manchas significativas toleradas (grapas, perforaciones)
+BLANK_MIN_COMPONENT_AREA = 4  # Píxeles de miniatura: componentes menores se consideran ruido
+CROP_THUMB_WIDTH = 600  # Ancho de la miniatura usada para localizar el contenido
+CROP_MARGIN_RATIO = 0.01  # Margen conservado alrededor del contenido (fracción del ancho)
+TILE_MAX_HEIGHT = 2560  # Alto máximo por llamada al detector (EasyOCR reduce a 2560 px por defecto)
+TILE_OVERLAP = 160  # Franja donde se busca el corte; si no hay fila limpia, los mosaicos se solapan
+
+# -------------------------------
+# Buffers reutilizables por hilo (se recrean solo si cambia el tamaño de página)
+# -------------------------------
+_buffers = threading.local()
+
+def _scratch(name, shape, dtype=np.uint8):
+    buf = getattr(_buffers, name, None)
+    if buf is None or buf.shape != shape or buf.dtype != dtype:
+        buf = np.empty(shape, dtype=dtype)
+        setattr(_buffers, name, buf)
+    return buf
+
+# -------------------------------
+# Convierte la entrada (PIL o ndarray RGB/L) a escala de grises uint8
+# -------------------------------
+def to_gray(image):
+    img = np.asarray(image)
+    if img.ndim == 2:
+        return img
+    gray = _scratch("gray", img.shape[:2])
+    code = cv2.COLOR_RGBA2GRAY if img.shape[2] == 4 else cv2.COLOR_RGB2GRAY
+    return cv2.cvtColor(img, code, dst=gray)
+
+# -------------------------------
+# Contraste alrededor de la media (tabla de 256 valores, sin imágenes intermedias)
+# -------------------------------
+def _contrast_lut(gray, factor):
+    hist = cv2.calcHist([gray], [0], None, [256], [0, 256]).ravel()
+    mean = int(np.dot(hist, np.arange(256)) / max(1.0, hist.sum()) + 0.5)
+    levels = mean + factor * (np.arange(256, dtype=np.float32) - mean)
+    return np.clip(np.rint(levels), 0, 255).astype(np.uint8)
+
+# -------------------------------
+# Estima la inclinación por perfiles de proyección sobre una miniatura:
+# el ángulo correcto maximiza el contraste entre filas de texto e interlineado
+# Búsqueda gruesa en ±SKEW_MAX_ANGLE (pasos de 1°) y fina alrededor del mejor ángulo
+# Límite: inclinaciones mayores que SKEW_MAX_ANGLE no se miden de forma fiable; si el
+# mejor ángulo queda en el extremo del rango la página no se rota (0.0)
+# -------------------------------
+def _profile_score(ink, angle):
+    h, w = ink.shape
+    M = cv2.getRotationMatrix2D((w // 2, h // 2), angle, 1.0)
+    rotated = cv2.warpAffine(ink, M, (w, h), flags=cv2.INTER_NEAREST, borderValue=0)
+    profile = rotated.sum(axis=1, dtype=np.float32)
+    return float(np.square(np.diff(profile)).sum())
+
+def estimate_skew(img_bin, sample_width=SKEW_SAMPLE_WIDTH):
+    h, w = img_bin.shape
+    scale = min(1.0, sample_width / float(w))
+    if scale < 1.0:
+        small = cv2.resize(img_bin, (max(1, int(w * scale)), max(1, int(h * scale))), interpolation=cv2.INTER_AREA)
+    else:
+        small = img_bin
+
+    # Tinta = píxeles oscuros
+    ink = (small < 128).astype(np.uint8)
+    if not ink.any():
+        return 0.0
+
+    # Búsqueda gruesa y luego fina alrededor del mejor ángulo
+    coarse = np.arange(-SKEW_MAX_ANGLE, SKEW_MAX_ANGLE + 1e-6, SKEW_COARSE_STEP)
+    best = max(coarse, key=lambda angle: _profile_score(ink, angle))
+    if abs(best) >= SKEW_MAX_ANGLE - 1e-6:
+        log_info(f"Inclinación fuera del rango de ±{SKEW_MAX_ANGLE}°: la página no se endereza")
+        return 0.0
+    fine = np.arange(best - SKEW_COARSE_STEP, best + SKEW_COARSE_STEP + 1e-6, SKEW_FINE_STEP)
+    best = max(fine, key=lambda angle: _profile_score(ink, angle))
+    return float(best)
+
+# -------------------------------
+# Clasificador de páginas en blanco o casi vacías (separadores, reversos)
+# Usa proporción de tinta y componentes conexos sobre una miniatura
+# -------------------------------
+def page_ink_stats(image):
+    gray = to_gray(image)
+    h, w = gray.shape
+    scale = min(1.0, BLANK_THUMB_WIDTH / float(w))
+    thumb = cv2.resize(gray, (max(1, int(w * scale)), max(1, int(h * scale))), interpolation=cv2.INTER_AREA)
+
+    th, tw = thumb.shape
+    my, mx = int(th * BLANK_EDGE_MARGIN), int(tw * BLANK_EDGE_MARGIN)
+    inner = thumb[my:th - my, mx:tw - mx] if th > 2 * my and tw > 2 * mx else thumb
+
+    ink = (inner < BLANK_INK_LEVEL).astype(np.uint8)
+    ink_ratio = float(ink.mean()) if ink.size else 0.0
+
+    count, _, component_stats, _ = cv2.connectedComponentsWithStats(ink, connectivity=8)
+    areas = component_stats[1:, cv2.CC_STAT_AREA]  # La etiqueta 0 es el fondo
+    components = int((areas >= BLANK_MIN_COMPONENT_AREA).sum())
+    return ink_ratio, components
+
+def is_blank_page(image):
+    ink_ratio, components = page_ink_stats(image)
+    return ink_ratio <= BLANK_MAX_INK_RATIO and components <= BLANK_MAX_COMPONENTS
+
+# -------------------------------
+# Caja del contenido: unión de los componentes de tinta que no tocan el borde
+# (los bordes del escáner y sombras laterales quedan fuera)
+# Devuelve (y0, y1, x0, x1) en píxeles de la imagen original, o None si no hay contenido
+# -------------------------------
+def content_bbox(image):
+    gray = to_gray(image)
+    h, w = gray.shape
+    scale = min(1.0, CROP_THUMB_WIDTH / float(w))
+    thumb = cv2.resize(gray, (max(1, int(w * scale)), max(1, int(h * scale))), interpolation=cv2.INTER_AREA)
+    th, tw = thumb.shape
+
+    ink = (thumb < 128).astype(np.uint8)
+    count, _, component_stats, _ = cv2.connectedComponentsWithStats(ink, connectivity=8)
+
+    boxes = []
+    for label in range(1, count):
+        x, y, bw, bh, area = component_stats[label]
+        if area < BLANK_MIN_COMPONENT_AREA:
+            continue
+        if x == 0 or y == 0 or x + bw >= tw or y + bh >= th:
+            continue
+        boxes.append((y, y + bh, x, x + bw))
+    if not boxes:
+        return None
+
+    margin = int(CROP_MARGIN_RATIO * tw) + 1
+    y0 = max(0, min(box[0] for box in boxes) - margin)
+    y1 = min(th, max(box[1] for box in boxes) + margin)
+    x0 = max(0, min(box[2] for box in boxes) - margin)
+    x1 = min(tw, max(box[3] for box in boxes) + margin)
+    return (
+        int(y0 / scale), min(h, int(np.ceil(y1 / scale))),
+        int(x0 / scale), min(w, int(np.ceil(x1 / scale))),
+    )
+
+# -------------------------------
+# Recorta la página a su contenido (vista sin copia del arreglo original)
+# -------------------------------
+def crop_to_content(image):
+    img = np.asarray(image)
+    bbox = content_bbox(img)
+    if bbox is None:
+        return img
+    y0, y1, x0, x1 = bbox
+    return img[y0:y1, x0:x1]
+
+# -------------------------------
+# Mosaicos de una página; overlaps[i] indica si el mosaico i+1 repite
+# la franja final del mosaico i (corte sin fila limpia)
+# -------------------------------
+class Tiles(list):
+    def __init__(self, tiles=(), overlaps=()):
+        super().__init__(tiles)
+        self.overlaps = list(overlaps)
+
+# -------------------------------
+# Divide páginas muy altas en mosaicos; cada corte se hace en la fila con menos
+# tinta dentro de la franja de solape para no partir líneas de texto
+# -------------------------------
+def split_into_tiles(image, max_height=None, overlap=None):
+    img = np.asarray(image)
+    max_height = max_height or TILE_MAX_HEIGHT
+    overlap = TILE_OVERLAP if overlap is None else overlap
+    h = img.shape[0]
+    if h <= max_height:
+        return Tiles([img])
+
+    ink_rows = (to_gray(img) < 128).sum(axis=1)
+    tiles = Tiles()
+    start = 0
+    while start < h:
+        end = start + max_height
+        if end >= h:
+            tiles.append(img[start:h])
+            break
+
+        band_start = max(start + 1, end - overlap)
+        cut = band_start + int(np.argmin(ink_rows[band_start:end]))
+        tiles.append(img[start:cut])
+        # Corte limpio: el siguiente mosaico empieza en el corte; si no, se solapa
+        clean = ink_rows[cut] == 0
+        tiles.overlaps.append(not clean)
+        start = cut if clean else max(start + 1, cut - overlap)
+    return tiles
+
+# -------------------------------
+# Une el texto de los mosaicos; solo donde hubo solape se quitan las primeras
+# líneas del mosaico que repiten las últimas del anterior (en un corte limpio
+# las líneas iguales son texto real repetido y se conservan)
+# -------------------------------
+def merge_tile_texts(texts, overlaps=None):
+    overlaps = list(overlaps or [])
+    lines = []
+    for idx, text in enumerate(texts):
+        new_lines = [line for line in text.split("\n") if line.strip()]
+        if idx > 0 and idx - 1 < len(overlaps) and overlaps[idx - 1]:
+            recent = {line.strip() for line in lines[-3:]}
+            while new_lines and new_lines[0].strip() in recent:
+                new_lines.pop(0)
+        lines.extend(new_lines)
+    return "\n".join(lines)
+
+# -------------------------------
+# Preprocesamiento completo en arreglos NumPy/OpenCV:
+# gris → contraste → mediana → Otsu → mediana → corrección de inclinación
+# Devuelve un ndarray nuevo (los buffers intermedios se reutilizan)
+# -------------------------------
+def preprocess_array(image):
+    gray = to_gray(image)
+    shape = gray.shape
+
+    contrasted = cv2.LUT(gray, _contrast_lut(gray, CONTRAST_FACTOR), dst=_scratch("contrast", shape))
+    smoothed = cv2.medianBlur(contrasted, 3, dst=_scratch("median", shape))
+
+    # Umbral binario (Otsu) y limpieza de ruido
+    _, img_bin = cv2.threshold(smoothed, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU, dst=_scratch("binary", shape))
+    img_bin = cv2.medianBlur(img_bin, 3)
+
+    # Corrección de inclinación (deskew)
+    angle = estimate_skew(img_bin)
+    if abs(angle) < SKEW_MIN_ANGLE:
+        return img_bin
+
+    (h, w) = shape
+    M = cv2.getRotationMatrix2D((w // 2, h // 2), angle, 1.0)
+    return cv2.warpAffine(img_bin, M, (w, h), flags=cv2.INTER_CUBIC, borderMode=cv2.BORDER_REPLICATE)
@@ -0,0 +1,301 @@
+import os
+import signal
+import threading
+import multiprocessing
+from ocr_utils import logger
+from ocr_utils import metrics
+from ocr_utils.ocr_engines import OcrEngine
+from ocr_utils.logger import log_info, log_error
+
+# -------------------------------
+# Configuración
+# -------------------------------
+MEMORY_BUDGET_MB = int(os.environ.get("OCR_MEMORY_BUDGET_MB", "0"))  # Memoria para el OCR (todos los procesos); 0 = automático
+MEMORY_BUDGET_FRACTION = 0.8  # En modo automático, fracción de la RAM disponible al iniciar
+PROCESS_SHARE = 1  # Procesos OCR que se reparten el presupuesto (lo fija el pool)
+PAGE_MEMORY_FACTOR = 4.0  # Copias de la página en memoria (rasterizado, gris, preprocesado, mosaicos)
+DEFAULT_PAGE_SIZE = (595.0, 842.0)  # A4 en puntos, si no se conoce el tamaño de la página
+PAGE_TIMEOUT_SECONDS = float(os.environ.get("OCR_PAGE_TIMEOUT", "0"))  # Límite por página; 0 = OCR en el propio proceso, sin límite
+WARM_UP_TIMEOUT_SECONDS = 300.0  # Carga de un motor en el proceso aislado
+
+# -------------------------------
+# Resultado de una imagen cuyo OCR no terminó (límite de tiempo, error o caída
+# del proceso aislado); nunca se confunde con un resultado vacío (texto, confianza)
+# -------------------------------
+class OcrFailed:
+    def __init__(self, reason):
+        self.reason = reason
+
+    def __repr__(self):
+        return f"OcrFailed({self.reason!r})"
+
+# -------------------------------
+# Memoria disponible en el sistema (MB), o None si no se puede saber
+# -------------------------------
+def available_memory_mb():
+    try:
+        import psutil
+        return psutil.virtual_memory().available / (1024 * 1024)
+    except ImportError:
+        pass
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) / 1024
+    except (OSError, ValueError):
+        pass
+    return None
+
+# Presupuesto total del lote; el automático se calcula en el proceso padre antes de crear el pool
+def total_budget_mb():
+    if MEMORY_BUDGET_MB > 0:
+        return MEMORY_BUDGET_MB
+    available = available_memory_mb()
+    return int(available * MEMORY_BUDGET_FRACTION) if available else 0
+
+def process_budget_mb():
+    return total_budget_mb() / max(1, PROCESS_SHARE)
+
+# -------------------------------
+# Memoria estimada de una página rasterizada (RGB) a 'dpi', con sus copias
+# size: (ancho, alto) en puntos PDF
+# -------------------------------
+def page_memory_mb(size, dpi):
+    width, height = size or DEFAULT_PAGE_SIZE
+    pixels = (width / 72.0 * dpi) * (height / 72.0 * dpi)
+    return pixels * 3 * PAGE_MEMORY_FACTOR / (1024 * 1024)
+
+# -------------------------------
+# Control de admisión: una página se rasteriza solo si la memoria del proceso
+# (medida cuando no hay páginas en curso) más lo reservado y su coste cabe en
+# el presupuesto. Sin páginas en curso siempre se admite una, aunque no quepa,
+# para que el documento avance (de una en una)
+# -------------------------------
+class MemoryBudget:
+    def __init__(self, limit_mb):
+        self.limit_mb = limit_mb
+        self.reserved_mb = 0.0
+        self.baseline_mb = 0.0
+        self.waiting = 0  # Hilos esperando memoria
+        self.waits = 0  # Admisiones que tuvieron que esperar
+        self._cond = threading.Condition()
+
+    def acquire(self, cost_mb, stop_event=None):
+        with self._cond:
+            if self.limit_mb and not self._fits(cost_mb):
+                self.waits += 1
+                self.waiting += 1
+                try:
+                    while not self._fits(cost_mb):
+                        if stop_event is not None and stop_event.is_set():
+                            return False
+                        self._cond.wait(0.5)
+                finally:
+                    self.waiting -= 1
+            self.reserved_mb += cost_mb
+            return True
+
+    def release(self, cost_mb):
+        with self._cond:
+            self.reserved_mb -= cost_mb
+            if self.reserved_mb < 1e-6:
+                self.reserved_mb = 0.0
+            self._cond.notify_all()
+
+    def _fits(self, cost_mb):
+        if self.reserved_mb <= 0:
+            self.baseline_mb = metrics.current_rss_mb() or 0.0
+            return True
+        return self.baseline_mb + self.reserved_mb + cost_mb <= self.limit_mb
+
+# Un presupuesto por proceso; se recrea si cambia la configuración
+_budget = None
+_budget_key = None
+_budget_lock = threading.Lock()
+
+def get_budget():
+    global _budget, _budget_key
+    key = (os.getpid(), MEMORY_BUDGET_MB, PROCESS_SHARE)
+    with _budget_lock:
+        if _budget is None or _budget_key != key:
+            _budget = MemoryBudget(process_budget_mb())
+            _budget_key = key
+            if _budget.limit_mb:
+                log_info(f"Presupuesto de memoria del proceso {os.getpid()}: {_budget.limit_mb:.0f} MB")
+        return _budget
+
+# -------------------------------
+# OCR en un proceso aislado con límite de tiempo (PAGE_TIMEOUT_SECONDS > 0)
+# El límite de un lote es PAGE_TIMEOUT_SECONDS por página, no por mosaico
+# Si un lote no termina a tiempo (o falla) se repite página a página; la página
+# que vuelve a fallar se entrega como OcrFailed (todos sus mosaicos) y el resto sigue
+# El proceso carga los motores una vez y se vuelve a crear tras cada muerte
+# -------------------------------
+class _OcrSandbox:
+    def __init__(self):
+        self._process = None
+        self._conn = None
+        self._ready = set()  # Motores ya cargados en el proceso actual
+        self._lock = threading.Lock()
+
+    def _start(self):
+        # Importación diferida: batch_processor importa ocr_processor, que importa este módulo
+        from ocr_utils import batch_processor
+        context = multiprocessing.get_context("spawn")
+        parent_conn, child_conn = context.Pipe()
+        self._process = context.Process(
+            target=_sandbox_main, args=(child_conn, logger.log_path, batch_processor._snapshot_config()),
+            name="ocr-sandbox", daemon=True
+        )
+        self._process.start()
+        child_conn.close()
+        self._conn = parent_conn
+        self._ready = set()
+        log_info(f"Proceso OCR aislado {self._process.pid} iniciado (límite {PAGE_TIMEOUT_SECONDS}s por página)")
+
+    def _stop(self):
+        if self._process is not None:
+            self._process.kill()
+            self._process.join()
+        if self._conn is not None:
+            self._conn.close()
+        self._process = None
+        self._conn = None
+
+    def _call(self, message, timeout=None):
+        self._conn.send(message)
+        if not self._conn.poll(timeout):
+            raise TimeoutError
+        status, payload = self._conn.recv()
+        if status == "error":
+            raise RuntimeError(payload)
+        return payload
+
+    # Arranca el proceso y carga el motor sin contar ese tiempo en el límite por página
+    # Un error al precargar (p.ej. falta el binario de Tesseract) no es fatal aquí:
+    # se repetirá en cada página, que se entrega como OcrFailed
+    def _ensure(self, name):
+        if self._process is None or not self._process.is_alive():
+            self._stop()
+            self._start()
+        if name not in self._ready:
+            try:
+                self._call(("warm_up", name), WARM_UP_TIMEOUT_SECONDS)
+            except RuntimeError as e:
+                log_error(f"Error precargando motor OCR {name} en el proceso aislado: {safe_str(e)}")
+            self._ready.add(name)
+
+    def warm_up(self, name):
+        with self._lock:
+            try:
+                self._ensure(name)
+            except (TimeoutError, EOFError, OSError) as e:
+                self._stop()
+                log_error(f"No se pudo preparar el motor {name} en el proceso aislado: {_failure_reason(e)}")
+
+    def recognize_batch(self, name, images, tile_counts=None):
+        with self._lock:
+            return self._recognize(name, images, tile_counts or [1] * len(images))
+
+    def _recognize(self, name, images, tile_counts):
+        # Sin motor listo no se reintenta página a página (cada intento esperaría la carga)
+        try:
+            self._ensure(name)
+        except (TimeoutError, EOFError, OSError) as e:
+            self._stop()
+            reason = _failure_reason(e)
+            log_error(f"No se pudo preparar el motor {name} en el proceso aislado: {reason}")
+            return [OcrFailed(reason) for _ in images]
+
+        try:
+            return self._call(("recognize", name, images), PAGE_TIMEOUT_SECONDS * len(tile_counts))
+        except RuntimeError as e:
+            reason = _failure_reason(e)  # El proceso sigue vivo y sincronizado
+        except (TimeoutError, EOFError, OSError) as e:
+            reason = _failure_reason(e)
+            self._stop()
+        if len(tile_counts) == 1:
+            log_error(f"OCR {name} de una página ({len(images)} imágenes) cancelado: {reason}")
+            return [OcrFailed(reason) for _ in images]
+        log_error(f"OCR {name} de {len(tile_counts)} páginas cancelado ({reason}); se repite página a página")
+        results = []
+        offset = 0
+        for count in tile_counts:
+            results.extend(self._recognize(name, images[offset:offset + count], [count]))
+            offset += count
+        return results
+
+def _failure_reason(error):
+    if isinstance(error, TimeoutError):
+        return "límite de tiempo superado"
+    if isinstance(error, RuntimeError):
+        return f"error del motor: {safe_str(error)}"
+    return "el proceso aislado terminó"
+
+_sandbox = _OcrSandbox()
+
+# -------------------------------
+# Motor que delega en el proceso aislado (mismo interfaz que ocr_engines)
+# recognize_batch puede devolver OcrFailed; recognize (una imagen suelta) lo
+# convierte en un resultado vacío, como los motores ante un error
+# -------------------------------
+class IsolatedEngine(OcrEngine):
+    def __init__(self, name):
+        self.name = name
+
+    def recognize(self, image):
+        result = self.recognize_batch([image])[0]
+        return ("", 0.0) if isinstance(result, OcrFailed) else result
+
+    def recognize_batch(self, images):
+        return _sandbox.recognize_batch(self.name, list(images))
+
+    def recognize_tiles(self, tiles, tile_counts):
+        return _sandbox.recognize_batch(self.name, list(tiles), list(tile_counts))
+
+    def warm_up(self):
+        _sandbox.warm_up(self.name)
+
+# -------------------------------
+# Bucle del proceso aislado: motores reales de ocr_processor con la configuración del padre
+# -------------------------------
+def _sandbox_main(conn, log_path, config):
+    global PAGE_TIMEOUT_SECONDS
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    logger.attach_logger(log_path)
+    from ocr_utils import batch_processor
+    from ocr_utils import ocr_engines
+    from ocr_utils import ocr_processor
+    batch_processor._apply_config(config)
+    PAGE_TIMEOUT_SECONDS = 0
+    ocr_engines.RAISE_ERRORS = True
+
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, OSError):
+            break
+        try:
+            engine = ocr_processor.get_engine(message[1])
+            if message[0] == "warm_up":
+                engine.warm_up()
+                conn.send(("ok", None))
+            else:
+                conn.send(("ok", engine.recognize_batch(message[2])))
+        except Exception as e:
+            conn.send(("error", safe_str(e)))
+        finally:
+            logger.flush()
+
+# -------------------------------
+# Utilidad segura para logs
+# -------------------------------
+def safe_str(obj):
+    try:
+        return str(obj)
+    except Exception:
+        try:
+            return str(obj).encode("utf-8", errors="replace").decode("utf-8", errors="replace")
+        except Exception:
+            return "[Error al convertir a string]"
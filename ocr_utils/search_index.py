@@ -0,0 +1,206 @@
+import os
+import time
+import sqlite3
+import threading
+from ocr_utils.logger import log_info, log_error
+
+# -------------------------------
+# Configuración
+# -------------------------------
+INDEX_PATH = os.environ.get("OCR_INDEX_PATH")  # None = índice desactivado
+INDEX_BATCH_PAGES = 50  # Páginas por transacción
+SEARCH_MAX_LIMIT = 100
+SNIPPET_TOKENS = 16
+JOURNAL_MODE = "WAL"  # DELETE si el índice está en almacenamiento compartido (WAL no funciona en NFS/SMB)
+
+# -------------------------------
+# Conexiones SQLite por hilo (y por proceso)
+# -------------------------------
+_local = threading.local()
+
+# -------------------------------
+# Activa o cambia el archivo del índice
+# -------------------------------
+def configure(index_path):
+    global INDEX_PATH
+    INDEX_PATH = index_path
+    _local.__dict__.clear()
+    if index_path:
+        log_info(f"Índice de búsqueda en: {index_path}")
+
+def is_enabled():
+    return bool(INDEX_PATH)
+
+# -------------------------------
+# Conexión al índice (se crea al primer uso)
+# documents: un registro por PDF de entrada; pages: rutas de salida por página
+# page_text: tabla FTS5 con el texto (rowid = pages.id)
+# -------------------------------
+def _connection():
+    key = (os.getpid(), INDEX_PATH)
+    conn = getattr(_local, "conn", None)
+    if conn is not None and getattr(_local, "key", None) == key:
+        return conn
+
+    folder = os.path.dirname(INDEX_PATH)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    conn = sqlite3.connect(INDEX_PATH, timeout=30)
+    conn.execute(f"PRAGMA journal_mode={JOURNAL_MODE}")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(
+        "CREATE TABLE IF NOT EXISTS documents ("
+        " id INTEGER PRIMARY KEY, pdf_path TEXT UNIQUE NOT NULL, title TEXT, updated_at REAL);"
+        "CREATE TABLE IF NOT EXISTS pages ("
+        " id INTEGER PRIMARY KEY, doc_id INTEGER NOT NULL, page INTEGER NOT NULL,"
+        " txt_path TEXT, pdf_output TEXT, updated_at REAL, UNIQUE (doc_id, page));"
+        "CREATE INDEX IF NOT EXISTS idx_pages_txt_path ON pages(txt_path);"
+        "CREATE VIRTUAL TABLE IF NOT EXISTS page_text USING fts5("
+        " text, tokenize = 'unicode61 remove_diacritics 2');"
+    )
+    conn.commit()
+    _local.conn = conn
+    _local.key = key
+    return conn
+
+def _document_id(conn, pdf_path):
+    conn.execute(
+        "INSERT INTO documents (pdf_path, title, updated_at) VALUES (?, ?, ?)"
+        " ON CONFLICT(pdf_path) DO UPDATE SET updated_at = excluded.updated_at",
+        (pdf_path, os.path.basename(pdf_path), time.time())
+    )
+    return conn.execute("SELECT id FROM documents WHERE pdf_path = ?", (pdf_path,)).fetchone()[0]
+
+# -------------------------------
+# Escritor de un documento: acumula páginas y las guarda por lotes
+# Al cerrar borra las páginas que esta ejecución ya no considera texto válido
+# (en blanco, sin texto o fuera del documento), sin reconstruir el resto
+# -------------------------------
+class DocumentIndexer:
+    def __init__(self, pdf_path):
+        self.pdf_path = os.path.abspath(pdf_path)
+        self.pending = []
+        self.enabled = is_enabled()
+
+    def add(self, page, text, txt_path=None, pdf_output=None):
+        if not self.enabled:
+            return
+        self.pending.append((page, text, txt_path, pdf_output))
+        if len(self.pending) >= INDEX_BATCH_PAGES:
+            self.flush()
+
+    def flush(self):
+        if not self.enabled or not self.pending:
+            return
+        batch, self.pending = self.pending, []
+        try:
+            conn = _connection()
+            with conn:
+                doc_id = _document_id(conn, self.pdf_path)
+                now = time.time()
+                for page, text, txt_path, pdf_output in batch:
+                    conn.execute(
+                        "INSERT INTO pages (doc_id, page, txt_path, pdf_output, updated_at) VALUES (?, ?, ?, ?, ?)"
+                        " ON CONFLICT(doc_id, page) DO UPDATE SET txt_path = excluded.txt_path,"
+                        " pdf_output = excluded.pdf_output, updated_at = excluded.updated_at",
+                        (doc_id, page, txt_path, pdf_output, now)
+                    )
+                    row_id = conn.execute(
+                        "SELECT id FROM pages WHERE doc_id = ? AND page = ?", (doc_id, page)
+                    ).fetchone()[0]
+                    conn.execute("DELETE FROM page_text WHERE rowid = ?", (row_id,))
+                    conn.execute("INSERT INTO page_text (rowid, text) VALUES (?, ?)", (row_id, text))
+        except Exception as e:
+            log_error(f"Error actualizando índice de búsqueda: {safe_str(e)}")
+
+    def remove_pages(self, pages=(), beyond=None):
+        if not self.enabled:
+            return
+        pages = list(pages)
+        try:
+            conn = _connection()
+            with conn:
+                row = conn.execute("SELECT id FROM documents WHERE pdf_path = ?", (self.pdf_path,)).fetchone()
+                if row is None:
+                    return
+                query = "SELECT id FROM pages WHERE doc_id = ? AND (page IN (%s)%s)" % (
+                    ",".join("?" for _ in pages) or "NULL",
+                    " OR page > ?" if beyond is not None else "",
+                )
+                params = [row[0]] + pages + ([beyond] if beyond is not None else [])
+                ids = [item[0] for item in conn.execute(query, params).fetchall()]
+                for row_id in ids:
+                    conn.execute("DELETE FROM page_text WHERE rowid = ?", (row_id,))
+                    conn.execute("DELETE FROM pages WHERE id = ?", (row_id,))
+        except Exception as e:
+            log_error(f"Error depurando índice de búsqueda: {safe_str(e)}")
+
+    def close(self, removed_pages=(), total_pages=None):
+        self.flush()
+        if removed_pages or total_pages is not None:
+            self.remove_pages(removed_pages, beyond=total_pages)
+
+# -------------------------------
+# Búsqueda: resultados ordenados por relevancia (BM25) con fragmento resaltado
+# La consulta admite la sintaxis de FTS5; si no es válida se busca cada palabra
+# -------------------------------
+def search(query, limit=20, offset=0):
+    start = time.perf_counter()
+    result = {"query": query, "hits": [], "took_ms": 0.0}
+    if not is_enabled() or not query or not query.strip():
+        return result
+
+    limit = max(1, min(int(limit or 20), SEARCH_MAX_LIMIT))
+    sql = (
+        "SELECT d.title, d.pdf_path, p.page, p.txt_path, p.pdf_output,"
+        " snippet(page_text, 0, '[', ']', '…', ?), bm25(page_text)"
+        " FROM page_text JOIN pages p ON p.id = page_text.rowid JOIN documents d ON d.id = p.doc_id"
+        " WHERE page_text MATCH ? ORDER BY bm25(page_text) LIMIT ? OFFSET ?"
+    )
+    try:
+        conn = _connection()
+        try:
+            rows = conn.execute(sql, (SNIPPET_TOKENS, query, limit, max(0, int(offset or 0)))).fetchall()
+        except sqlite3.OperationalError:
+            rows = conn.execute(sql, (SNIPPET_TOKENS, _quote_terms(query), limit, max(0, int(offset or 0)))).fetchall()
+    except Exception as e:
+        log_error(f"Error en búsqueda '{safe_str(query)}': {safe_str(e)}")
+        result["error"] = safe_str(e)
+        return result
+
+    result["hits"] = [
+        {"document": title, "pdf_path": pdf_path, "page": page, "txt_path": txt_path,
+         "pdf_output": pdf_output, "snippet": snippet, "score": round(-score, 4)}
+        for title, pdf_path, page, txt_path, pdf_output, snippet, score in rows
+    ]
+    result["took_ms"] = round((time.perf_counter() - start) * 1000, 2)
+    return result
+
+# -------------------------------
+# ¿Es 'path' la salida de alguna página indexada? (txt_path, o el paquete en modo bundle)
+# -------------------------------
+def is_indexed_output(path):
+    if not is_enabled() or not path:
+        return False
+    try:
+        row = _connection().execute("SELECT 1 FROM pages WHERE txt_path = ? LIMIT 1", (path,)).fetchone()
+        return row is not None
+    except Exception as e:
+        log_error(f"Error consultando el índice de búsqueda: {safe_str(e)}")
+        return False
+
+def _quote_terms(query):
+    terms = [term.replace('"', '""') for term in query.split()]
+    return " ".join(f'"{term}"' for term in terms if term)
+
+# -------------------------------
+# Utilidad segura para logs
+# -------------------------------
+def safe_str(obj):
+    try:
+        return str(obj)
+    except Exception:
+        try:
+            return str(obj).encode("utf-8", errors="replace").decode("utf-8", errors="replace")
+        except Exception:
+            return "[Error al convertir a string]"
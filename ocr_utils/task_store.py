@@ -0,0 +1,199 @@
+import os
+import json
+import time
+import socket
+import sqlite3
+from contextlib import contextmanager
+from ocr_utils.logger import log_info
+
+# -------------------------------
+# Configuración
+# -------------------------------
+LEASE_SECONDS = 120  # Duración de una concesión sin latidos
+MAX_ATTEMPTS = 3  # Intentos por tarea (incluye concesiones caducadas)
+BUSY_TIMEOUT = 60  # Segundos esperando el bloqueo de la base compartida
+
+# -------------------------------
+# Almacén de tareas compartido entre nodos (SQLite en almacenamiento compartido)
+# Cada tarea es un documento o un rango de páginas (inicio, fin) de un documento.
+# Estados: queued → leased → done | failed; una concesión caducada vuelve a 'queued'
+# Se usa journal_mode=DELETE (WAL necesita memoria compartida y no funciona en NFS/SMB)
+# y una conexión por operación, válida entre hilos, procesos y máquinas
+# -------------------------------
+class TaskStore:
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+        folder = os.path.dirname(self.path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT)
+        conn.execute("PRAGMA journal_mode=DELETE")
+        conn.close()
+        with self._transaction() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS tasks ("
+                " id INTEGER PRIMARY KEY, pdf_path TEXT NOT NULL, output_path TEXT NOT NULL,"
+                " first_page INTEGER NOT NULL, last_page INTEGER NOT NULL, total_pages INTEGER,"
+                " size INTEGER, mtime REAL, status TEXT NOT NULL DEFAULT 'queued',"
+                " attempts INTEGER NOT NULL DEFAULT 0, worker TEXT, lease_expires REAL,"
+                " result TEXT, error TEXT, updated_at REAL,"
+                " UNIQUE (pdf_path, first_page, last_page))"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks(status, id)")
+
+    # Transacción con bloqueo de escritura inmediato: dos nodos nunca toman la misma tarea
+    @contextmanager
+    def _transaction(self):
+        conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT, isolation_level=None)
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+
+    # -------------------------------
+    # Alta de tareas: un documento sin cambios conserva sus tareas (y su estado);
+    # si cambió de tamaño o mtime, sus tareas se sustituyen
+    # ranges: [(inicio, fin), ...] como en pdf_splitter.split_pdf_by_ranges
+    # -------------------------------
+    def add_document(self, pdf_path, output_path, total_pages, ranges):
+        stat = os.stat(pdf_path)
+        now = time.time()
+        with self._transaction() as conn:
+            rows = conn.execute(
+                "SELECT size, mtime, first_page, last_page FROM tasks WHERE pdf_path = ?", (pdf_path,)
+            ).fetchall()
+            same_file = all(size == stat.st_size and mtime == stat.st_mtime for size, mtime, _, _ in rows)
+            if rows and same_file and {(first, last) for _, _, first, last in rows} == set(ranges):
+                return 0
+            conn.execute("DELETE FROM tasks WHERE pdf_path = ?", (pdf_path,))
+            conn.executemany(
+                "INSERT INTO tasks (pdf_path, output_path, first_page, last_page, total_pages, size, mtime,"
+                " status, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, 'queued', ?)",
+                [(pdf_path, output_path, first, last, total_pages, stat.st_size, stat.st_mtime, now)
+                 for first, last in ranges]
+            )
+        return len(ranges)
+
+    # -------------------------------
+    # Toma la siguiente tarea libre; antes devuelve a la cola las concesiones caducadas
+    # (y marca como fallidas las que agotaron sus intentos)
+    # -------------------------------
+    def claim(self, worker_id, lease_seconds=None):
+        lease_seconds = lease_seconds or LEASE_SECONDS
+        now = time.time()
+        with self._transaction() as conn:
+            expired = conn.execute(
+                "SELECT id, worker, attempts FROM tasks WHERE status = 'leased' AND lease_expires < ?", (now,)
+            ).fetchall()
+            for task_id, worker, attempts in expired:
+                status = "failed" if attempts >= MAX_ATTEMPTS else "queued"
+                conn.execute(
+                    "UPDATE tasks SET status = ?, worker = NULL, lease_expires = NULL, error = ?, updated_at = ?"
+                    " WHERE id = ?",
+                    (status, f"Concesión caducada (nodo {worker})", now, task_id)
+                )
+            if expired:
+                log_info(f"Tareas con concesión caducada devueltas a la cola: {len(expired)}")
+
+            row = conn.execute(
+                "SELECT id FROM tasks WHERE status = 'queued' ORDER BY id LIMIT 1"
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE tasks SET status = 'leased', worker = ?, lease_expires = ?, attempts = attempts + 1,"
+                " updated_at = ? WHERE id = ?",
+                (worker_id, now + lease_seconds, now, row[0])
+            )
+            return self._task(conn, row[0])
+
+    # Prolonga la concesión; False si el nodo ya no la tiene (caducó y otro la tomó)
+    def heartbeat(self, task_id, worker_id, lease_seconds=None):
+        lease_seconds = lease_seconds or LEASE_SECONDS
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE tasks SET lease_expires = ?, updated_at = ? WHERE id = ? AND worker = ? AND status = 'leased'",
+                (time.time() + lease_seconds, time.time(), task_id, worker_id)
+            )
+            return cursor.rowcount == 1
+
+    def complete(self, task_id, worker_id, result=None):
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE tasks SET status = 'done', lease_expires = NULL, result = ?, error = NULL, updated_at = ?"
+                " WHERE id = ? AND worker = ? AND status = 'leased'",
+                (json.dumps(result or {}, ensure_ascii=False), time.time(), task_id, worker_id)
+            )
+            return cursor.rowcount == 1
+
+    # Error en la tarea: se reintenta mientras queden intentos
+    def fail(self, task_id, worker_id, error):
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE tasks SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'queued' END,"
+                " worker = NULL, lease_expires = NULL, error = ?, updated_at = ?"
+                " WHERE id = ? AND worker = ? AND status = 'leased'",
+                (MAX_ATTEMPTS, error, time.time(), task_id, worker_id)
+            )
+            return cursor.rowcount == 1
+
+    # Vuelve a encolar las tareas fallidas (p.ej. tras corregir el origen del error)
+    def retry_failed(self):
+        with self._transaction() as conn:
+            return conn.execute(
+                "UPDATE tasks SET status = 'queued', attempts = 0, updated_at = ? WHERE status = 'failed'",
+                (time.time(),)
+            ).rowcount
+
+    # -------------------------------
+    # Consultas
+    # -------------------------------
+    def counts(self):
+        with self._transaction() as conn:
+            rows = conn.execute("SELECT status, COUNT(*) FROM tasks GROUP BY status").fetchall()
+        counts = {"queued": 0, "leased": 0, "done": 0, "failed": 0}
+        counts.update(dict(rows))
+        return counts
+
+    def has_pending(self):
+        counts = self.counts()
+        return counts["queued"] + counts["leased"] > 0
+
+    def tasks(self, status=None):
+        with self._transaction() as conn:
+            query = "SELECT id FROM tasks" + (" WHERE status = ?" if status else "") + " ORDER BY id"
+            ids = [row[0] for row in conn.execute(query, (status,) if status else ()).fetchall()]
+            return [self._task(conn, task_id) for task_id in ids]
+
+    @staticmethod
+    def _task(conn, task_id):
+        conn.row_factory = sqlite3.Row
+        row = conn.execute("SELECT * FROM tasks WHERE id = ?", (task_id,)).fetchone()
+        conn.row_factory = None
+        task = dict(row)
+        task["result"] = json.loads(task["result"]) if task["result"] else None
+        return task
+
+# -------------------------------
+# Identificador del nodo: máquina y proceso
+# -------------------------------
+def worker_name():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+# -------------------------------
+# Utilidad segura para logs
+# -------------------------------
+def safe_str(obj):
+    try:
+        return str(obj)
+    except Exception:
+        try:
+            return str(obj).encode("utf-8", errors="replace").decode("utf-8", errors="replace")
+        except Exception:
+            return "[Error al convertir a string]"
@@ -0,0 +1,107 @@
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+from fpdf import FPDF
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ocr_utils import logger
+from ocr_utils import ocr_cache
+from ocr_utils import ocr_processor
+from ocr_utils import resource_guard
+from ocr_utils import search_index
+from ocr_utils.ocr_engines import OcrEngine
+
+PAGE_HEIGHT = 300
+PAGE_BASE_WIDTH = 200  # El ancho de cada imagen rasterizada codifica su número de página
+
+# -------------------------------
+# Motor OCR de prueba: devuelve un texto válido por página y registra qué páginas leyó
+# fail_pages: páginas que devuelven OcrFailed (como un límite de tiempo en el proceso aislado)
+# fail_once: páginas que fallan solo la primera vez
+# -------------------------------
+class StubEngine(OcrEngine):
+    name = "easyocr"
+
+    def __init__(self):
+        self.calls = []
+        self.fail_pages = set()
+        self.fail_once = set()
+
+    def recognize(self, image):
+        page = page_of(image)
+        self.calls.append(page)
+        if page in self.fail_once:
+            self.fail_once.discard(page)
+            return resource_guard.OcrFailed("prueba")
+        if page in self.fail_pages:
+            return resource_guard.OcrFailed("prueba")
+        return f"Texto de la pagina numero {page} con contenido valido", 0.9
+
+def page_of(image):
+    return image.size[0] - PAGE_BASE_WIDTH
+
+def page_image(page):
+    return Image.new("L", (PAGE_BASE_WIDTH + page, PAGE_HEIGHT), 255)
+
+# -------------------------------
+# PDF real de N páginas (para dividir y escribir metadatos) y rasterizado simulado
+# (pdftoppm no es necesario): cada página se entrega como imagen con su número en el ancho
+# -------------------------------
+def make_pdf(path, pages):
+    pdf = FPDF()
+    pdf.set_font("Arial", size=12)
+    for page in range(1, pages + 1):
+        pdf.add_page()
+        pdf.cell(0, 10, f"Pagina {page}")
+    pdf.output(str(path))
+    return str(path)
+
+@pytest.fixture
+def ocr_env(monkeypatch, tmp_path):
+    monkeypatch.setattr(logger, "log_path", None)
+    logger.init_logger(str(tmp_path / "proceso.log"))
+
+    for name, value in {
+        "DEBUG": False, "USE_PREPROCESSING": False, "USE_CONTENT_CROP": False, "USE_TILING": False,
+        "USE_BLANK_DETECTION": False, "ADAPTIVE_DPI": False, "USE_TEXT_LAYER": False, "OUTPUT_MODE": "pages",
+    }.items():
+        monkeypatch.setattr(ocr_processor, name, value)
+    monkeypatch.setattr(resource_guard, "PAGE_TIMEOUT_SECONDS", 0)
+    monkeypatch.setattr(ocr_cache, "CACHE_DIR", None)
+    monkeypatch.setattr(search_index, "INDEX_PATH", None)
+
+    page_counts = {}
+
+    def pdfinfo_from_path(pdf_path):
+        return {"Pages": page_counts[os.path.abspath(pdf_path)]}
+
+    def convert_from_path(pdf_path, dpi=None, first_page=1, last_page=None, output_folder=None,
+                          paths_only=False, **kwargs):
+        last_page = last_page or page_counts[os.path.abspath(pdf_path)]
+        images = [page_image(page) for page in range(first_page, last_page + 1)]
+        if not paths_only:
+            return images
+        paths = []
+        for page, image in zip(range(first_page, last_page + 1), images):
+            path = os.path.join(output_folder, f"pagina-{page:04d}.png")
+            image.save(path)
+            paths.append(path)
+        return paths
+
+    monkeypatch.setattr(ocr_processor, "pdfinfo_from_path", pdfinfo_from_path)
+    monkeypatch.setattr(ocr_processor, "convert_from_path", convert_from_path)
+
+    engine = StubEngine()
+    monkeypatch.setattr(ocr_processor, "get_engine", lambda name=None, isolated=None: engine)
+
+    def add_pdf(name, pages):
+        path = make_pdf(tmp_path / name, pages)
+        page_counts[os.path.abspath(path)] = pages
+        return path
+
+    yield SimpleNamespace(engine=engine, add_pdf=add_pdf, path=tmp_path)
+    logger.flush()  # Antes de restaurar log_path: el hilo escritor aún puede tener líneas
@@ -0,0 +1,106 @@
+import os
+import importlib
+
+import pytest
+
+from ocr_utils import logger
+from ocr_utils import ocr_cache
+from ocr_utils import search_index
+from ocr_utils.output_bundle import DocumentBundle
+from ocr_utils.search_index import DocumentIndexer
+
+# -------------------------------
+# Aplicación Flask sin precarga del modelo ni caché, con el índice y las carpetas
+# de salida permitidas en una carpeta temporal (no escribe en output/proceso.log)
+# -------------------------------
+@pytest.fixture
+def client(monkeypatch, tmp_path):
+    monkeypatch.setenv("OCR_WARMUP", "0")
+    monkeypatch.setenv("OCR_CACHE_DIR", "")
+    monkeypatch.setenv("OCR_INDEX_PATH", "")
+    monkeypatch.setattr(logger, "log_path", None)
+    monkeypatch.setattr(logger, "init_logger", lambda path: None)
+    monkeypatch.setattr(ocr_cache, "CACHE_DIR", None)
+    monkeypatch.setattr(search_index, "INDEX_PATH", None)
+    app = importlib.import_module("app")
+
+    output_root = tmp_path / "salida"
+    output_root.mkdir()
+    monkeypatch.setattr(app, "OUTPUT_ROOTS", [os.path.realpath(output_root)])
+    search_index.configure(str(tmp_path / "ocr_index.sqlite"))
+    yield app.app.test_client()
+    search_index._local.__dict__.clear()
+
+def make_bundle(folder, text="Texto de la pagina"):
+    folder.mkdir(parents=True, exist_ok=True)
+    bundle = DocumentBundle(str(folder), "doc")
+    bundle.add(1, text)
+    bundle.close()
+    return bundle.pages_path
+
+def get_page(client, pages_path, page=1):
+    return client.get("/page", query_string={"path": str(pages_path), "page": page})
+
+def test_page_inside_output_roots_is_served(client, tmp_path):
+    pages_path = make_bundle(tmp_path / "salida" / "doc")
+
+    response = get_page(client, pages_path)
+
+    assert response.status_code == 200
+    assert response.get_json()["text"] == "Texto de la pagina"
+    assert get_page(client, pages_path, page=2).status_code == 404
+
+def test_indexed_page_outside_roots_is_served(client, tmp_path):
+    pages_path = make_bundle(tmp_path / "otra" / "doc")
+    indexer = DocumentIndexer(str(tmp_path / "doc.pdf"))
+    indexer.add(1, "Texto de la pagina", txt_path=pages_path)
+    indexer.close()
+
+    assert get_page(client, pages_path).status_code == 200
+
+@pytest.mark.parametrize("relative", ["otra/doc/doc.pages.jsonl", "salida/../otra/doc/doc.pages.jsonl"])
+def test_page_outside_roots_and_index_is_rejected(client, tmp_path, relative):
+    make_bundle(tmp_path / "otra" / "doc")
+
+    assert get_page(client, tmp_path / relative).status_code == 403
+
+def test_symlink_out_of_roots_is_rejected(client, tmp_path):
+    make_bundle(tmp_path / "otra" / "doc")
+    os.symlink(tmp_path / "otra", tmp_path / "salida" / "enlace")
+
+    assert get_page(client, tmp_path / "salida" / "enlace" / "doc" / "doc.pages.jsonl").status_code == 403
+
+def test_page_requires_bundle_path(client, tmp_path):
+    text_path = tmp_path / "salida" / "doc_pagina_1.txt"
+    text_path.write_text("Texto")
+
+    assert get_page(client, text_path).status_code == 400
+
+# -------------------------------
+# /watch: repetir la misma vigilancia devuelve la existente; otra salida para
+# la misma carpeta de entrada es un conflicto
+# -------------------------------
+@pytest.fixture
+def watchers(monkeypatch):
+    from ocr_utils import folder_watcher
+    monkeypatch.setattr(folder_watcher, "_watchers", {})
+    yield folder_watcher
+    for watcher in list(folder_watcher._watchers.values()):
+        watcher.stop(wait_for=True)
+
+def start_watch(client, input_path, output_path):
+    return client.post("/watch", data={"input_folder": str(input_path), "output_folder": str(output_path)})
+
+def test_watch_same_folder_with_other_output_conflicts(client, watchers, tmp_path):
+    input_path = tmp_path / "entrada"
+    input_path.mkdir()
+
+    first = start_watch(client, input_path, tmp_path / "salida")
+    again = start_watch(client, input_path, tmp_path / "salida")
+    other = start_watch(client, input_path, tmp_path / "otra")
+
+    assert first.status_code == again.status_code == 202
+    assert again.get_json()["watch_id"] == first.get_json()["watch_id"]
+    assert other.status_code == 409
+    assert other.get_json()["watch_id"] == first.get_json()["watch_id"]
+    assert len(watchers._watchers) == 1
@@ -0,0 +1,79 @@
+import os
+import time
+import sqlite3
+
+import pytest
+
+from ocr_utils import batch_processor
+from ocr_utils import job_manager
+from ocr_utils import manifest as manifest_store
+
+def manifest_document(output_path, pdf_path):
+    conn = sqlite3.connect(os.path.join(output_path, manifest_store.MANIFEST_NAME))
+    try:
+        return conn.execute(
+            "SELECT status, total_pages FROM documents WHERE path = ?", (pdf_path,)
+        ).fetchone()
+    finally:
+        conn.close()
+
+# -------------------------------
+# Reanudación: una página fallida deja el documento a medias y solo esa página
+# se repite en la siguiente ejecución; el manifiesto guarda el total del PDF
+# -------------------------------
+def test_resume_repeats_only_failed_page(ocr_env):
+    pdf_path = ocr_env.add_pdf("doc.pdf", 4)
+    output_path = str(ocr_env.path / "salida")
+    ocr_env.engine.fail_once = {3}
+
+    first = batch_processor.process_document(pdf_path, output_path, resume=True)
+    assert first["ok"] and first["failed_pages"] == 1
+    assert ocr_env.engine.calls == [1, 2, 3, 4]
+    assert manifest_document(output_path, pdf_path) == ("partial", 4)
+
+    second = batch_processor.process_document(pdf_path, output_path, resume=True)
+    assert second["failed_pages"] == 0
+    assert second["stats"]["skipped_pages"] == 3
+    assert ocr_env.engine.calls == [1, 2, 3, 4, 3]
+    assert manifest_document(output_path, pdf_path) == ("done", 4)
+
+    third = batch_processor.process_document(pdf_path, output_path, resume=True)
+    assert third["skipped"]
+    assert ocr_env.engine.calls == [1, 2, 3, 4, 3]
+    assert manifest_document(output_path, pdf_path) == ("done", 4)
+
+# -------------------------------
+# Lote repetido sin cambios: los documentos omitidos no cuentan como procesados
+# ni como páginas pendientes en la ETA del trabajo
+# -------------------------------
+def test_rerun_reports_skipped_documents(ocr_env):
+    input_path = str(ocr_env.path)
+    ocr_env.add_pdf("a.pdf", 2)
+    ocr_env.add_pdf("b.pdf", 3)
+    output_path = str(ocr_env.path / "salida")
+
+    first = batch_processor.run_batch(input_path, output_path, workers=1, resume=True)
+    assert (first["processed"], first["skipped"], first["failed"]) == (2, 0, 0)
+
+    second = batch_processor.run_batch(input_path, output_path, workers=1, resume=True)
+    assert (second["processed"], second["skipped"], second["failed"]) == (0, 2, 0)
+    assert ocr_env.engine.calls == [1, 2, 1, 2, 3]
+
+def test_job_eta_excludes_skipped_documents(ocr_env):
+    job = job_manager.Job(str(ocr_env.path), str(ocr_env.path / "salida"), 1)
+    job.status = "running"
+    job.started_at = time.time() - 10
+    job.total_pages = 30
+    for file, pages in (("a.pdf", 10), ("b.pdf", 10), ("c.pdf", 10)):
+        job.files[file] = {"status": "pending", "pages": 0, "total_pages": pages, "error": None}
+
+    job.on_progress("a.pdf", "done", {"file": "a.pdf", "ok": True, "pages": 0, "error": None, "skipped": True,
+                                      "stats": {"skipped_documents": 1}})
+    job.on_progress("b.pdf", "done", {"file": "b.pdf", "ok": True, "pages": 4, "error": None,
+                                      "stats": {"pages": 4, "skipped_pages": 6}})
+    state = job.to_dict()
+
+    assert state["files_finished"] == 2 and state["files_skipped"] == 1
+    assert state["pages_skipped"] == 16
+    # 4 páginas en ~10 s; quedan las 10 de c.pdf
+    assert state["eta_seconds"] == pytest.approx(25, rel=0.05)
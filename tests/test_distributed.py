@@ -0,0 +1,69 @@
+import os
+
+import pytest
+
+from ocr_utils import distributed
+from ocr_utils import ocr_processor
+from ocr_utils import output_bundle
+from ocr_utils.task_store import TaskStore
+
+def _task(pdf_path, output_path, first, last):
+    return {"pdf_path": pdf_path, "output_path": str(output_path), "first_page": first, "last_page": last,
+            "total_pages": None}
+
+# -------------------------------
+# Un rango con una página fallida falla; el reintento solo repite esa página
+# -------------------------------
+def test_process_task_retry_repeats_only_failed_pages(ocr_env):
+    pdf_path = ocr_env.add_pdf("doc.pdf", 4)
+    task = _task(pdf_path, ocr_env.path / "salida", 1, 3)
+    ocr_env.engine.fail_once.add(2)
+
+    with pytest.raises(RuntimeError, match="1 páginas fallidas"):
+        distributed.process_task(task)
+    assert sorted(ocr_env.engine.calls) == [1, 2, 3]
+
+    ocr_env.engine.calls.clear()
+    result = distributed.process_task(task)
+    assert ocr_env.engine.calls == [2]
+    assert result["skipped_pages"] == 2 and result["failed_pages"] == 0
+
+    output_dir = ocr_env.path / "salida" / "doc"
+    for page in (1, 2, 3):
+        assert (output_dir / f"doc_pagina_{page}.txt").is_file()
+    assert not (output_dir / "doc_pagina_4.txt").exists()
+
+# En modo paquete el reintento añade la página al paquete del rango sin borrar las demás
+def test_process_task_retry_keeps_bundle_pages(ocr_env, monkeypatch):
+    monkeypatch.setattr(ocr_processor, "OUTPUT_MODE", "bundle")
+    pdf_path = ocr_env.add_pdf("doc.pdf", 4)
+    task = _task(pdf_path, ocr_env.path / "salida", 1, 2)
+    ocr_env.engine.fail_once.add(2)
+
+    with pytest.raises(RuntimeError):
+        distributed.process_task(task)
+    ocr_env.engine.calls.clear()
+    distributed.process_task(task)
+    assert ocr_env.engine.calls == [2]
+
+    pages_path = os.path.join(ocr_env.path, "salida", "doc", "doc_paginas_1_a_2" + output_bundle.PAGES_SUFFIX)
+    records = {record["page"]: record for record in output_bundle.iter_pages(pages_path)}
+    assert sorted(records) == [1, 2]
+    assert "numero 1" in records[1]["text"] and "numero 2" in records[2]["text"]
+
+# -------------------------------
+# Nodo completo: la tarea fallida vuelve a la cola, se reintenta y termina
+# -------------------------------
+def test_run_worker_requeues_and_retries_failed_task(ocr_env):
+    pdf_path = ocr_env.add_pdf("doc.pdf", 4)
+    store = TaskStore(str(ocr_env.path / "tareas.sqlite"))
+    store.add_document(pdf_path, str(ocr_env.path / "salida"), 4, [(1, 2), (3, 4)])
+    ocr_env.engine.fail_once.add(3)
+
+    summary = distributed.run_worker(store.path, worker_id="nodo", lease_seconds=30)
+
+    assert summary["done"] == 2 and summary["failed"] == 1 and summary["lost"] == 0
+    assert store.counts() == {"queued": 0, "leased": 0, "done": 2, "failed": 0}
+    retried = next(task for task in store.tasks() if task["first_page"] == 3)
+    assert retried["attempts"] == 2 and retried["error"] is None
+    assert sorted(ocr_env.engine.calls) == [1, 2, 3, 3, 4]
@@ -0,0 +1,68 @@
+import pytest
+
+from ocr_utils import logger
+
+@pytest.fixture
+def log_file(monkeypatch, tmp_path):
+    monkeypatch.setattr(logger, "log_path", None)
+    monkeypatch.setattr(logger, "LOG_TAIL_BLOCK", 64)  # Bloques pequeños: entradas cortadas entre bloques
+    path = tmp_path / "proceso.log"
+    logger.init_logger(str(path))
+    return path
+
+def write_entries(entries):
+    for level, message in entries:
+        (logger.log_error if level == "ERROR" else logger.log_info)(message)
+    logger.flush()
+
+def messages(lines):
+    return [line.split(": ", 1)[1] if line.startswith("[") else line for line in lines]
+
+def test_tail_returns_last_lines_and_their_offset(log_file):
+    write_entries([("INFO", f"linea {i}") for i in range(40)])
+    page = logger.read_log(tail=5)
+    assert messages(page["lines"]) == [f"linea {i}" for i in range(35, 40)]
+    assert page["next_offset"] == page["size"] == log_file.stat().st_size
+    with open(log_file, "rb") as f:
+        f.seek(page["offset"])
+        assert f.readline().decode("utf-8").rstrip("\n") == page["lines"][0]
+
+# Las líneas de una traza pertenecen a la entrada ERROR que las escribió
+def test_level_filter_keeps_continuation_lines_with_their_entry(log_file):
+    trace = "fallo del motor\nTraceback (most recent call last):\n  File \"motor.py\", line 1\nValueError: boom"
+    write_entries([("INFO", "antes")] + [("INFO", f"relleno {i}") for i in range(10)]
+                  + [("ERROR", trace), ("INFO", "despues")])
+
+    errors = logger.read_log(tail=50, level="ERROR")
+    assert messages(errors["lines"]) == trace.split("\n")
+    infos = logger.read_log(tail=50, level="info")
+    assert not any("Traceback" in line or "ValueError" in line for line in infos["lines"])
+    assert messages(infos["lines"])[-1] == "despues"
+    # Solo las dos últimas líneas de la traza: la búsqueda hacia atrás encuentra su cabecera
+    assert messages(logger.read_log(tail=2, level="ERROR")["lines"]) == trace.split("\n")[-2:]
+
+    # Lectura por desplazamiento que empieza a mitad de la entrada
+    with open(log_file, "rb") as f:
+        data = f.read()
+    offset = data.index(b"  File")
+    page = logger.read_log(offset=offset, level="ERROR")
+    assert page["lines"] == ['  File "motor.py", line 1', "ValueError: boom"]
+    assert page["offset"] == offset
+
+def test_offset_follows_new_lines_and_detects_rotation(log_file):
+    write_entries([("INFO", "primera")])
+    page = logger.read_log(tail=10)
+    write_entries([("INFO", "segunda"), ("ERROR", "tercera")])
+
+    following = logger.read_log(offset=page["next_offset"], generation=page["generation"])
+    assert messages(following["lines"]) == ["segunda", "tercera"]
+    assert following["offset"] == page["next_offset"] and not following["rotated"]
+
+    # Tras rotar, el desplazamiento anterior sigue dentro del archivo nuevo: la generación lo delata
+    logger._rotate(str(log_file))
+    write_entries([("INFO", f"nueva {i}") for i in range(20)])
+    rotated = logger.read_log(offset=following["next_offset"], generation=following["generation"], limit=3)
+    assert rotated["rotated"]
+    assert rotated["generation"] != following["generation"]
+    assert rotated["offset"] == 0
+    assert messages(rotated["lines"]) == ["nueva 0", "nueva 1", "nueva 2"]
@@ -0,0 +1,18 @@
+import json
+import os
+
+from ocr_utils import metrics
+
+# Dos informes seguidos (mismo segundo, mismo proceso) se guardan en archivos distintos
+def test_run_reports_written_back_to_back_do_not_overwrite(tmp_path):
+    log_path = str(tmp_path / "proceso.log")
+    first = metrics.write_run_report({"run": 1}, log_path)
+    second = metrics.write_run_report({"run": 2}, log_path)
+
+    assert first and second and first != second
+    assert sorted(os.listdir(tmp_path / metrics.REPORTS_DIR_NAME)) == sorted(
+        [os.path.basename(first), os.path.basename(second)])
+    with open(first, encoding="utf-8") as f:
+        assert json.load(f) == {"run": 1}
+    with open(second, encoding="utf-8") as f:
+        assert json.load(f) == {"run": 2}
@@ -0,0 +1,49 @@
+import itertools
+from types import SimpleNamespace
+
+import pytest
+
+from ocr_utils import ocr_cache
+
+# -------------------------------
+# Caché en una carpeta temporal con un reloj que avanza en cada acceso
+# (el orden LRU no depende de la resolución de time.time)
+# -------------------------------
+@pytest.fixture
+def cache(monkeypatch, tmp_path):
+    clock = itertools.count(1000)
+    monkeypatch.setattr(ocr_cache, "time", SimpleNamespace(time=lambda: float(next(clock))))
+    monkeypatch.setattr(ocr_cache, "CACHE_DIR", None)
+    monkeypatch.setattr(ocr_cache, "CACHE_MAX_BYTES", ocr_cache.CACHE_MAX_BYTES)
+    monkeypatch.setattr(ocr_cache, "_size", {"key": None, "bytes": 0, "puts": 0})
+    ocr_cache.configure(str(tmp_path / "cache"), max_bytes=250)
+    yield ocr_cache
+    ocr_cache._connection().close()
+    ocr_cache._local.__dict__.clear()
+
+def stored_keys(cache):
+    return {row[0] for row in cache._connection().execute("SELECT key FROM entries")}
+
+def test_get_returns_stored_text(cache):
+    cache.put("a", "texto de la pagina")
+
+    assert cache.get("a") == "texto de la pagina"
+    assert cache.get("b") is None
+
+def test_eviction_removes_least_recently_used(cache):
+    for key in ("a", "b", "c"):
+        cache.put(key, key * 80)
+    cache.get("a")  # 'a' pasa a ser la más reciente
+
+    cache.put("d", "d" * 80)  # 320 bytes > 250: se desaloja hasta 225
+
+    assert stored_keys(cache) == {"a", "d"}
+    assert cache._size["bytes"] == cache._total_size(cache._connection()) == 160
+
+def test_size_counts_only_difference_when_key_is_replaced(cache):
+    cache.put("a", "a" * 100)
+    cache.put("a", "a" * 10)
+    cache.put("b", "b" * 50)
+
+    assert cache._size["puts"] == 2  # Sin recuento desde la primera escritura
+    assert cache._size["bytes"] == cache._total_size(cache._connection()) == 60
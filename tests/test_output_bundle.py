@@ -0,0 +1,60 @@
+import os
+
+from ocr_utils import output_bundle
+from ocr_utils.output_bundle import DocumentBundle
+
+def write_pages(folder, pages, fresh=False):
+    bundle = DocumentBundle(str(folder), "doc", fresh=fresh)
+    for page in pages:
+        bundle.add(page, f"Texto de la pagina {page}", confidence=0.9)
+    return bundle
+
+def cut_last_line(pages_path, keep_bytes):
+    with open(pages_path, "rb") as f:
+        data = f.read()
+    start = data.rstrip(b"\n").rfind(b"\n") + 1
+    with open(pages_path, "wb") as f:
+        f.write(data[:start + keep_bytes])
+    return start
+
+# -------------------------------
+# Proceso interrumpido a mitad de una línea: al reabrir se descarta la línea
+# incompleta y la página se vuelve a escribir entera
+# -------------------------------
+def test_reopen_drops_truncated_line(tmp_path):
+    bundle = write_pages(tmp_path, [1, 2, 3])
+    bundle.abort()
+    kept = cut_last_line(bundle.pages_path, keep_bytes=12)
+
+    bundle = write_pages(tmp_path, [3])
+    assert os.path.getsize(bundle.pages_path) > kept
+    index = bundle.close()
+
+    assert list(index["pages"]) == ["1", "2", "3"]
+    assert index["pages"]["3"][0] == kept  # La página 3 empieza donde acababa la 2
+    assert output_bundle.read_page(bundle.pages_path, 3)["text"] == "Texto de la pagina 3"
+    assert [record["page"] for record in output_bundle.iter_pages(bundle.pages_path)] == [1, 2, 3]
+
+def test_reopen_truncates_file_with_only_a_partial_line(tmp_path):
+    bundle = write_pages(tmp_path, [1])
+    bundle.abort()
+    cut_last_line(bundle.pages_path, keep_bytes=5)
+
+    DocumentBundle(str(tmp_path), "doc").abort()
+
+    assert os.path.getsize(bundle.pages_path) == 0
+
+# -------------------------------
+# Índice guardado desactualizado (se escribió después de cerrar): se reconstruye
+# y una página repetida vale por su última línea
+# -------------------------------
+def test_stale_index_is_rebuilt_and_last_line_wins(tmp_path):
+    write_pages(tmp_path, [1, 2]).close()
+
+    bundle = write_pages(tmp_path, [2])
+    bundle.add(2, "Texto corregido", confidence=0.95)
+    bundle.abort()
+
+    page = output_bundle.read_page(bundle.pages_path, 2)
+    assert page["text"] == "Texto corregido"
+    assert output_bundle.read_page(bundle.pages_path, 4) is None
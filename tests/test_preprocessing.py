@@ -0,0 +1,114 @@
+import cv2
+import numpy as np
+import pytest
+
+from ocr_utils import preprocessing
+
+# -------------------------------
+# Página sintética: líneas de texto negras sobre blanco, girada 'angle' grados
+# -------------------------------
+def text_page(angle=0.0, width=1000, height=1400, lines=range(120, 1300, 45)):
+    page = np.full((height, width), 255, np.uint8)
+    rng = np.random.default_rng(0)
+    letters = list("abcdefghijklmnopqrstuvwxyz")
+    for y in lines:
+        words = " ".join("".join(rng.choice(letters, rng.integers(2, 9))) for _ in range(9))
+        cv2.putText(page, words, (80, y), cv2.FONT_HERSHEY_SIMPLEX, 0.9, 0, 2)
+    if angle:
+        M = cv2.getRotationMatrix2D((width // 2, height // 2), angle, 1.0)
+        page = cv2.warpAffine(page, M, (width, height), flags=cv2.INTER_LINEAR, borderValue=255)
+    return page
+
+# -------------------------------
+# Inclinación: el ángulo estimado deshace el giro (también fuera del antiguo ±5°)
+# -------------------------------
+@pytest.mark.parametrize("angle", [0.0, 3.0, -3.0, 8.0, -8.0])
+def test_estimate_skew(angle):
+    assert preprocessing.estimate_skew(text_page(angle)) == pytest.approx(-angle, abs=0.2)
+
+def test_preprocess_straightens_tilted_page():
+    straightened = preprocessing.preprocess_array(text_page(8.0))
+    assert abs(preprocessing.estimate_skew(straightened)) <= 0.2
+
+# -------------------------------
+# Páginas en blanco: el borde del escáner y motas sueltas no cuentan como
+# contenido; una sola línea de texto tenue sí
+# -------------------------------
+def scanned_blank_page():
+    page = np.full((1400, 1000), 255, np.uint8)
+    page[:, :15] = 40  # Sombra del borde del escáner
+    for y, x in ((210, 640), (700, 90), (1210, 455)):
+        page[y:y + 2, x:x + 2] = 0
+    return page
+
+def test_blank_page_with_scanner_noise_is_blank():
+    assert preprocessing.is_blank_page(scanned_blank_page())
+
+def test_page_with_faint_text_is_not_blank():
+    page = scanned_blank_page()
+    cv2.putText(page, "nota al margen de la pagina", (100, 200), cv2.FONT_HERSHEY_SIMPLEX, 0.9, 140, 2)
+    assert not preprocessing.is_blank_page(page)
+
+# -------------------------------
+# Recorte: caja del contenido con su margen, sin el borde del escáner
+# -------------------------------
+def test_content_bbox_keeps_margin_and_ignores_border():
+    page = np.full((1400, 1000), 255, np.uint8)
+    page[:, :15] = 40
+    page[300:500, 200:700] = 0
+    scale = preprocessing.CROP_THUMB_WIDTH / 1000.0
+    margin = (int(preprocessing.CROP_MARGIN_RATIO * preprocessing.CROP_THUMB_WIDTH) + 1) / scale
+
+    y0, y1, x0, x1 = preprocessing.content_bbox(page)
+
+    assert (y0, y1, x0, x1) == pytest.approx((300 - margin, 500 + margin, 200 - margin, 700 + margin), abs=2)
+    assert preprocessing.crop_to_content(page).shape == (y1 - y0, x1 - x0)
+
+def test_blank_page_is_not_cropped():
+    page = np.full((1400, 1000), 255, np.uint8)
+    assert preprocessing.content_bbox(page) is None
+    assert preprocessing.crop_to_content(page).shape == page.shape
+
+# -------------------------------
+# Mosaicos: corte en una fila limpia sin solape, o solape de 'overlap' filas
+# cuando no hay fila limpia en la franja
+# -------------------------------
+def test_page_at_max_height_is_not_split():
+    tiles = preprocessing.split_into_tiles(np.zeros((200, 10), np.uint8), max_height=200)
+    assert len(tiles) == 1 and tiles.overlaps == []
+
+def test_tiles_cut_on_clean_rows():
+    page = np.full((500, 100), 255, np.uint8)
+    for y in range(0, 500, 20):
+        page[y + 5:y + 15, 10:90] = 0  # Líneas de 10 px separadas por 10 px en blanco
+
+    tiles = preprocessing.split_into_tiles(page, max_height=200, overlap=50)
+
+    assert tiles.overlaps == [False] * (len(tiles) - 1)
+    assert all(150 <= len(tile) <= 200 for tile in tiles[:-1])
+    assert np.array_equal(np.vstack(tiles), page)
+
+def test_tiles_overlap_without_clean_row():
+    # Sin filas limpias; las columnas 1 y 2 guardan el número de fila
+    rows = np.arange(500)
+    page = np.stack([np.zeros(500), rows % 256, rows // 256], axis=1).astype(np.uint8)
+
+    tiles = preprocessing.split_into_tiles(page, max_height=200, overlap=50)
+    starts = [int(tile[0, 1]) + 256 * int(tile[0, 2]) for tile in tiles]
+    ends = [start + len(tile) for start, tile in zip(starts, tiles)]
+
+    assert tiles.overlaps == [True] * (len(tiles) - 1)
+    assert all(len(tile) <= 200 for tile in tiles)
+    assert starts[0] == 0 and ends[-1] == 500
+    assert all(start == end - 50 for start, end in zip(starts[1:], ends[:-1]))
+
+# -------------------------------
+# Unión de textos: solo tras un solape se quitan las líneas repetidas
+# -------------------------------
+def test_merge_tile_texts_drops_overlapped_lines():
+    texts = ["primera\nsegunda\ntercera", "segunda\ntercera\ncuarta"]
+    assert preprocessing.merge_tile_texts(texts, [True]) == "primera\nsegunda\ntercera\ncuarta"
+
+def test_merge_tile_texts_keeps_repeated_lines_after_clean_cut():
+    texts = ["Total\n10", "Total\n20"]
+    assert preprocessing.merge_tile_texts(texts, [False]) == "Total\n10\nTotal\n20"
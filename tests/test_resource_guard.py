@@ -0,0 +1,64 @@
+import pytest
+from PIL import Image
+
+from ocr_utils import ocr_engines
+from ocr_utils import resource_guard
+
+# -------------------------------
+# Proceso aislado simulado: registra el límite de cada llamada y agota el
+# tiempo en los lotes que contienen alguna imagen de box.slow
+# -------------------------------
+@pytest.fixture
+def sandbox(monkeypatch):
+    monkeypatch.setattr(resource_guard, "PAGE_TIMEOUT_SECONDS", 10)
+    box = resource_guard._OcrSandbox()
+    box.timeouts = []
+    box.slow = set()
+
+    def call(message, timeout=None):
+        images = message[2]
+        box.timeouts.append((len(images), timeout))
+        if set(images) & box.slow:
+            raise TimeoutError
+        return [(f"texto {image}", 0.9) for image in images]
+
+    monkeypatch.setattr(box, "_ensure", lambda name: None)
+    monkeypatch.setattr(box, "_stop", lambda: None)
+    monkeypatch.setattr(box, "_call", call)
+    return box
+
+def test_tiled_pages_get_one_budget_per_page(sandbox):
+    # Dos páginas: la primera en tres mosaicos, la segunda entera
+    results = sandbox.recognize_batch("easyocr", ["1a", "1b", "1c", "2"], [3, 1])
+
+    assert sandbox.timeouts == [(4, 20)]
+    assert [text for text, _ in results] == ["texto 1a", "texto 1b", "texto 1c", "texto 2"]
+
+def test_timeout_retries_page_by_page(sandbox):
+    sandbox.slow = {"1b"}
+    results = sandbox.recognize_batch("easyocr", ["1a", "1b", "2"], [2, 1])
+
+    assert sandbox.timeouts == [(3, 20), (2, 10), (1, 10)]
+    assert all(isinstance(result, resource_guard.OcrFailed) for result in results[:2])
+    assert results[2] == ("texto 2", 0.9)
+
+# -------------------------------
+# Motores: en el proceso aislado el error se propaga (el padre lo marca como
+# página fallida); en el propio proceso se entrega una página vacía
+# -------------------------------
+class _BrokenReader:
+    def readtext(self, *args, **kwargs):
+        raise RuntimeError("modelo caído")
+
+def broken_engine():
+    engine = ocr_engines.EasyOcrEngine(["es"])
+    engine._reader = _BrokenReader()
+    return engine
+
+def test_engine_error_returns_empty_result():
+    assert broken_engine().recognize(Image.new("L", (50, 20), 255)) == ("", 0.0)
+
+def test_engine_error_propagates_in_sandbox(monkeypatch):
+    monkeypatch.setattr(ocr_engines, "RAISE_ERRORS", True)
+    with pytest.raises(RuntimeError, match="modelo caído"):
+        broken_engine().recognize(Image.new("L", (50, 20), 255))
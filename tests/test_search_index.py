@@ -0,0 +1,74 @@
+import pytest
+
+from ocr_utils import search_index
+from ocr_utils.search_index import DocumentIndexer
+
+@pytest.fixture
+def index(monkeypatch, tmp_path):
+    monkeypatch.setattr(search_index, "INDEX_PATH", None)
+    search_index.configure(str(tmp_path / "ocr_index.sqlite"))
+    yield search_index
+    search_index._connection().close()
+    search_index._local.__dict__.clear()
+
+def hit_pages(index, query):
+    return sorted(hit["page"] for hit in index.search(query)["hits"])
+
+def indexed_pages(index, pdf_path):
+    rows = index._connection().execute(
+        "SELECT p.page FROM pages p JOIN documents d ON d.id = p.doc_id WHERE d.pdf_path = ? ORDER BY p.page",
+        (pdf_path,)
+    ).fetchall()
+    return [row[0] for row in rows]
+
+def index_document(pdf_path, texts, **close_args):
+    indexer = DocumentIndexer(pdf_path)
+    for page, text in texts.items():
+        indexer.add(page, text, txt_path=f"{pdf_path}_pagina_{page}.txt")
+    indexer.close(**close_args)
+    return indexer
+
+# -------------------------------
+# Reindexar una página sustituye su texto (sin duplicar la fila)
+# -------------------------------
+def test_reindexed_page_replaces_text(index, tmp_path):
+    pdf_path = str(tmp_path / "doc.pdf")
+    index_document(pdf_path, {1: "contrato de arrendamiento", 2: "anexo de firmas"})
+    index_document(pdf_path, {1: "factura rectificativa"})
+
+    assert hit_pages(index, "arrendamiento") == []
+    assert hit_pages(index, "factura") == [1]
+    assert hit_pages(index, "firmas") == [2]
+    assert indexed_pages(index, pdf_path) == [1, 2]
+
+def test_pages_are_flushed_in_batches(index, monkeypatch, tmp_path):
+    monkeypatch.setattr(search_index, "INDEX_BATCH_PAGES", 2)
+    indexer = DocumentIndexer(str(tmp_path / "doc.pdf"))
+    indexer.add(1, "primera pagina")
+    assert hit_pages(index, "primera") == []
+
+    indexer.add(2, "segunda pagina")
+    assert hit_pages(index, "pagina") == [1, 2]
+    assert indexer.pending == []
+
+# -------------------------------
+# Al cerrar se quitan las páginas descartadas y las que quedan fuera del documento
+# -------------------------------
+def test_close_removes_discarded_and_out_of_range_pages(index, tmp_path):
+    pdf_path = str(tmp_path / "doc.pdf")
+    index_document(pdf_path, {page: f"texto comun pagina{page}" for page in range(1, 6)})
+
+    index_document(pdf_path, {1: "texto comun revisado"}, removed_pages=[2], total_pages=3)
+
+    assert indexed_pages(index, pdf_path) == [1, 3]
+    assert hit_pages(index, "comun") == [1, 3]
+    assert not index.is_indexed_output(f"{pdf_path}_pagina_2.txt")
+    assert index.is_indexed_output(f"{pdf_path}_pagina_3.txt")
+
+def test_disabled_index_ignores_pages(monkeypatch, tmp_path):
+    monkeypatch.setattr(search_index, "INDEX_PATH", None)
+    indexer = index_document(str(tmp_path / "doc.pdf"), {1: "texto"})
+
+    assert indexer.pending == []
+    assert search_index.search("texto")["hits"] == []
+    assert not (tmp_path / "ocr_index.sqlite").exists()
@@ -0,0 +1,104 @@
+import os
+import sys
+import time
+import multiprocessing
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ocr_utils.task_store import TaskStore
+
+LEASE_SECONDS = 1.0
+TASKS = 6
+
+# -------------------------------
+# Procesos auxiliares (a nivel de módulo para poder usarlos con spawn)
+# -------------------------------
+def hold_lease(store_path, claimed):
+    # Toma una tarea y se queda colgado sin latidos hasta que lo matan
+    store = TaskStore(store_path)
+    task = store.claim("victima", LEASE_SECONDS)
+    claimed.put(task["id"])
+    time.sleep(600)
+
+def work(store_path, worker_id, done):
+    store = TaskStore(store_path)
+    while store.has_pending():
+        task = store.claim(worker_id, LEASE_SECONDS * 5)
+        if task is None:
+            time.sleep(0.1)
+            continue
+        time.sleep(0.05)
+        if store.complete(task["id"], worker_id, {"worker": worker_id}):
+            done.put(task["id"])
+
+def complete_twice(store_path, task_id, worker_id, start, results):
+    store = TaskStore(store_path)
+    start.wait()
+    results.put(store.complete(task_id, worker_id, {"worker": worker_id}))
+
+def _enqueue(tmp_path):
+    pdf_path = tmp_path / "doc.pdf"
+    pdf_path.write_bytes(b"%PDF-1.4\n")
+    store = TaskStore(str(tmp_path / "tareas.sqlite"))
+    ranges = [(first, first) for first in range(1, TASKS + 1)]
+    assert store.add_document(str(pdf_path), str(tmp_path / "salida"), TASKS, ranges) == TASKS
+    return store
+
+# -------------------------------
+# Varios nodos locales; uno muere con una concesión: la tarea caduca, vuelve
+# a la cola y la termina otro nodo. El nodo muerto ya no puede completarla
+# -------------------------------
+def test_killed_worker_task_is_requeued_and_finished_once(tmp_path):
+    store = _enqueue(tmp_path)
+    context = multiprocessing.get_context("spawn")
+    claimed, done = context.Queue(), context.Queue()
+
+    victim = context.Process(target=hold_lease, args=(store.path, claimed))
+    victim.start()
+    lost_id = claimed.get(timeout=60)
+    victim.kill()
+    victim.join()
+
+    workers = [context.Process(target=work, args=(store.path, f"nodo{i}", done)) for i in range(3)]
+    for process in workers:
+        process.start()
+    for process in workers:
+        process.join(timeout=120)
+        assert process.exitcode == 0
+
+    completed = sorted(done.get(timeout=5) for _ in range(TASKS))
+    assert completed == [task["id"] for task in store.tasks()]
+    assert store.counts() == {"queued": 0, "leased": 0, "done": TASKS, "failed": 0}
+
+    lost = next(task for task in store.tasks() if task["id"] == lost_id)
+    assert lost["attempts"] == 2
+    assert lost["worker"] != "victima"
+    assert not store.complete(lost_id, "victima", {})
+    assert not store.fail(lost_id, "victima", "tarde")
+
+# -------------------------------
+# Dos procesos completan a la vez: solo cuenta el que tiene la concesión,
+# y solo una vez
+# -------------------------------
+def test_duplicate_completion_race(tmp_path):
+    store = _enqueue(tmp_path)
+    task = store.claim("nodo0", LEASE_SECONDS)
+    time.sleep(LEASE_SECONDS + 0.1)
+    retaken = store.claim("nodo1", 60)
+    assert retaken["id"] == task["id"] and retaken["attempts"] == 2
+
+    context = multiprocessing.get_context("spawn")
+    start, results = context.Event(), context.Queue()
+    racers = [
+        context.Process(target=complete_twice, args=(store.path, task["id"], worker_id, start, results))
+        for worker_id in ("nodo0", "nodo1", "nodo1")
+    ]
+    for process in racers:
+        process.start()
+    start.set()
+    for process in racers:
+        process.join(timeout=60)
+
+    assert sorted(results.get(timeout=5) for _ in racers) == [False, False, True]
+    finished = next(item for item in store.tasks("done") if item["id"] == task["id"])
+    assert finished["result"] == {"worker": "nodo1"}
@@ -0,0 +1,110 @@
+import os
+import sys
+import json
+import socket
+import argparse
+
+# -------------------------------
+# Asegurar que la carpeta base del proyecto está en sys.path
+# -------------------------------
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+UTILS_PATH = os.path.join(BASE_DIR, "ocr_utils")
+if UTILS_PATH not in sys.path:
+    sys.path.insert(0, UTILS_PATH)
+
+from ocr_utils import logger
+from ocr_utils import ocr_cache
+from ocr_utils import manifest
+from ocr_utils import ocr_processor
+from ocr_utils import search_index
+from ocr_utils import distributed
+from ocr_utils import task_store
+from ocr_utils import resource_guard
+from ocr_utils.task_store import TaskStore
+import cli
+
+# -------------------------------
+# Reparto de trabajo entre varios nodos con un almacén de tareas compartido
+# Uso:
+#   python worker.py enqueue /compartido/tareas.sqlite entrada salida --pages-per-task 50
+#   python worker.py work /compartido/tareas.sqlite --processes 4      (en cada nodo)
+#   python worker.py status /compartido/tareas.sqlite
+# Las rutas de entrada y salida deben ser las mismas en todos los nodos
+# La caché (--cache-dir), el índice (--index) y los manifiestos de cada rango pueden
+# estar en el almacenamiento compartido: se abren con journal_mode=DELETE, como el
+# almacén de tareas
+# -------------------------------
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Nodos OCR con almacén de tareas compartido")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    enqueue = commands.add_parser("enqueue", help="Dar de alta los PDFs de una carpeta")
+    enqueue.add_argument("store", help="Base SQLite compartida")
+    enqueue.add_argument("input_folder")
+    enqueue.add_argument("output_folder")
+    enqueue.add_argument("--pages-per-task", type=int, default=distributed.PAGES_PER_TASK,
+                         help="Páginas por tarea (0 = un documento por tarea)")
+
+    work = commands.add_parser("work", help="Procesar tareas hasta vaciar la cola")
+    work.add_argument("store", help="Base SQLite compartida")
+    work.add_argument("--processes", type=int, default=1, help="Nodos locales (procesos)")
+    work.add_argument("--lease", type=int, default=task_store.LEASE_SECONDS, help="Segundos de concesión")
+    work.add_argument("--keep-running", action="store_true", help="Seguir esperando tareas nuevas")
+    work.add_argument("--dpi", type=int, default=ocr_processor.OCR_DPI)
+    work.add_argument("--engine", choices=["easyocr", "tesseract", "auto"], default=ocr_processor.OCR_ENGINE)
+    work.add_argument("--cache-dir", default=os.environ.get("OCR_CACHE_DIR"))
+    work.add_argument("--index", default=os.environ.get("OCR_INDEX_PATH"))
+    work.add_argument("--bundle", action="store_true", help="Un paquete por tarea en lugar de archivos por página")
+    work.add_argument("--memory-budget", type=int, default=resource_guard.MEMORY_BUDGET_MB,
+                      help="MB de memoria para el OCR entre todos los procesos del nodo (0 = automático)")
+    work.add_argument("--page-timeout", type=float, default=resource_guard.PAGE_TIMEOUT_SECONDS,
+                      help="Segundos máximos de OCR por página (0 = sin límite)")
+
+    status = commands.add_parser("status", help="Tareas por estado")
+    status.add_argument("store", help="Base SQLite compartida")
+    status.add_argument("--retry-failed", action="store_true", help="Volver a encolar las tareas fallidas")
+
+    for command in (enqueue, work, status):
+        command.add_argument("--log", help="Archivo de log (por defecto uno por máquina junto al almacén)")
+    return parser.parse_args(argv)
+
+# Un log por máquina: el bloqueo de archivos no es fiable entre nodos en NFS/SMB
+def default_log_path(store_path):
+    return os.path.join(os.path.dirname(os.path.abspath(store_path)), f"proceso_{socket.gethostname()}.log")
+
+def main(argv=None):
+    args = parse_args(argv)
+    logger.init_logger(os.path.abspath(args.log) if args.log else default_log_path(args.store))
+    store = TaskStore(args.store)
+
+    if args.command == "enqueue":
+        if not os.path.isdir(args.input_folder):
+            print(json.dumps({"error": f"Carpeta de entrada no encontrada: {args.input_folder}"}, ensure_ascii=False))
+            return cli.EXIT_USAGE
+        added = distributed.enqueue_folder(store, args.input_folder, args.output_folder, args.pages_per_task)
+        print(json.dumps({"added": added, "tasks": store.counts()}, ensure_ascii=False, indent=2))
+        return cli.EXIT_OK
+
+    if args.command == "status":
+        retried = store.retry_failed() if args.retry_failed else 0
+        print(json.dumps({"tasks": store.counts(), "retried": retried,
+                          "failed": [{"id": task["id"], "pdf_path": task["pdf_path"], "error": task["error"]}
+                                     for task in store.tasks("failed")]},
+                         ensure_ascii=False, indent=2))
+        return cli.EXIT_OK
+
+    # Misma configuración que la línea de comandos (se replica en los procesos locales)
+    ocr_cache.JOURNAL_MODE = "DELETE"
+    manifest.JOURNAL_MODE = "DELETE"
+    search_index.JOURNAL_MODE = "DELETE"
+    cli.configure(args)
+    summaries = distributed.run_local_workers(
+        store.path, args.processes, lease_seconds=args.lease, exit_when_idle=not args.keep_running
+    )
+    counts = store.counts()
+    print(json.dumps({"workers": summaries, "tasks": counts}, ensure_ascii=False, indent=2))
+    logger.flush()
+    return cli.EXIT_FAILURES if counts["failed"] else cli.EXIT_OK
+
+if __name__ == '__main__':
+    sys.exit(main())